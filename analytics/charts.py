@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import asyncio
+import logging
+
+from analytics.progress import build_progress, render_progress_chart
+from database.cache import UserCache
+from database.database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class ProgressCharts:
+    """
+    Графики прогресса по упражнениям с кэшированием
+
+    График хранится в кэше вместе с id последнего подхода упражнения. Актуальность
+    проверяется по EXERCISE_STATS одним чтением по первичному ключу, поэтому повторный
+    просмотр не читает историю и не рисует график заново. Расчет и отрисовка идут
+    в отдельном потоке, чтобы не блокировать event loop.
+    """
+    def __init__(self, db: Database, cache: UserCache, max_points: int):
+        self.db = db
+        self.cache = cache
+        self.max_points = max_points
+        # Один поток: matplotlib не гарантирует потокобезопасность
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='charts')
+
+    async def render(self, telegram_id: int, exercise_id: int) -> Optional[bytes]:
+        """
+        Получить график прогресса упражнения
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+            exercise_id (int): Идентификатор упражнения
+
+        Returns:
+            Optional[bytes]: PNG или None, если подходов в упражнении нет
+        """
+        last_set = await self.db.get_exercise_last_set(telegram_id, exercise_id)
+        if last_set is None:
+            return None
+        name, last_set_id = last_set
+        cached = self.cache.get(telegram_id, exercise_id)
+        if cached is not None and cached[0] == last_set_id:
+            return cached[1]
+
+        history = await self.db.get_exercise_history(telegram_id, exercise_id)
+        if not history['dates']:
+            return None
+        loop = asyncio.get_running_loop()
+        chart = await loop.run_in_executor(self._executor, self._render, name, history)
+        self.cache.set(telegram_id, exercise_id, (last_set_id, chart))
+        return chart
+
+    def invalidate(self, telegram_id: int) -> None:
+        """
+        Сбросить графики пользователя
+
+        Нужно, когда история меняется без нового последнего подхода,
+        например при замене тренировок повторным импортом.
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+        """
+        self.cache.invalidate(telegram_id)
+
+    def _render(self, name: str, history: dict) -> bytes:
+        progress = build_progress(history['dates'], history['weights'], history['reps'], self.max_points)
+        return render_progress_chart(name, progress)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
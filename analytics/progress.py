@@ -0,0 +1,93 @@
+from typing import Dict, List
+import io
+
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Окно скользящего среднего 1ПМ
+TREND_WINDOW = '28D'
+
+
+def _downsample(data: pd.DataFrame, max_points: int, aggregations: Dict[str, str]) -> pd.DataFrame:
+    if len(data) <= max_points:
+        return data
+    # Соседние точки объединяются в max_points равных по количеству корзин,
+    # поэтому пики рекордов не теряются, а график остается читаемым
+    bins = np.arange(len(data)) * max_points // len(data)
+    downsampled = data.groupby(bins).agg(aggregations)
+    downsampled.index = data.index[np.flatnonzero(np.diff(bins, append=max_points))]
+    return downsampled
+
+
+def build_progress(dates: List, weights: List[float], reps: List[int], max_points: int) -> Dict[str, pd.Series]:
+    """
+    Расчет рядов прогресса по истории подходов
+
+    Args:
+        dates (List): Даты подходов по возрастанию
+        weights (List[float]): Веса подходов
+        reps (List[int]): Повторения подходов
+        max_points (int): Максимальное количество точек в ряду
+
+    Returns:
+        Dict[str, pd.Series]: Рабочий вес и 1ПМ по тренировкам, скользящее среднее 1ПМ
+            и недельный объем, индекс рядов - даты
+    """
+    weight = np.asarray(weights, dtype=np.float64)
+    reps = np.asarray(reps, dtype=np.int32)
+    sets = pd.DataFrame({
+        'weight': weight,
+        'e1rm': np.where(reps <= 1, weight, weight * (1 + reps / 30.0)),
+        'volume': np.nan_to_num(weight * reps)
+    }, index=pd.DatetimeIndex(np.asarray(dates, dtype='datetime64[D]')))
+
+    daily = sets.groupby(level=0).agg({'weight': 'max', 'e1rm': 'max', 'volume': 'sum'})
+    daily['trend'] = daily['e1rm'].rolling(TREND_WINDOW, min_periods=1).mean()
+    weekly = daily['volume'].resample('W-MON', label='left', closed='left').sum()
+
+    daily = _downsample(daily, max_points, {'weight': 'max', 'e1rm': 'max', 'trend': 'last'})
+    weekly = _downsample(weekly.to_frame(), max_points, {'volume': 'mean'})['volume']
+    return {
+        'weight': daily['weight'],
+        'e1rm': daily['e1rm'],
+        'trend': daily['trend'],
+        'volume': weekly
+    }
+
+
+def render_progress_chart(title: str, progress: Dict[str, pd.Series]) -> bytes:
+    """
+    Отрисовка графика прогресса в PNG
+
+    Используется Figure с FigureCanvasAgg без pyplot: нет глобального состояния
+    и не нужен дисплей.
+
+    Args:
+        title (str): Заголовок графика
+        progress (Dict[str, pd.Series]): Ряды из build_progress
+
+    Returns:
+        bytes: PNG изображение
+    """
+    figure = Figure(figsize=(8, 6), dpi=100, layout='constrained')
+    FigureCanvasAgg(figure)
+    top, bottom = figure.subplots(2, 1, sharex=True, height_ratios=(2, 1))
+    top.plot(progress['weight'].index, progress['weight'].to_numpy(), marker='.', label='Рабочий вес')
+    top.plot(progress['e1rm'].index, progress['e1rm'].to_numpy(), alpha=0.5, label='1ПМ')
+    top.plot(progress['trend'].index, progress['trend'].to_numpy(), linewidth=2, label='1ПМ, среднее за 4 недели')
+    top.set_title(title)
+    top.set_ylabel('кг')
+    top.grid(alpha=0.3)
+    top.legend(loc='upper left')
+    volume = progress['volume']
+    # После прореживания столбец может покрывать несколько недель
+    step = np.median(np.diff(volume.index.to_numpy())) / np.timedelta64(1, 'D') if len(volume) > 1 else 7
+    bottom.bar(volume.index, volume.to_numpy(), width=step * 0.8, align='edge')
+    bottom.set_ylabel('Объем за неделю, кг')
+    bottom.grid(alpha=0.3)
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
@@ -0,0 +1,25 @@
+from typing import List
+
+from database.database import Database
+
+# Синтетические пользователи берутся из диапазона, недостижимого для Telegram,
+# чтобы прогон можно было выполнять на базе с реальными данными
+USER_ID_BASE = 9_000_000_000_000
+
+
+async def cleanup(db: Database, user_ids: List[int], fsm_keys: List[str] = ()) -> None:
+    """
+    Удаление данных синтетических пользователей
+
+    Args:
+        db (Database): База данных
+        user_ids (List[int]): Идентификаторы пользователей
+        fsm_keys (List[str]): Ключи их состояний FSM
+    """
+    async with db.acquire('benchmark_cleanup') as conn:
+        async with conn.transaction():
+            await conn.execute('DELETE FROM EXERCISE_STATS WHERE telegram_id = ANY($1::BIGINT[])', user_ids)
+            await conn.execute('DELETE FROM WORKOUT WHERE telegram_id = ANY($1::BIGINT[])', user_ids)
+            await conn.execute('DELETE FROM EXERCISE WHERE telegram_id = ANY($1::BIGINT[])', user_ids)
+            await conn.execute('DELETE FROM "USER" WHERE telegram_id = ANY($1::BIGINT[])', user_ids)
+            await conn.execute('DELETE FROM FSM_STATE WHERE key = ANY($1::VARCHAR[])', list(fsm_keys))
@@ -0,0 +1,314 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.methods import SendMessage, SendPhoto, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import CallbackQuery, Chat, Message, TelegramObject, Update, User
+
+from benchmarks.common import USER_ID_BASE, cleanup
+from bot import bot as app
+from bot.handlers import user_input_handler, keyboard_handler
+from bot.keyboard.session import KeyboardSession
+from database.database import Database
+
+SET_MESSAGES = ("80x10 85x8 90x6", "3x10@60", "82.5 8")
+
+
+class RecordingSession(KeyboardSession):
+    """
+    Сессия, которая не ходит в сеть, а записывает вызовы API
+
+    Запрос собирается так же, как в KeyboardSession, поэтому сериализация
+    попадает в замеры, а вместо ответа Telegram подставляется фиктивный.
+    """
+    def __init__(self):
+        super().__init__()
+        self.calls: Dict[str, int] = defaultdict(int)
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[TelegramType],
+                           timeout: Optional[int] = None) -> TelegramType:
+        self.build_form_data(bot, method)
+        self.calls[type(method).__name__] += 1
+        if isinstance(method, (SendMessage, SendPhoto)):
+            return Message(
+                message_id=next(self._message_ids),
+                date=datetime.now(),
+                chat=Chat(id=method.chat_id, type='private'),
+                text=getattr(method, 'text', None)
+            )
+        return True
+
+    async def close(self) -> None:
+        pass
+
+
+class HandlerTimer:
+    """
+    Внутренний middleware, который замеряет время работы хендлеров
+    """
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        name = data['handler'].callback.__name__
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.latency[name].append(time.perf_counter() - start)
+
+
+class UpdateFactory:
+    """
+    Генератор синтетических обновлений от имени пользователя
+    """
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+
+    def message(self, user_id: int, text: str) -> Update:
+        return Update(update_id=next(self._update_ids), message=self._message(user_id, text))
+
+    def callback(self, user_id: int, data: str) -> Update:
+        update_id = next(self._update_ids)
+        return Update(
+            update_id=update_id,
+            callback_query=CallbackQuery(
+                id=str(update_id),
+                from_user=self._user(user_id),
+                chat_instance=str(user_id),
+                data=data,
+                message=self._message(user_id, "bench")
+            )
+        )
+
+    def _message(self, user_id: int, text: str) -> Message:
+        return Message(
+            message_id=1,
+            date=datetime.now(),
+            chat=Chat(id=user_id, type='private'),
+            from_user=self._user(user_id),
+            text=text
+        )
+
+    @staticmethod
+    def _user(user_id: int) -> User:
+        return User(id=user_id, is_bot=False, first_name=f"bench{user_id - USER_ID_BASE}")
+
+
+def workout_scenario(updates: UpdateFactory, user_id: int, muscle_group: str,
+                     exercise: str, messages: int) -> List[Update]:
+    """
+    Обновления полного сценария тренировки одного пользователя
+
+    Args:
+        updates (UpdateFactory): Генератор обновлений
+        user_id (int): Идентификатор пользователя
+        muscle_group (str): Группа мышц
+        exercise (str): Упражнение из выбранной группы
+        messages (int): Количество сообщений с подходами
+
+    Returns:
+        List[Update]: /start, новая тренировка, выбор группы и упражнения,
+            сообщения с подходами и завершение тренировки
+    """
+    scenario = [
+        updates.message(user_id, "/start"),
+        updates.callback(user_id, "new_workout"),
+        updates.callback(user_id, f"select_muscle_group:{muscle_group}"),
+        updates.callback(user_id, f"select_exercise:{exercise}")
+    ]
+    for i in range(messages):
+        scenario.append(updates.message(user_id, SET_MESSAGES[i % len(SET_MESSAGES)]))
+    scenario.append(updates.callback(user_id, "finish_workout"))
+    return scenario
+
+
+def _acquire_counts(db: Database) -> Dict[str, int]:
+    return {method: histogram.count for method, histogram in db.pool_metrics.wait_time.items()}
+
+
+def _statement_counts(db: Database) -> Dict[str, int]:
+    return dict(db.tracer.statements)
+
+
+def _diff(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, int]:
+    return {
+        method: after[method] - before.get(method, 0)
+        for method in sorted(after) if after[method] - before.get(method, 0)
+    }
+
+
+def _latency_ms(samples: List[float]) -> Dict[str, float]:
+    # Точные перцентили по сырым замерам, а не границы бакетов гистограммы
+    if not samples:
+        return {'count': 0, 'avg_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0}
+    values = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'count': len(samples),
+        'avg_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3)
+    }
+
+
+async def run_benchmark(bot: Bot, dp: Dispatcher, users: int, concurrency: int, messages: int,
+                        muscle_group: str, exercise: str) -> Dict[str, Any]:
+    """
+    Прогон сценария тренировки для users пользователей через Dispatcher.feed_update
+
+    Обновления одного пользователя идут последовательно, как в Telegram,
+    пользователи обрабатываются параллельно, не больше concurrency одновременно.
+    Обращения к базе считаются по командам, которые QueryTracer видит внутри
+    захватов соединения, включая BEGIN и COMMIT, отдельно считаются захваты
+    соединений из пула. Время прогона включает запись журнала
+    подходов и FSM, отложенную хендлерами, перцентили задержек считаются по всем замерам.
+
+    Args:
+        bot (Bot): Бот с RecordingSession
+        dp (Dispatcher): Диспетчер с подключенными роутерами
+        users (int): Количество пользователей
+        concurrency (int): Количество одновременно активных пользователей
+        messages (int): Количество сообщений с подходами на пользователя
+        muscle_group (str): Группа мышц
+        exercise (str): Упражнение
+
+    Returns:
+        Dict[str, Any]: Пропускная способность, задержки обновлений и хендлеров,
+            обращения к базе и вызовы API
+    """
+    db = user_input_handler.db
+    session: RecordingSession = bot.session
+    timer = HandlerTimer()
+    for router in (user_input_handler.router, keyboard_handler.router):
+        router.message.middleware(timer)
+        router.callback_query.middleware(timer)
+
+    updates = UpdateFactory()
+    user_ids = [USER_ID_BASE + i for i in range(users)]
+    fsm_keys = [
+        dp.storage.key_builder.build(StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id))
+        for user_id in user_ids
+    ] if hasattr(dp.storage, 'key_builder') else []
+    await cleanup(db, user_ids, fsm_keys)
+
+    update_latency: List[float] = []
+    unhandled = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_user(user_id: int) -> None:
+        nonlocal unhandled
+        async with semaphore:
+            for update in workout_scenario(updates, user_id, muscle_group, exercise, messages):
+                start = time.perf_counter()
+                result = await dp.feed_update(bot, update)
+                update_latency.append(time.perf_counter() - start)
+                if result is UNHANDLED:
+                    unhandled += 1
+
+    acquires_before, statements_before = _acquire_counts(db), _statement_counts(db)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_user(user_id) for user_id in user_ids))
+        handled = time.perf_counter()
+        # Отложенные записи журнала подходов и FSM тоже относятся к прогону
+        if user_input_handler.set_journal is not None:
+            await user_input_handler.set_journal.flush()
+        await dp.storage.close()
+        elapsed = time.perf_counter() - start
+        flush = time.perf_counter() - handled
+        acquires = _diff(acquires_before, _acquire_counts(db))
+        round_trips = _diff(statements_before, _statement_counts(db))
+    finally:
+        await cleanup(db, user_ids, fsm_keys)
+
+    total = len(update_latency)
+    return {
+        'users': users,
+        'concurrency': concurrency,
+        'updates': total,
+        'unhandled': unhandled,
+        'elapsed_s': round(elapsed, 3),
+        'flush_s': round(flush, 3),
+        'updates_per_s': round(total / elapsed, 1) if elapsed else 0.0,
+        'update_latency': _latency_ms(update_latency),
+        'handlers': {name: _latency_ms(histogram) for name, histogram in sorted(timer.latency.items())},
+        'db_round_trips_per_update': round(sum(round_trips.values()) / total, 3) if total else 0.0,
+        'db_round_trips': round_trips,
+        'pool_acquires_per_update': round(sum(acquires.values()) / total, 3) if total else 0.0,
+        'pool_acquires': acquires,
+        'api_calls': dict(session.calls)
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    latency = report['update_latency']
+    print(f"Пользователей: {report['users']} (одновременно {report['concurrency']})")
+    print(f"Обновлений: {report['updates']}, не обработано: {report['unhandled']}")
+    print(f"Время: {report['elapsed_s']} с, из них запись отложенного {report['flush_s']} с, "
+          f"{report['updates_per_s']} обновлений/с")
+    print(f"Задержка обновления, мс: p50 {latency['p50_ms']:g}, p95 {latency['p95_ms']:g}, p99 {latency['p99_ms']:g}")
+    print()
+    print(f"{'хендлер':<32}{'вызовов':>8}{'avg':>9}{'p50':>8}{'p95':>8}{'p99':>8}")
+    for name, item in report['handlers'].items():
+        print(f"{name:<32}{item['count']:>8}{item['avg_ms']:>9.2f}"
+              f"{item['p50_ms']:>8.2f}{item['p95_ms']:>8.2f}{item['p99_ms']:>8.2f}")
+    print()
+    print(f"Команд к базе на обновление: {report['db_round_trips_per_update']}, "
+          f"захватов соединения: {report['pool_acquires_per_update']}")
+    for method, count in report['db_round_trips'].items():
+        print(f"  {method}: {count} (захватов {report['pool_acquires'].get(method, 0)})")
+    print("Вызовы API: " + ", ".join(f"{method} {count}" for method, count in report['api_calls'].items()))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон диспетчера на синтетических обновлениях")
+    parser.add_argument('--users', type=int, default=200, help="количество пользователей")
+    parser.add_argument('--concurrency', type=int, default=50, help="одновременно активных пользователей")
+    parser.add_argument('--messages', type=int, default=3, help="сообщений с подходами на пользователя")
+    parser.add_argument('--muscle-group', default='Legs', help="группа мышц из каталога")
+    parser.add_argument('--exercise', default='Выпады', help="упражнение из выбранной группы")
+    parser.add_argument('--json', dest='json_path', help="сохранить отчет в JSON файл")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    # Логи каждого обновления искажают замеры
+    logging.disable(logging.INFO)
+    real_bot, dp, import_runner = await app.setup_dispatcher()
+    bot = Bot(token=real_bot.token, session=RecordingSession())
+    await real_bot.session.close()
+    try:
+        report = await run_benchmark(
+            bot, dp,
+            users=args.users,
+            concurrency=args.concurrency,
+            messages=args.messages,
+            muscle_group=args.muscle_group,
+            exercise=args.exercise
+        )
+    finally:
+        await app.shutdown(bot, dp, import_runner)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
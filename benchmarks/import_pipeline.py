@@ -0,0 +1,301 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import USER_ID_BASE, cleanup
+from database.database import Database
+from dataloader.dataloader import Dataloader
+
+MUSCLE_GROUPS = ('Chest', 'Back', 'Legs', 'Shoulders', 'Biceps', 'Triceps', 'Abs')
+
+# Подходов в одном упражнении подряд и в одной тренировке по умолчанию
+SETS_PER_EXERCISE = 4
+SETS_PER_WORKOUT = 20
+
+
+def generate_csv(path: str, rows: int, days: Optional[int] = None, exercises: int = 30,
+                 dirty: float = 0.01, seed: int = 0) -> None:
+    """
+    Генерация CSV в формате выгрузки FitNotes
+
+    Тренировки равномерно распределены по периоду в days дней, строки одной
+    даты идут подряд. В каждой тренировке упражнения выполняются блоками
+    по SETS_PER_EXERCISE подходов. В доле dirty строк пусто одно из обязательных
+    полей (вес, повторения или группа мышц), такие строки отбрасывает filter_data.
+
+    Args:
+        path (str): Путь к файлу
+        rows (int): Количество строк
+        days (Optional[int]): Период истории в днях, по умолчанию тренировка
+            через день по SETS_PER_WORKOUT подходов
+        exercises (int): Количество разных упражнений
+        dirty (float): Доля грязных строк
+        seed (int): Зерно генератора
+    """
+    rng = np.random.default_rng(seed)
+    workouts = max(1, rows // SETS_PER_WORKOUT)
+    days = days or workouts * 2
+    workouts = min(workouts, days)
+    offsets = np.sort(rng.choice(days, size=workouts, replace=False))
+    dates = np.datetime64(date.today()) - days + offsets
+    row_dates = dates[np.arange(rows) * workouts // rows]
+
+    blocks = rows // SETS_PER_EXERCISE + 1
+    row_exercises = rng.integers(exercises, size=blocks)[np.arange(rows) // SETS_PER_EXERCISE]
+    names = np.array([f"Упражнение {i + 1}" for i in range(exercises)], dtype=object)
+    groups = np.array([MUSCLE_GROUPS[i % len(MUSCLE_GROUPS)] for i in range(exercises)], dtype=object)
+    base_weights = rng.integers(8, 60, size=exercises) * 2.5
+
+    data = pd.DataFrame({
+        'Date': np.datetime_as_string(row_dates, unit='D'),
+        'Exercise': names[row_exercises],
+        'Category': groups[row_exercises],
+        'Weight': base_weights[row_exercises] + rng.integers(-4, 5, size=rows) * 2.5,
+        'Weight Unit': 'kgs',
+        'Reps': pd.array(rng.integers(3, 13, size=rows), dtype='Int64'),
+        'Distance': '',
+        'Distance Unit': '',
+        'Time': '',
+        'Comment': ''
+    })
+    dirty_rows = np.flatnonzero(rng.random(rows) < dirty)
+    dirty_columns = rng.integers(3, size=dirty_rows.size)
+    for code, column in enumerate(('Weight', 'Reps', 'Category')):
+        data.loc[data.index[dirty_rows[dirty_columns == code]], column] = None
+    data.to_csv(path, index=False)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss в Linux возвращается в килобайтах
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+async def _insert(telegram_id: int, write: Callable[[Database], Awaitable[Dict[str, int]]]) -> Tuple[int, float]:
+    # Подключение к базе и миграции не входят в замер
+    db = Database()
+    await db.create_pool()
+    try:
+        await db.init_tables()
+        await cleanup(db, [telegram_id])
+        await db.get_create_user(telegram_id)
+        try:
+            start = time.perf_counter()
+            imported = await write(db)
+            return imported['sets'], time.perf_counter() - start
+        finally:
+            await cleanup(db, [telegram_id])
+    finally:
+        await db.pool.close()
+
+
+def measure_streaming(csv_path: str, telegram_id: Optional[int]) -> Dict[str, Any]:
+    """
+    Замер этапов импорта одного файла так, как его выполняет ImportRunner
+
+    Выполняется в отдельном процессе, поэтому пиковое потребление памяти
+    относится только к этому файлу. Файл потоково разбирается в файл записей
+    через Dataloader.write_records, который затем загружается через
+    Database.bulk_import_file. Для каждого этапа записывается время и пиковый
+    RSS процесса после этапа.
+
+    Args:
+        csv_path (str): Путь к CSV файлу
+        telegram_id (Optional[int]): Пользователь для записи в базу,
+            None - этап записи пропускается
+
+    Returns:
+        Dict[str, Any]: Этапы и количество подходов
+    """
+    logging.disable(logging.INFO)
+    stages = {}
+    records_path = f"{csv_path}.records"
+    baseline_rss_mb = _peak_rss_mb()
+    try:
+        start = time.perf_counter()
+        sets = Dataloader.write_records(csv_path, records_path)
+        stages['write_records'] = {'seconds': round(time.perf_counter() - start, 4), 'peak_rss_mb': _peak_rss_mb()}
+
+        imported = None
+        if telegram_id is not None:
+            imported, seconds = asyncio.run(_insert(
+                telegram_id, lambda db: db.bulk_import_file(telegram_id, records_path)
+            ))
+            stages['db_import_file'] = {'seconds': round(seconds, 4), 'peak_rss_mb': _peak_rss_mb()}
+    finally:
+        if os.path.exists(records_path):
+            os.remove(records_path)
+
+    return {
+        'sets': sets,
+        'imported_sets': imported,
+        'stages': stages,
+        'baseline_rss_mb': baseline_rss_mb,
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+
+def measure_eager(csv_path: str, telegram_id: Optional[int]) -> Dict[str, Any]:
+    """
+    Замер этапов импорта одного файла целиком в памяти
+
+    Путь через get_workouts и Database.bulk_import в боте больше не используется,
+    замер оставлен для сравнения с measure_streaming. Выполняется в отдельном
+    процессе, для каждого этапа записывается время и пиковый RSS процесса после этапа.
+
+    Args:
+        csv_path (str): Путь к CSV файлу
+        telegram_id (Optional[int]): Пользователь для записи в базу,
+            None - этап записи пропускается
+
+    Returns:
+        Dict[str, Any]: Этапы, количество тренировок и подходов
+    """
+    logging.disable(logging.INFO)
+    stages = {}
+
+    def stage(name: str, start: float) -> None:
+        stages[name] = {'seconds': round(time.perf_counter() - start, 4), 'peak_rss_mb': _peak_rss_mb()}
+
+    baseline_rss_mb = _peak_rss_mb()
+    start = time.perf_counter()
+    loader = Dataloader(csv_path)
+    stage('read_csv', start)
+    rows = len(loader.data_csv)
+
+    start = time.perf_counter()
+    loader.set_order()
+    stage('set_order', start)
+
+    start = time.perf_counter()
+    loader.filter_data()
+    stage('filter_data', start)
+    valid_rows = len(loader.data_csv)
+
+    start = time.perf_counter()
+    workouts = loader.get_workouts()
+    stage('get_workouts', start)
+    del loader
+
+    imported = None
+    if telegram_id is not None:
+        imported, seconds = asyncio.run(_insert(
+            telegram_id, lambda db: db.bulk_import(telegram_id, Dataloader.to_records(workouts.items()))
+        ))
+        stages['db_insert'] = {'seconds': round(seconds, 4), 'peak_rss_mb': _peak_rss_mb()}
+
+    return {
+        'rows': rows,
+        'valid_rows': valid_rows,
+        'workouts': len(workouts),
+        'imported_sets': imported,
+        'stages': stages,
+        'baseline_rss_mb': baseline_rss_mb,
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes: List[int], days: Optional[int], exercises: int, dirty: float,
+                  seed: int, with_db: bool) -> Dict[str, Any]:
+    """
+    Прогон импорта на сгенерированных файлах разного размера
+
+    Каждый файл импортируется дважды, каждый раз в новом процессе: потоково,
+    как в боте (streaming), и целиком в памяти для сравнения (eager).
+
+    Args:
+        sizes (List[int]): Количество строк в файлах
+        days (Optional[int]): Период истории в днях
+        exercises (int): Количество разных упражнений
+        dirty (float): Доля грязных строк
+        seed (int): Зерно генератора
+        with_db (bool): Замерять запись в базу
+
+    Returns:
+        Dict[str, Any]: Параметры прогона и результаты по размерам
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i, rows in enumerate(sizes):
+            csv_path = os.path.join(tmp_dir, f"fitnotes_{rows}.csv")
+            start = time.perf_counter()
+            generate_csv(csv_path, rows, days=days, exercises=exercises, dirty=dirty, seed=seed)
+            generate_seconds = round(time.perf_counter() - start, 4)
+            telegram_id = USER_ID_BASE + i if with_db else None
+            result = {'rows': rows, 'csv_bytes': os.path.getsize(csv_path), 'generate_seconds': generate_seconds}
+            for pipeline, measure in (('streaming', measure_streaming), ('eager', measure_eager)):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    measured = executor.submit(measure, csv_path, telegram_id).result()
+                total = sum(item['seconds'] for item in measured['stages'].values())
+                measured.update({
+                    'total_seconds': round(total, 4),
+                    'rows_per_s': round(rows / total, 1) if total else 0.0
+                })
+                result[pipeline] = measured
+            results.append(result)
+            os.remove(csv_path)
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'params': {'days': days, 'exercises': exercises, 'dirty': dirty, 'seed': seed, 'with_db': with_db},
+        'results': results
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Замер этапов импорта на сгенерированных CSV FitNotes")
+    parser.add_argument('--rows', default='1000,10000,100000,1000000',
+                        help="размеры файлов в строках через запятую")
+    parser.add_argument('--days', type=int, help="период истории в днях")
+    parser.add_argument('--exercises', type=int, default=30, help="количество разных упражнений")
+    parser.add_argument('--dirty', type=float, default=0.01, help="доля строк с пустыми полями")
+    parser.add_argument('--seed', type=int, default=0, help="зерно генератора")
+    parser.add_argument('--no-db', action='store_true', help="не замерять запись в базу")
+    parser.add_argument('--json', dest='json_path', help="сохранить отчет в JSON файл вместо вывода")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = run_benchmark(
+        sizes=[int(size) for size in args.rows.split(',')],
+        days=args.days,
+        exercises=args.exercises,
+        dirty=args.dirty,
+        seed=args.seed,
+        with_db=not args.no_db
+    )
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
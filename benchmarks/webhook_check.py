@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import json
+import logging
+import secrets
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.fsm.storage.base import StorageKey
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from pydantic import SecretStr
+
+from benchmarks.common import USER_ID_BASE, cleanup
+from benchmarks.dispatcher_load import UpdateFactory
+from bot import bot as app
+from configs.config_reader import config
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class TelegramStub:
+    """
+    Локальная заглушка Bot API
+
+    Записывает вызовы методов и отвечает на них с задержкой delay, поэтому
+    видно, что ответ вебхука не ждет обработки обновления.
+    """
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls: List[Tuple[str, Dict[str, Any]]] = []
+        self._message_ids = 0
+        self.app = web.Application()
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        params = dict(await request.post())
+        await asyncio.sleep(self.delay)
+        self.calls.append((method, params))
+        result: Any = True
+        if method == 'sendMessage':
+            self._message_ids += 1
+            result = {
+                'message_id': self._message_ids,
+                'date': int(datetime.now().timestamp()),
+                'chat': {'id': int(params['chat_id']), 'type': 'private'},
+                'text': params.get('text')
+            }
+        return web.json_response({'ok': True, 'result': result})
+
+    async def wait_for(self, method: str, chat_id: int, timeout: float) -> Optional[float]:
+        """
+        Дождаться вызова метода для чата
+
+        Args:
+            method (str): Метод Bot API
+            chat_id (int): Идентификатор чата
+            timeout (float): Сколько ждать в секундах
+
+        Returns:
+            Optional[float]: Через сколько секунд пришел вызов, None - не пришел
+        """
+        start = time.perf_counter()
+        while time.perf_counter() - start < timeout:
+            if any(name == method and params.get('chat_id') == str(chat_id) for name, params in self.calls):
+                return time.perf_counter() - start
+            await asyncio.sleep(0.01)
+        return None
+
+
+async def run_check(delay: float, timeout: float) -> Dict[str, Any]:
+    """
+    Проверка режима вебхука на локальной заглушке Telegram
+
+    Бот собирается как в bot.bot, но telegram_api_url указывает на TelegramStub,
+    а приложение вебхука поднимается на тестовом сервере aiohttp. Проверяется,
+    что запрос с неверным секретом получает 401 и не обрабатывается, запрос
+    с верным секретом получает 200 быстрее ответа заглушки, а обновление
+    обрабатывается в фоне и бот отвечает пользователю.
+
+    Args:
+        delay (float): Задержка ответов заглушки в секундах
+        timeout (float): Сколько ждать фоновой обработки в секундах
+
+    Returns:
+        Dict[str, Any]: Результаты проверок и итог passed
+    """
+    stub = TelegramStub(delay)
+    stub_server = TestServer(stub.app)
+    await stub_server.start_server()
+    config.telegram_api_url = str(stub_server.make_url('')).rstrip('/')
+    secret_token = secrets.token_urlsafe(16)
+    config.webhook_secret = SecretStr(secret_token)
+
+    bot, dp, import_runner = await app.setup_dispatcher()
+    db = app.db
+    user_id = USER_ID_BASE
+    fsm_keys = [
+        dp.storage.key_builder.build(StorageKey(bot_id=bot.id, chat_id=user_id, user_id=user_id))
+    ] if hasattr(dp.storage, 'key_builder') else []
+    updates = UpdateFactory()
+    client = TestClient(TestServer(app.create_webhook_app(bot, dp)))
+    await client.start_server()
+    checks: Dict[str, Any] = {}
+    try:
+        await cleanup(db, [user_id], fsm_keys)
+
+        payload = updates.message(user_id, "/start").model_dump(mode='json', exclude_none=True)
+        response = await client.post(config.webhook_path, json=payload, headers={SECRET_HEADER: 'wrong'})
+        rejected_handled = await stub.wait_for('sendMessage', user_id, timeout=delay + 0.5)
+        checks['wrong_secret'] = {
+            'status': response.status,
+            'passed': response.status == 401 and rejected_handled is None
+        }
+
+        start = time.perf_counter()
+        response = await client.post(config.webhook_path, json=payload, headers={SECRET_HEADER: secret_token})
+        ack = time.perf_counter() - start
+        checks['fast_ack'] = {
+            'status': response.status,
+            'ack_s': round(ack, 4),
+            'passed': response.status == 200 and ack < delay
+        }
+
+        handled = await stub.wait_for('sendMessage', user_id, timeout=timeout)
+        checks['background_handling'] = {
+            'reply_s': round(handled, 4) if handled is not None else None,
+            'api_calls': [name for name, _ in stub.calls],
+            'passed': handled is not None
+        }
+    finally:
+        await client.close()
+        await dp.storage.close()
+        await cleanup(db, [user_id], fsm_keys)
+        await app.shutdown(bot, dp, import_runner)
+        await stub_server.close()
+    return {
+        'stub_delay_s': delay,
+        'checks': checks,
+        'passed': all(check['passed'] for check in checks.values())
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Проверка режима вебхука на локальной заглушке Telegram")
+    parser.add_argument('--delay', type=float, default=0.5, help="задержка ответов заглушки в секундах")
+    parser.add_argument('--timeout', type=float, default=5.0, help="сколько ждать фоновой обработки в секундах")
+    return parser.parse_args()
+
+
+async def main() -> int:
+    args = parse_args()
+    logging.disable(logging.INFO)
+    report = await run_check(args.delay, args.timeout)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if report['passed'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,7 +1,7 @@
 from aiogram.fsm.state import StatesGroup, State
 from database.database import Database
 
-from typing import List
+from typing import Dict, List
 import logging
 
 db: Database = None
@@ -43,10 +43,28 @@ async def load_exercises(telegram_id: int, muscle_group: str) -> List[str]:
     available_exercises = await db.get_exercises_by_muscle_group(telegram_id, muscle_group)
     return available_exercises
 
+async def load_personal_records(telegram_id: int, muscle_group: str) -> Dict[str, float]:
+    """
+    Загрузка рекордных весов в упражнениях группы мышц
+
+    Args:
+        telegram_id (int): Идентификатор пользователя
+        muscle_group (str): Группа мышц
+
+    Returns:
+        records (Dict[str, float]): Рекордный вес по названию упражнения
+    """
+    if db is None or db.pool is None:
+        logger.warning("База данных не инициализирована при загрузке рекордов")
+        return {}
+    records = await db.get_personal_records(telegram_id, muscle_group)
+    return records
+
 class States(StatesGroup):
     start = State()
     import_data = State()
     view_workouts = State()
+    view_progress = State()
     choosing_muscle_group = State()
     adding_muscle_group = State()
     choosing_exercise = State()
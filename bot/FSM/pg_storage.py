@@ -0,0 +1,247 @@
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from typing import Any, Dict, Mapping, Optional, Set
+import asyncio
+import logging
+import json
+import time
+
+import asyncpg
+
+from database.database import Database
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз повторять запись в режиме shared, если состояние изменил другой экземпляр
+WRITE_ATTEMPTS = 3
+
+_KEEP = object()
+
+
+class _Record:
+    __slots__ = ('state', 'data', 'version', 'touched_at')
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None,
+                 version: Optional[int] = None):
+        self.state = state
+        self.data = data if data is not None else {}
+        self.version = version
+        self.touched_at = time.monotonic()
+
+
+class PostgresStorage(BaseStorage):
+    """
+    Хранилище FSM в PostgreSQL с кэшем в памяти
+
+    Работает в одном из двух режимов.
+
+    Один писатель (shared=False): чтения обслуживаются из кэша, в базу идут только
+    промахи. Изменения помечаются грязными и раз в flush_interval секунд сохраняются
+    в базу одной пачкой, поэтому несколько изменений одной сессии за интервал дают
+    одну запись. Кэш не сверяется с базой, поэтому start захватывает владение через
+    Database.lock_fsm_owner: второй экземпляр с тем же токеном не запустится, воркеры
+    супервизора делят владение по шардам. Если владение потеряно и не вернулось,
+    кэш сбрасывается, запись прекращается и выставляется lost - бот должен остановиться.
+
+    Несколько писателей (shared=True), например реплики за балансировщиком: у каждой
+    записи в базе есть версия. Каждое чтение сверяет версию закэшированной записи
+    с базой и перечитывает запись, если ее изменил другой экземпляр, поэтому
+    устаревшее состояние не отдается, а данные повторно не передаются. Изменения
+    пишутся сразу с проверкой версии, при конфликте запись перечитывается и
+    изменение применяется к свежей версии.
+
+    В обоих режимах сессии, к которым не обращались дольше cache_ttl, вытесняются
+    из памяти, а не обновлявшиеся дольше state_ttl - удаляются из базы.
+    """
+    def __init__(self, db: Database, flush_interval: float, cache_ttl: float, state_ttl: float,
+                 shared: bool = False, key_builder: Optional[KeyBuilder] = None):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.cache_ttl = cache_ttl
+        self.state_ttl = state_ttl
+        self.shared = shared
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.conflicts = 0
+        self.lost = asyncio.Event()
+        self._records: Dict[str, _Record] = {}
+        self._dirty: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._owner: Optional[tuple] = None
+        self._lease: Optional[asyncpg.Connection] = None
+
+    async def start(self, bot_id: int, shard: Optional[int] = None) -> None:
+        """
+        Захватить владение состояниями и запустить фоновую запись изменений в базу
+
+        В режиме shared владение не захватывается.
+
+        Args:
+            bot_id (int): Идентификатор бота
+            shard (Optional[int]): Номер воркера супервизора
+
+        Raises:
+            RuntimeError: Состояния уже обслуживает другой экземпляр бота
+        """
+        if not self.shared:
+            self._owner = (bot_id, shard)
+            self._lease = await self.db.lock_fsm_owner(bot_id, shard)
+            if self._lease is None:
+                raise RuntimeError(
+                    f"Состояния FSM бота {bot_id} (шард {shard}) уже обслуживает другой экземпляр. "
+                    "Для нескольких процессов используйте супервизор, для нескольких реплик "
+                    "за балансировщиком - fsm_storage='postgres_shared'"
+                )
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _check_lease(self) -> bool:
+        """
+        Проверить, что владение состояниями не потеряно
+
+        Если соединение с блокировкой оборвалось, владение захватывается заново.
+        Пока его не было, другой экземпляр мог изменить состояния, поэтому чистые
+        записи кэша сбрасываются. Если захватить не удалось, кэш и несохраненные
+        изменения сбрасываются и выставляется lost.
+
+        Returns:
+            bool: Владение у этого экземпляра
+        """
+        if self._lease is not None and not self._lease.is_closed():
+            return True
+        self._lease = await self.db.lock_fsm_owner(*self._owner)
+        if self._lease is None:
+            logger.critical("Владение состояниями FSM потеряно: их обслуживает другой экземпляр бота, "
+                            "несохраненных изменений: %s", len(self._dirty))
+            self._records.clear()
+            self._dirty.clear()
+            self.lost.set()
+            return False
+        logger.warning("Владение состояниями FSM захвачено заново после обрыва соединения")
+        for storage_key in [k for k in self._records if k not in self._dirty]:
+            del self._records[storage_key]
+        return True
+
+    async def _load(self, storage_key: str) -> _Record:
+        if self.lost.is_set():
+            raise RuntimeError("Владение состояниями FSM потеряно, экземпляр останавливается")
+        cached = self._records.get(storage_key)
+        if cached is not None and not self.shared:
+            return cached
+        stored = await self.db.get_fsm_record(storage_key, cached.version if cached is not None else None)
+        record = self._records.get(storage_key)
+        if record is not None and not self.shared:
+            # Запись загрузил параллельный вызов, ее могли уже изменить
+            return record
+        if stored is None:
+            record = _Record()
+        elif stored[2] is None:
+            # Версия в базе совпала с закэшированной
+            record = cached
+        else:
+            record = _Record(stored[1], json.loads(stored[2]), stored[0])
+        self._records[storage_key] = record
+        return record
+
+    async def _record(self, key: StorageKey) -> _Record:
+        record = await self._load(self.key_builder.build(key))
+        record.touched_at = time.monotonic()
+        return record
+
+    async def _write(self, key: StorageKey, state: Any = _KEEP, data: Any = _KEEP) -> None:
+        storage_key = self.key_builder.build(key)
+        if not self.shared:
+            record = await self._record(key)
+            if state is not _KEEP:
+                record.state = state
+            if data is not _KEEP:
+                record.data = data
+            self._dirty.add(storage_key)
+            return
+        for attempt in range(WRITE_ATTEMPTS):
+            # Первая попытка пишет поверх закэшированной версии, без лишнего чтения
+            record = self._records.get(storage_key) if attempt == 0 else None
+            if record is None:
+                record = await self._load(storage_key)
+            new_state = record.state if state is _KEEP else state
+            new_data = record.data if data is _KEEP else data
+            if new_state is None and not new_data:
+                saved = record.version is None or await self.db.delete_fsm_record(storage_key, record.version)
+                version = None
+            else:
+                version = await self.db.save_fsm_record(storage_key, new_state, json.dumps(new_data), record.version)
+                saved = version is not None
+            if saved:
+                self._records[storage_key] = _Record(new_state, new_data, version)
+                return
+            self.conflicts += 1
+            self._records.pop(storage_key, None)
+        raise RuntimeError(f"Состояние FSM {storage_key} изменяется другим экземпляром, запись не удалась")
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._write(key, state=state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._record(key)
+        return record.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._write(key, data=dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._record(key)
+        return record.data.copy()
+
+    async def flush(self) -> None:
+        """
+        Записать накопленные изменения в базу
+        """
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        records, deleted = [], []
+        for storage_key in dirty:
+            record = self._records[storage_key]
+            if record.state is None and not record.data:
+                deleted.append(storage_key)
+            else:
+                records.append((storage_key, record.state, json.dumps(record.data)))
+        try:
+            await self.db.save_fsm_records(records, deleted)
+        except Exception:
+            self._dirty |= dirty
+            raise
+
+    def _evict_idle(self) -> None:
+        deadline = time.monotonic() - self.cache_ttl
+        for storage_key in [k for k, r in self._records.items() if r.touched_at < deadline]:
+            if storage_key not in self._dirty:
+                del self._records[storage_key]
+
+    async def _flush_loop(self) -> None:
+        last_expire = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                if not self.shared and not await self._check_lease():
+                    return
+                await self.flush()
+                self._evict_idle()
+                if time.monotonic() - last_expire >= self.cache_ttl:
+                    await self.db.expire_fsm_records(self.state_ttl)
+                    last_expire = time.monotonic()
+            except Exception as e:
+                logger.error("Ошибка записи состояний FSM: %s", e)
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        if self._flush_task is not None and not self.lost.is_set():
+            if self.shared or await self._check_lease():
+                await self.flush()
+        if self._lease is not None:
+            await self._lease.close()
+            self._lease = None
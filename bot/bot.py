@@ -1,11 +1,27 @@
 import logging
 import asyncio
+from contextlib import suppress
+from pathlib import Path
+from typing import Awaitable, Dict, Optional, Tuple
 
 from aiogram import Bot, Dispatcher
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
 from bot.handlers import user_input_handler, keyboard_handler
 from bot.FSM import fsm_states
+from bot.FSM.pg_storage import PostgresStorage
+from bot.jobs.import_runner import ImportRunner
+from bot.keyboard.session import KeyboardSession
+from bot.middlewares.metrics import MetricsMiddleware
 
 from database.database import Database
+from database.cache import UserCache, collect_caches
+from database.journal import SetJournal
+from analytics.charts import ProgressCharts
+from metrics.handlers import HandlerMetrics
+from metrics.prometheus import MetricsServer
 
 from configs.logger_config import setup_logging
 from configs.config_reader import config
@@ -15,9 +31,133 @@ from configs.config_reader import config
 setup_logging()
 logger = logging.getLogger(__name__)
 db = Database()
+handler_metrics = HandlerMetrics()
 
 
-async def main():
+def user_caches() -> Dict[str, UserCache]:
+    """
+    Кэши данных пользователей для метрик
+
+    Returns:
+        Dict[str, UserCache]: Кэши по имени
+    """
+    caches = {'catalog': db.catalog_cache, 'records': db.records_cache}
+    if keyboard_handler.progress_charts is not None:
+        caches['charts'] = keyboard_handler.progress_charts.cache
+    return caches
+
+
+metrics_server = MetricsServer(
+    [
+        handler_metrics.collect,
+        lambda: db.pool_metrics.collect(db.pool),
+        db.tracer.collect,
+        db.queries.collect,
+        lambda: collect_caches(user_caches())
+    ],
+    reports={
+        'queries': db.query_stats,
+        'pool': db.pool_stats,
+        'caches': lambda: {name: cache.stats() for name, cache in user_caches().items()}
+    }
+)
+
+
+def create_bot() -> Bot:
+    """
+    Создание бота
+
+    Если задан telegram_api_url, запросы идут на него вместо api.telegram.org
+    (локальный Bot API сервер или заглушка для тестов). KeyboardSession отправляет
+    клавиатуры заранее сериализованными.
+
+    Returns:
+        Bot: Бот
+    """
+    api = TelegramAPIServer.from_base(config.telegram_api_url) if config.telegram_api_url else PRODUCTION
+    return Bot(token=config.bot_token.get_secret_value(), session=KeyboardSession(api=api))
+
+
+async def run_polling(bot: Bot, dp: Dispatcher) -> None:
+    """
+    Получение обновлений через long polling
+
+    Args:
+        bot (Bot): Бот
+        dp (Dispatcher): Диспетчер
+    """
+    await bot.delete_webhook(drop_pending_updates=True)
+    await dp.start_polling(bot, allowed_updates=config.allowed_updates)
+
+
+def create_webhook_app(bot: Bot, dp: Dispatcher) -> web.Application:
+    """
+    aiohttp приложение вебхука
+
+    Запрос проверяется по секретному токену, Telegram сразу получает 200,
+    а обновление обрабатывается в фоне.
+
+    Args:
+        bot (Bot): Бот
+        dp (Dispatcher): Диспетчер
+
+    Returns:
+        web.Application: Приложение с обработчиком на webhook_path
+    """
+    secret_token = config.webhook_secret.get_secret_value() if config.webhook_secret else None
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret_token,
+        handle_in_background=True
+    ).register(app, path=config.webhook_path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    """
+    Получение обновлений через вебхук на встроенном aiohttp сервере
+
+    Несколько реплик за балансировщиком требуют fsm_storage='postgres_shared':
+    с 'postgres' вторая реплика не запустится, с 'memory' пользователь теряет
+    состояние, когда балансировщик отправляет его на другую реплику.
+
+    Args:
+        bot (Bot): Бот
+        dp (Dispatcher): Диспетчер
+    """
+    app = create_webhook_app(bot, dp)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.webhook_host, port=config.webhook_port)
+    await site.start()
+    logger.info("Вебхук слушает %s:%s%s", config.webhook_host, config.webhook_port, config.webhook_path)
+
+    await bot.set_webhook(
+        url=config.webhook_url.rstrip('/') + config.webhook_path,
+        secret_token=config.webhook_secret.get_secret_value() if config.webhook_secret else None,
+        max_connections=config.webhook_max_connections,
+        allowed_updates=config.allowed_updates,
+        drop_pending_updates=True
+    )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def setup_dispatcher(shard: Optional[int] = None) -> Tuple[Bot, Dispatcher, ImportRunner]:
+    """
+    Подключение к базе данных и сборка бота и диспетчера
+
+    Args:
+        shard (Optional[int]): Номер воркера супервизора, у каждого воркера свой журнал подходов
+
+    Returns:
+        Tuple[Bot, Dispatcher, ImportRunner]: Бот, диспетчер и раннер импорта
+    """
     logger.info("Инициализация базы данных")
     await db.create_pool()
     await db.init_tables()
@@ -25,16 +165,123 @@ async def main():
     user_input_handler.db = db
     keyboard_handler.db = db
     fsm_states.db = db
+    progress_charts = ProgressCharts(
+        db,
+        cache=UserCache(max_users=config.chart_cache_max_users, ttl=config.chart_cache_ttl),
+        max_points=config.chart_max_points
+    )
+    keyboard_handler.progress_charts = progress_charts
+    import_runner = ImportRunner(
+        db,
+        max_workers=config.import_workers,
+        max_concurrency=config.import_max_concurrency,
+        progress_interval=config.import_progress_interval,
+        on_import=progress_charts.invalidate
+    )
+    user_input_handler.import_runner = import_runner
 
-
-    bot = Bot(token=config.bot_token.get_secret_value())
-    dp = Dispatcher()
+    bot = create_bot()
+    storage = None
+    if config.fsm_storage in ('postgres', 'postgres_shared'):
+        storage = PostgresStorage(
+            db,
+            flush_interval=config.fsm_flush_interval,
+            cache_ttl=config.fsm_cache_ttl,
+            state_ttl=config.fsm_state_ttl,
+            shared=config.fsm_storage == 'postgres_shared'
+        )
+    dp = Dispatcher(storage=storage)
     dp.include_routers(user_input_handler.router, keyboard_handler.router)
+    MetricsMiddleware(handler_metrics).setup(dp)
+
+    try:
+        # Владение состояниями захватывается до открытия журнала подходов:
+        # если бот уже запущен, журнал не открывается и не выгружается вторым экземпляром
+        if storage is not None:
+            await storage.start(bot.id, shard)
+        if config.set_write_mode == 'journal':
+            journal_path = Path(config.set_journal_path)
+            if shard is not None:
+                journal_path = journal_path.with_name(f"{journal_path.stem}-{shard}{journal_path.suffix}")
+            user_input_handler.set_journal = SetJournal(
+                db,
+                path=str(journal_path),
+                flush_interval=config.set_journal_flush_interval,
+                batch_size=config.set_journal_batch_size,
+                max_attempts=config.set_journal_max_attempts
+            )
+            await user_input_handler.set_journal.start()
+        if config.metrics_port is not None:
+            # У каждого воркера супервизора свой процесс и свои метрики
+            await metrics_server.start(config.metrics_host, config.metrics_port + (shard or 0))
+    except BaseException:
+        await shutdown(bot, dp, import_runner)
+        raise
+    return bot, dp, import_runner
+
+
+async def shutdown(bot: Bot, dp: Dispatcher, import_runner: ImportRunner) -> None:
+    """
+    Остановка фоновых задач и закрытие соединений
+
+    Args:
+        bot (Bot): Бот
+        dp (Dispatcher): Диспетчер
+        import_runner (ImportRunner): Раннер импорта
+    """
+    await import_runner.close()
+    keyboard_handler.progress_charts.close()
+    if user_input_handler.set_journal is not None:
+        await user_input_handler.set_journal.close()
+    await dp.storage.close()
+    await metrics_server.close()
+    await bot.session.close()
+    await db.pool.close()
+
+
+async def run_until_storage_lost(dp: Dispatcher, delivery: Awaitable[None]) -> None:
+    """
+    Получение обновлений, пока экземпляр владеет состояниями FSM
+
+    Если PostgresStorage потеряло владение состояниями, получение обновлений
+    останавливается: иначе экземпляр обслуживал бы пользователей без состояний.
+
+    Args:
+        dp (Dispatcher): Диспетчер
+        delivery (Awaitable[None]): Получение обновлений, run_polling или run_webhook
+
+    Raises:
+        RuntimeError: Владение состояниями FSM потеряно
+    """
+    task = asyncio.ensure_future(delivery)
+    if not isinstance(dp.storage, PostgresStorage):
+        await task
+        return
+    lost = asyncio.create_task(dp.storage.lost.wait())
+    try:
+        await asyncio.wait({task, lost}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        lost.cancel()
+    if not task.done():
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+        raise RuntimeError("Владение состояниями FSM потеряно, бот остановлен")
+    await task
+
+
+async def main():
+    bot, dp, import_runner = await setup_dispatcher()
 
     logger.info("Бот запускается")
 
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    try:
+        if config.delivery_mode == 'webhook':
+            await run_until_storage_lost(dp, run_webhook(bot, dp))
+        else:
+            await run_until_storage_lost(dp, run_polling(bot, dp))
+    finally:
+        await shutdown(bot, dp, import_runner)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,21 +1,25 @@
 from aiogram import Router, F
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery
+from aiogram.types import BufferedInputFile, CallbackQuery
 
 from database.database import Database
+from analytics.charts import ProgressCharts
+from configs.config_reader import config
 
 from datetime import datetime
+from typing import Dict, List
 import logging
 
-from bot.FSM.fsm_states import States, load_muscle_groups, load_exercises
+from bot.FSM.fsm_states import States, load_muscle_groups, load_exercises, load_personal_records
 from bot.keyboard.keyboard import start_workout_keyboard, get_exercise_keyboard, get_back_to_exercises, \
                                     get_main_keyboard, get_last_workouts_keyboard, back_from_workout_view
 
 
 db: Database = None
+progress_charts: ProgressCharts = None
 
-router = Router()
+router = Router(name=__name__)
 
 logger = logging.getLogger(__name__)
 
@@ -81,9 +85,9 @@ async def create_new_workout(callback: CallbackQuery, state: FSMContext):
         return
     user = callback.from_user
     logger.info("Пользователь %s начал новую тренировку", user.id)
-    workout_id = await db.create_workout(user.id)
-
-    await state.update_data(workout_id=workout_id)
+    # Тренировка создается в базе с первым подходом, чтобы в истории
+    # не оставались пустые тренировки
+    await state.update_data(workout_id=None, workout_client_id=None)
     muscle_groups = await load_muscle_groups(user.id)
 
     text = f"""
@@ -118,14 +122,14 @@ async def select_muscle_group(callback: CallbackQuery, state: FSMContext):
     muscle_group = callback.data.split(":")[1]
     await state.update_data(muscle_group=muscle_group)
     exersices = await load_exercises(user.id, muscle_group)
-    await state.update_data(set_order={})
+    records = await load_personal_records(user.id, muscle_group)
     text = f"""
     Вы выбрали {muscle_group}.
 Выберите упражнение:
     """
     await callback.message.edit_text(
         text,
-        reply_markup=get_exercise_keyboard(exersices)
+        reply_markup=get_exercise_keyboard(exersices, records)
     )
     await state.set_state(States.choosing_exercise)
 
@@ -183,14 +187,14 @@ async def select_muscle_group(callback: CallbackQuery, state: FSMContext):
     muscle_group = callback.data.split(":")[1]
     await state.update_data(muscle_group=muscle_group)
     exersices = await load_exercises(user.id, muscle_group)
-    await state.update_data(set_order={})
+    records = await load_personal_records(user.id, muscle_group)
     text = f"""
     Вы выбрали {muscle_group}.
 Выберите упражнение:
     """
     await callback.message.edit_text(
         text,
-        reply_markup=get_exercise_keyboard(exersices)
+        reply_markup=get_exercise_keyboard(exersices, records)
     )
     await state.set_state(States.choosing_exercise)
     
@@ -224,7 +228,8 @@ async def select_exercise(callback: CallbackQuery, state: FSMContext):
     text = f"""
     Вы выбрали {exercise}.
 Введите количество килограм и повторений
-(например, 20 10):
+(например, 20 10).
+Можно сразу несколько подходов: 80x10 85x8 90x6 или 3x10@80
     """
     await callback.message.edit_text(
         text,
@@ -254,13 +259,14 @@ async def back_to_choosing_exercise(callback: CallbackQuery, state: FSMContext):
     user_data = await state.get_data()
     muscle_group = user_data['muscle_group']
     exersices = await load_exercises(user.id, muscle_group)
+    records = await load_personal_records(user.id, muscle_group)
     text = f"""
     Вы выбрали {muscle_group}.
 Выберите упражнение:
     """
     await callback.message.edit_text(
         text,
-        reply_markup=get_exercise_keyboard(exersices)
+        reply_markup=get_exercise_keyboard(exersices, records)
     )
     await state.set_state(States.choosing_exercise)
 
@@ -348,15 +354,70 @@ async def view_workouts(callback: CallbackQuery, state: FSMContext):
         return
     await state.set_data({})
     user = callback.from_user
-    dates = await db.get_workout_dates(telegram_id=user.id)
+    workouts, has_more = await db.get_workouts_page(telegram_id=user.id, limit=config.history_page_size)
+    await show_workouts_page(callback, workouts, has_newer=False, has_older=has_more)
+    await state.set_state(States.view_workouts)
+
+@router.callback_query(
+        States.view_workouts,
+        F.data.startswith("history:"))
+async def page_workouts(callback: CallbackQuery, state: FSMContext):
+    """
+    Хендлер листания истории тренировок
+
+    В callback data лежит направление и курсор (date, id) крайней тренировки
+    текущей страницы.
+
+    Args:
+        callback (CallbackQuery): кнопка, на которую нажал пользователь
+        state (FSMContext): состояние, в котором находится пользователь
+
+    Returns:
+        Новое сообщение с клавиатурой
+    """
+    if db is None or db.pool is None:
+        logger.warning("База данных не инициализирована")
+        await callback.message.edit_text("Бот инициализируется, попробуйте через несколько секунд...")
+        return
+    user = callback.from_user
+    _, direction, date, workout_id = callback.data.split(":")
+    cursor = (datetime.strptime(date, "%Y-%m-%d").date(), int(workout_id))
+    older = direction == "older"
+    workouts, has_more = await db.get_workouts_page(
+        telegram_id=user.id, limit=config.history_page_size, cursor=cursor, older=older
+    )
+    if not workouts:
+        await callback.answer("Больше тренировок нет")
+        return
+    if older:
+        await show_workouts_page(callback, workouts, has_newer=True, has_older=has_more)
+    else:
+        await show_workouts_page(callback, workouts, has_newer=has_more, has_older=True)
+
+async def show_workouts_page(callback: CallbackQuery, workouts: List[Dict],
+                             has_newer: bool, has_older: bool):
+    """
+    Показать страницу истории тренировок
+
+    Args:
+        callback (CallbackQuery): кнопка, на которую нажал пользователь
+        workouts (List[Dict]): Тренировки страницы (id, date) от новых к старым
+        has_newer (bool): Есть ли более новые тренировки
+        has_older (bool): Есть ли более старые тренировки
+    """
+    newer = older = None
+    if workouts:
+        if has_newer:
+            newer = f"{workouts[0]['date']}:{workouts[0]['id']}"
+        if has_older:
+            older = f"{workouts[-1]['date']}:{workouts[-1]['id']}"
     text = f"""
 Выберите тренировку:
     """
     await callback.message.edit_text(
         text,
-        reply_markup=get_last_workouts_keyboard(dates)
+        reply_markup=get_last_workouts_keyboard([(w['id'], str(w['date'])) for w in workouts], newer, older)
     )
-    await state.set_state(States.view_workouts)
 
 @router.callback_query(
         States.view_workouts,
@@ -377,22 +438,56 @@ async def select_workout(callback: CallbackQuery, state: FSMContext):
         await callback.message.edit_text("Бот инициализируется, попробуйте через несколько секунд...")
         return
     user = callback.from_user
-    date = callback.data.split(":")[1]
-    date = datetime.strptime(date, "%Y-%m-%d")
-    workout = await db.get_workout_by_date(telegram_id=user.id, date=date)
+    workout_id = int(callback.data.split(":")[1])
+    workout = await db.get_workout(workout_id=workout_id, telegram_id=user.id)
+    if workout is None:
+        await callback.answer("Тренировка не найдена")
+        return
     text = f"""
-Тренировка {str(date)}:
+Тренировка {workout['date']}:
 """
-    for item in workout:
-        text += f"{item['name']} - Подход: {item['set_order']} - {item['weight']}кг × {item['reps']} повторений\n"
+    for exercise in workout['exercises']:
+        text += f"\n{exercise['name']}:\n"
+        for s in exercise['sets']:
+            text += f"Подход: {s['set_order']} - {s['weight']}кг × {s['reps']} повторений\n"
     await callback.message.edit_text(
         text,
         reply_markup=back_from_workout_view()
     )
     await state.set_state(States.view_workouts)
 
+###########################
+# Flow графиков прогресса
+###########################
+@router.callback_query(
+        States.view_progress,
+        F.data.startswith("progress:"))
+async def show_progress(callback: CallbackQuery, state: FSMContext):
+    """
+    Хендлер нажатия на упражнение в списке графиков прогресса
+
+    Args:
+        callback (CallbackQuery): кнопка, на которую нажал пользователь
+        state (FSMContext): состояние, в котором находится пользователь
+
+    Returns:
+        Новое сообщение с графиком
+    """
+    if db is None or db.pool is None:
+        logger.warning("База данных не инициализирована")
+        await callback.message.edit_text("Бот инициализируется, попробуйте через несколько секунд...")
+        return
+    user = callback.from_user
+    exercise_id = int(callback.data.split(":")[1])
+    chart = await progress_charts.render(user.id, exercise_id)
+    if chart is None:
+        await callback.answer("По упражнению пока нет подходов")
+        return
+    await callback.message.answer_photo(BufferedInputFile(chart, filename="progress.png"))
+    await callback.answer()
+
 @router.callback_query(
-        StateFilter(States.view_workouts, States.view_workouts),
+        StateFilter(States.view_workouts, States.view_progress),
         F.data == 'back_to_main')
 async def back_to_main(callback: CallbackQuery, state: FSMContext):
     """
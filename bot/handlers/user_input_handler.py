@@ -3,21 +3,29 @@ from aiogram.filters import Command, StateFilter
 from aiogram.types import Message, ContentType
 from aiogram.fsm.context import FSMContext
 
+from decimal import Decimal
+from typing import Optional
 import tempfile
+import os
+import uuid
 
 from database.database import Database
+from database.journal import SetJournal
 
-from bot.keyboard.keyboard import get_main_keyboard, get_back_to_exercises
+from bot.keyboard.keyboard import get_main_keyboard, get_back_to_exercises, get_progress_keyboard
 from bot.FSM.fsm_states import States
-from dataloader.dataloader import Dataloader
+from bot.parsers.sets import parse_sets
+from bot.jobs.import_runner import ImportRunner
 
 import logging
 
 db: Database = None
+import_runner: ImportRunner = None
+set_journal: SetJournal = None
 
 logger = logging.getLogger(__name__)
 
-router = Router()
+router = Router(name=__name__)
 
 @router.message(StateFilter(None), Command("start"))
 async def command_start(message: Message, state: FSMContext):
@@ -38,7 +46,6 @@ async def command_start(message: Message, state: FSMContext):
     user = message.from_user
     logger.info("Получена /start команда от user_id=%s", user.id)
     user_id = await db.get_create_user(user.id)
-    await db._fill_exercises(user.id)
 
     text = f"""
     Привет, {user.first_name}!
@@ -56,11 +63,80 @@ async def command_start(message: Message, state: FSMContext):
     await state.set_state(States.start)
 
 
+def _format_number(value: Optional[Decimal]) -> str:
+    return f"{value.normalize():f}" if value is not None else "—"
+
+@router.message(Command("stats"))
+async def command_stats(message: Message, state: FSMContext):
+    """
+    Хендлер команды /stats
+
+    Статистика читается из EXERCISE_STATS и не требует сканирования подходов.
+
+    Args:
+        message (Message): сообщение пользователя
+        state (FSMContext): состояние, в котором находится пользователь
+
+    Returns:
+        Новое сообщение со статистикой по упражнениям
+    """
+    if db is None or db.pool is None:
+        logger.warning("База данных не инициализирована")
+        await message.answer("Бот инициализируется, попробуйте через несколько секунд...")
+        return
+    user = message.from_user
+    stats = await db.get_exercise_stats(user.id)
+    if not stats:
+        await message.answer("Статистики пока нет: запишите подходы или импортируйте тренировки")
+        return
+    text = "Ваши рекорды:\n"
+    for item in stats:
+        text += f"""
+{item['name']} ({item['muscle_group']}):
+Рекорд: {_format_number(item['best_weight'])}кг, 1ПМ ≈ {_format_number(item['best_1rm'])}кг
+Объем: {_format_number(item['total_volume'])}кг за {item['set_count']} подходов
+Последний раз: {item['last_date']}
+"""
+    await message.answer(text)
+
+
+@router.message(Command("progress"))
+async def command_progress(message: Message, state: FSMContext):
+    """
+    Хендлер команды /progress
+
+    Args:
+        message (Message): сообщение пользователя
+        state (FSMContext): состояние, в котором находится пользователь
+
+    Returns:
+        Новое сообщение с клавиатурой выбора упражнения
+    """
+    if db is None or db.pool is None:
+        logger.warning("База данных не инициализирована")
+        await message.answer("Бот инициализируется, попробуйте через несколько секунд...")
+        return
+    user = message.from_user
+    stats = await db.get_exercise_stats(user.id)
+    if not stats:
+        await message.answer("Графиков пока нет: запишите подходы или импортируйте тренировки")
+        return
+    await state.set_data({})
+    await message.answer(
+        "Выберите упражнение:",
+        reply_markup=get_progress_keyboard([(item['exercise'], item['name']) for item in stats])
+    )
+    await state.set_state(States.view_progress)
+
+
 @router.message(States.entering_set_info)
 async def enter_set_information(message: Message, state: FSMContext):
     """
-    Хендлер ввода данных о первом подходе
-    
+    Хендлер ввода данных о подходах
+
+    В одном сообщении можно передать несколько подходов, они записываются
+    одним запросом.
+
     Args:
         message (Message): сообщение пользователя
         state (FSMContext): состояние, в котором находится пользователь
@@ -72,35 +148,51 @@ async def enter_set_information(message: Message, state: FSMContext):
         logger.warning("База данных не инициализирована")
         await message.answer("Бот инициализируется, попробуйте через несколько секунд...")
         return
-    user = message.from_user
-    ## TODO обернуть в трайкетч и добавить валидацию
+    try:
+        new_sets = parse_sets(message.text or "")
+    except ValueError as e:
+        await message.answer(
+            f"{e}\nПримеры: 80 10, 80x10 85x8 90x6, 3x10@80, 82.5x8",
+            reply_markup=get_back_to_exercises()
+        )
+        return
     user_data = await state.get_data()
     workout_id = user_data.get("workout_id")
+    workout_client_id = user_data.get("workout_client_id")
     exercise_id = user_data.get("exercise_id")
-    exercise = user_data.get("exercise")
-    set_order = user_data['set_order'].get(exercise, 0) + 1
-    weight, reps = (int(number) for number in message.text.split())
-    logger.debug("Добавление подхода: workout_id=%s, exercise_id=%s, set_order=%s, weight=%s, reps=%s",
-                 workout_id, exercise_id, set_order, weight, reps)
-    await db.add_set_to_workout(workout_id, exercise_id, set_order, weight, reps)
-    data_updates = {
-        'exercise': exercise,
-        'exercise_id': exercise_id,
-        'set_order': {**user_data['set_order'], exercise: set_order} 
-    }
-    await state.update_data(**data_updates)
-    sets = await db.get_workout_sets_by_exercise(exercise_id, workout_id)
-    text = """
+    if workout_id is None and workout_client_id is None:
+        # Идентификатор тренировки назначает бот, поэтому в режиме журнала
+        # тренировка создается в базе при выгрузке и первый подход не ждет базу
+        workout_client_id = str(uuid.uuid4())
+        await state.update_data(workout_client_id=workout_client_id)
+    logger.debug("Добавление подходов: workout_id=%s, workout_client_id=%s, exercise_id=%s, sets=%s",
+                 workout_id, workout_client_id, exercise_id, new_sets)
+    if set_journal is not None:
+        # Подходы подтверждаются после записи в локальный журнал, в базу они
+        # попадут фоновой выгрузкой, поэтому номера подходов еще не известны
+        await set_journal.append(workout_id, exercise_id, new_sets,
+                                 workout_client_id=workout_client_id, telegram_id=message.from_user.id)
+        text = """
+Данные записаны!
+Новые подходы:
+"""
+        for weight, reps in new_sets:
+            text += f"{_format_number(weight)}кг × {reps} повторений\n"
+    else:
+        if workout_id is None:
+            workout_id = await db.create_workout(message.from_user.id, uuid.UUID(workout_client_id))
+            await state.update_data(workout_id=workout_id)
+        sets = await db.log_sets(message.from_user.id, workout_id, exercise_id, new_sets)
+        text = """
 Данные записаны!                  
 Текущие подходы:                   
 """
-    for item in sets:
-        text += f"{item['set_order']}: {item['weight']}кг × {item['reps']} повторений\n"
+        for item in sets:
+            text += f"{item['set_order']}: {_format_number(item['weight'])}кг × {item['reps']} повторений\n"
     await message.answer(
         text,
         reply_markup=get_back_to_exercises()
     )
-    await state.set_state(States.entering_set_info)
 
 @router.message(States.adding_exercise)
 async def enter_exrcise_information(message: Message, state: FSMContext):
@@ -135,7 +227,8 @@ async def enter_exrcise_information(message: Message, state: FSMContext):
 Введите первый подход в формате:
 Вес Повторения
 Пример:
-80 10                 
+80 10
+Можно сразу несколько подходов: 80x10 85x8 90x6 или 3x10@80
 """
     await message.answer(
         text,
@@ -166,37 +259,25 @@ async def import_data_handler(message: Message, state: FSMContext):
     if not document.file_name.endswith('.csv'):
         await message.answer("Пожалуйста, отправьте файл в формате CSV.")
         return
-    file = await message.bot.get_file(document.file_id)
-    file_path = file.file_path
-    with tempfile.NamedTemporaryFile(mode='wb', suffix='.csv', delete=False) as temp_file:
-            await message.bot.download_file(file_path, temp_file.name)
-            dataloader = Dataloader(temp_file.name)
-            dataloader.set_order()
-            dataloader.filter_data()
-            muscle_groups = dataloader.get_muscle_groups()
-            exercise_ids = {}
-            for muscle_group in muscle_groups:
-                exercises = dataloader.get_exercises_by_muscle_group(muscle_group)
-                for exercise in exercises:
-                    exercise_id = await db.create_exercise(telegram_id=user.id, muscle_group=muscle_group, name=exercise)
-                    if exercise not in exercise_ids:
-                        exercise_ids[exercise] = exercise_id
-            workouts = dataloader.get_workouts()
-            for workout_date, workout_data in workouts.items():
-                workout_id = await db.import_workout(telegram_id=user.id, date=workout_date)
-                for set_info in workout_data['sets']:
-                    exercise_id = exercise_ids.get(set_info['exercise'])
-                    await db.add_set_to_workout(
-                        workout_id=workout_id,
-                        exercise_id=exercise_id,
-                        set_order=set_info['set_number'],
-                        weight=set_info['weight'],
-                        reps=set_info['reps']
-                    )
-    text = "Данные успешно импортированы!"
-    await message.answer(
-        text,
-        reply_markup=get_main_keyboard()
-    )
+    if not import_runner.try_reserve(user.id):
+        await message.answer("Импорт уже выполняется, дождитесь его завершения.")
+        return
+    temp_path = None
+    try:
+        file = await message.bot.get_file(document.file_id)
+        file_path = file.file_path
+        with tempfile.NamedTemporaryFile(mode='wb', suffix='.csv', delete=False) as temp_file:
+            temp_path = temp_file.name
+            await message.bot.download_file(file_path, temp_path)
+        text = "Импорт начат! Прогресс будет отображаться в этом сообщении."
+        progress_message = await message.answer(
+            text,
+            reply_markup=get_main_keyboard()
+        )
+    except Exception:
+        import_runner.release(user.id)
+        if temp_path is not None:
+            os.remove(temp_path)
+        raise
+    import_runner.submit(user.id, temp_path, progress_message)
     await state.set_state(States.start)
-
@@ -0,0 +1,193 @@
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import Message
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional
+import multiprocessing
+import asyncio
+import logging
+import os
+
+from database.database import Database
+from dataloader.dataloader import Dataloader
+from bot.keyboard.keyboard import get_main_keyboard
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_import(csv_path: str, records_path: str) -> int:
+    """
+    Разбор CSV файла в отдельном процессе
+
+    Подходы потоково пишутся в файл записей, обратно в основной процесс
+    возвращается только их количество.
+
+    Args:
+        csv_path (str): Путь к CSV файлу
+        records_path (str): Путь к файлу записей для Database.bulk_import_file
+
+    Returns:
+        int: Количество подходов
+    """
+    return Dataloader.write_records(csv_path, records_path)
+
+
+class ImportProgress:
+    """
+    Сообщение с прогрессом импорта
+
+    Загрузка только записывает прогресс через report, а сообщение редактирует
+    отдельная задача не чаще раза в interval секунд. Транзакция импорта не ждет
+    Telegram, и ошибки Telegram не прерывают импорт.
+    """
+    def __init__(self, message: Message, total: int, interval: float):
+        self.message = message
+        self.total = total
+        self.interval = interval
+        self.imported = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def report(self, imported: int) -> None:
+        self.imported = imported
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _watch(self) -> None:
+        shown = 0
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.imported != shown:
+                shown = self.imported
+                await self.edit(f"Импорт данных: загружено {shown} из {self.total} подходов...")
+
+    async def edit(self, text: str) -> None:
+        # TelegramAPIError покрывает и флуд-контроль, и сетевые ошибки
+        try:
+            await self.message.edit_text(text, reply_markup=get_main_keyboard())
+        except TelegramAPIError as e:
+            logger.warning("Не удалось обновить сообщение о прогрессе импорта: %s", e)
+
+
+class ImportRunner:
+    """
+    Фоновый запуск импорта CSV файлов
+
+    Разбор файла выполняется в пуле процессов и пишется во временный файл записей,
+    который фоновая задача на event loop потоком передает в COPY. Количество одновременных импортов ограничено семафором,
+    у одного пользователя может выполняться только один импорт. После импорта
+    вызывается on_import, например для сброса кэшей пользователя.
+    """
+    def __init__(self, db: Database, max_workers: int, max_concurrency: int,
+                 progress_interval: float, on_import: Optional[Callable[[int], None]] = None):
+        self.db = db
+        self.progress_interval = progress_interval
+        self.on_import = on_import
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._jobs: Dict[int, Optional[asyncio.Task]] = {}
+
+    def is_running(self, telegram_id: int) -> bool:
+        """
+        Проверить, выполняется ли импорт пользователя
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+
+        Returns:
+            bool: True, если импорт уже запущен или место под него зарезервировано
+        """
+        return telegram_id in self._jobs
+
+    def try_reserve(self, telegram_id: int) -> bool:
+        """
+        Зарезервировать импорт пользователя
+
+        Резерв ставится синхронно до первого await в хендлере, поэтому две быстрые
+        загрузки одного пользователя не запустят два импорта. Резерв занимается
+        через submit или снимается через release.
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+
+        Returns:
+            bool: False, если у пользователя уже есть импорт или резерв
+        """
+        if telegram_id in self._jobs:
+            return False
+        self._jobs[telegram_id] = None
+        return True
+
+    def release(self, telegram_id: int) -> None:
+        """
+        Снять резерв, если импорт так и не был поставлен в очередь
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+        """
+        if self._jobs.get(telegram_id, False) is None:
+            del self._jobs[telegram_id]
+
+    def submit(self, telegram_id: int, csv_path: str, progress_message: Message) -> None:
+        """
+        Поставить импорт в очередь на место резерва try_reserve
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+            csv_path (str): Путь к временному CSV файлу, удаляется после импорта
+            progress_message (Message): Сообщение, в котором отображается прогресс
+        """
+        task = asyncio.create_task(self._run(telegram_id, csv_path, progress_message))
+        self._jobs[telegram_id] = task
+        task.add_done_callback(lambda _: self._jobs.pop(telegram_id, None))
+
+    async def _run(self, telegram_id: int, csv_path: str, progress_message: Message) -> None:
+        progress = ImportProgress(progress_message, total=0, interval=self.progress_interval)
+        records_path = f"{csv_path}.records"
+        try:
+            async with self._semaphore:
+                logger.info("Импорт данных пользователя %s начат", telegram_id)
+                loop = asyncio.get_running_loop()
+                progress.total = await loop.run_in_executor(
+                    self._executor, prepare_import, csv_path, records_path
+                )
+                progress.start()
+                imported = await self.db.bulk_import_file(
+                    telegram_id=telegram_id,
+                    path=records_path,
+                    on_batch=progress.report
+                )
+                await progress.stop()
+            if self.on_import is not None:
+                self.on_import(telegram_id)
+            logger.info("Импорт данных пользователя %s завершен", telegram_id)
+            await progress.edit(
+                f"Данные успешно импортированы! Новых и измененных тренировок: {imported['workouts']}, "
+                f"без изменений: {imported['skipped']}. Загружено подходов: {imported['sets']}"
+            )
+        except Exception as e:
+            logger.error("Ошибка импорта данных пользователя %s: %s", telegram_id, e)
+            await progress.stop()
+            await progress.edit("Не удалось импортировать данные. Проверьте формат файла.")
+        finally:
+            for path in (csv_path, records_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    async def close(self) -> None:
+        """
+        Дождаться запущенных импортов и остановить пул процессов
+        """
+        await asyncio.gather(*(task for task in self._jobs.values() if task is not None),
+                             return_exceptions=True)
+        self._executor.shutdown()
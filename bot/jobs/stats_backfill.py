@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import time
+
+from database.database import Database
+from configs.logger_config import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill_stats(db: Database, batch_size: int = 500) -> int:
+    """
+    Заполнение EXERCISE_STATS по истории подходов
+
+    При обновлении статистику заполняет миграция 0014, задача нужна, чтобы
+    пересчитать ее повторно. Пользователи обрабатываются пачками, каждая пачка
+    пересчитывается отдельной транзакцией, поэтому задачу можно прервать и запустить снова.
+
+    Args:
+        db (Database): База данных
+        batch_size (int): Количество пользователей в одной транзакции
+
+    Returns:
+        int: Количество записанных строк статистики
+    """
+    total, after = 0, -1
+    start = time.perf_counter()
+    while users := await db.get_user_ids(after, batch_size):
+        total += await db.rebuild_exercise_stats(users)
+        after = users[-1]
+    logger.info("Статистика упражнений заполнена: %s строк за %.1f с", total, time.perf_counter() - start)
+    return total
+
+
+async def main():
+    setup_logging()
+    db = Database()
+    await db.create_pool()
+    try:
+        await db.init_tables()
+        await backfill_stats(db)
+    finally:
+        await db.pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,5 +1,52 @@
-from typing import List
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import json
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from pydantic import PrivateAttr
+
+from configs.config_reader import config
+
+
+class PreparedKeyboard(InlineKeyboardMarkup):
+    """
+    Клавиатура с заранее сериализованным JSON
+
+    Модели aiogram неизменяемые, поэтому один объект можно отправлять
+    в любое количество сообщений, а KeyboardSession берет готовый JSON
+    вместо повторной сериализации.
+    """
+    _serialized: str = PrivateAttr(default='')
+
+    @property
+    def serialized(self) -> str:
+        return self._serialized
+
+
+def _prepare(keyboard: List[List[InlineKeyboardButton]]) -> PreparedKeyboard:
+    markup = PreparedKeyboard(inline_keyboard=keyboard)
+    markup._serialized = json.dumps(markup.model_dump(exclude_none=True))
+    return markup
+
+
+MAIN_KEYBOARD = _prepare([
+    [
+        InlineKeyboardButton(text="Новая тренировка", callback_data="new_workout"),
+        InlineKeyboardButton(text="Мои тренировки", callback_data="my_workouts"),
+        InlineKeyboardButton(text="Импорт данных", callback_data="import_data")
+    ]
+])
+
+BACK_TO_EXERCISES_KEYBOARD = _prepare([
+    [InlineKeyboardButton(text="Завершить тренировку", callback_data="finish_workout")],
+    [InlineKeyboardButton(text="Назад", callback_data="back_to_exercise")]
+])
+
+BACK_FROM_WORKOUT_VIEW_KEYBOARD = _prepare([
+    [InlineKeyboardButton(text="В главное меню", callback_data="back_to_main")],
+    [InlineKeyboardButton(text="Назад", callback_data="my_workouts")]
+])
+
 
 def get_main_keyboard():
     """
@@ -8,14 +55,7 @@ def get_main_keyboard():
     Returns:
         InlineKeyboardMarkup: Клавиатура с кнопками: новая тренировка и мои тренировки
     """
-    keyboard = [
-        [
-            InlineKeyboardButton(text="Новая тренировка", callback_data="new_workout"),
-            InlineKeyboardButton(text="Мои тренировки", callback_data="my_workouts"),
-            InlineKeyboardButton(text="Импорт данных", callback_data="import_data")
-        ]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    return MAIN_KEYBOARD
 
 def start_workout_keyboard(muscle_groups: List[str]):
     """
@@ -27,27 +67,41 @@ def start_workout_keyboard(muscle_groups: List[str]):
     Returns:
         InlineKeyboardMarkup: Клавиатура с выбором мышечной группы или добавлением новой
     """
+    return _start_workout_keyboard(tuple(muscle_groups))
+
+@lru_cache(maxsize=config.keyboard_cache_size)
+def _start_workout_keyboard(muscle_groups: Tuple[str, ...]) -> PreparedKeyboard:
     keyboard = []
     for muscle_group in muscle_groups:
         keyboard.append([InlineKeyboardButton(text=muscle_group, callback_data=f"select_muscle_group:{muscle_group}")])
     ## пока низя keyboard.append([InlineKeyboardButton(text="Новая группа мышц", callback_data="new_muscle_group")])
     keyboard.append([InlineKeyboardButton(text="Завершить тренировку", callback_data="finish_workout")])
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    return _prepare(keyboard)
 
-def get_exercise_keyboard(exercises: List[str]):
+def get_exercise_keyboard(exercises: List[str], records: Optional[Dict[str, float]] = None):
     """
     Клавиатура для выбора упражнения
 
+    Args:
+        exercises (List[str]): Упражнения
+        records (Optional[Dict[str, float]]): Рекордные веса по названию упражнения
+
     Returns:
         InlineKeyboardMarkup: Клавиатура с выбором упражнения или добавлением нового
     """
+    records = records or {}
+    return _exercise_keyboard(tuple((exercise, records.get(exercise)) for exercise in exercises))
+
+@lru_cache(maxsize=config.keyboard_cache_size)
+def _exercise_keyboard(exercises: Tuple[Tuple[str, Optional[float]], ...]) -> PreparedKeyboard:
     keyboard = []
-    for exercise in exercises:
-        keyboard.append([InlineKeyboardButton(text=exercise, callback_data=f"select_exercise:{exercise}")])
+    for exercise, record in exercises:
+        text = f"{exercise} · {record:g} кг" if record is not None else exercise
+        keyboard.append([InlineKeyboardButton(text=text, callback_data=f"select_exercise:{exercise}")])
     keyboard.append([InlineKeyboardButton(text="Новое упражнение", callback_data="new_exercise")])
     keyboard.append([InlineKeyboardButton(text="Завершить тренировку", callback_data="finish_workout")])
     keyboard.append([InlineKeyboardButton(text="Назад", callback_data="back_to_muscle_group")])
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    return _prepare(keyboard)
 
 def get_back_to_exercises():
     """
@@ -56,28 +110,59 @@ def get_back_to_exercises():
     Returns:
         InlineKeyboardMarkup: Клавиатура с кнопкой назад и завершением тренировки
     """
-    keyboard = [
-        [InlineKeyboardButton(text="Завершить тренировку", callback_data="finish_workout")],
-        [InlineKeyboardButton(text="Назад", callback_data="back_to_exercise")]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    return BACK_TO_EXERCISES_KEYBOARD
 
 
-def get_last_workouts_keyboard(workouts: List[str]):
+def get_last_workouts_keyboard(workouts: List[Tuple[int, str]], newer: Optional[str] = None,
+                               older: Optional[str] = None):
     """
     Клавиатура для выбора тренировки
 
     Args:
-        workouts (List[str]): Список с датами тренировок
+        workouts (List[Tuple[int, str]]): Список с id и датами тренировок
+        newer (Optional[str]): Курсор страницы с более новыми тренировками
+        older (Optional[str]): Курсор страницы с более старыми тренировками
 
     Returns:
-        InlineKeyboardMarkup: Клавиатура с выбором тренировки
+        InlineKeyboardMarkup: Клавиатура с выбором тренировки и листанием истории
     """
+    return _last_workouts_keyboard(tuple(workouts), newer, older)
+
+@lru_cache(maxsize=config.keyboard_cache_size)
+def _last_workouts_keyboard(workouts: Tuple[Tuple[int, str], ...], newer: Optional[str],
+                            older: Optional[str]) -> PreparedKeyboard:
     keyboard = []
-    for date in workouts:
-        keyboard.append([InlineKeyboardButton(text=date, callback_data=f"get_workout:{date}")])
+    for workout_id, date in workouts:
+        keyboard.append([InlineKeyboardButton(text=date, callback_data=f"get_workout:{workout_id}")])
+    pages = []
+    if newer is not None:
+        pages.append(InlineKeyboardButton(text="« Новее", callback_data=f"history:newer:{newer}"))
+    if older is not None:
+        pages.append(InlineKeyboardButton(text="Старее »", callback_data=f"history:older:{older}"))
+    if pages:
+        keyboard.append(pages)
     keyboard.append([InlineKeyboardButton(text="Назад", callback_data="back_to_main")])
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    return _prepare(keyboard)
+
+def get_progress_keyboard(exercises: List[Tuple[int, str]]):
+    """
+    Клавиатура для выбора упражнения, по которому нужен график прогресса
+
+    Args:
+        exercises (List[Tuple[int, str]]): id и названия упражнений
+
+    Returns:
+        InlineKeyboardMarkup: Клавиатура с упражнениями и выходом в главное меню
+    """
+    return _progress_keyboard(tuple(exercises))
+
+@lru_cache(maxsize=config.keyboard_cache_size)
+def _progress_keyboard(exercises: Tuple[Tuple[int, str], ...]) -> PreparedKeyboard:
+    keyboard = []
+    for exercise_id, exercise in exercises:
+        keyboard.append([InlineKeyboardButton(text=exercise, callback_data=f"progress:{exercise_id}")])
+    keyboard.append([InlineKeyboardButton(text="В главное меню", callback_data="back_to_main")])
+    return _prepare(keyboard)
 
 def back_from_workout_view():
     """
@@ -86,8 +171,4 @@ def back_from_workout_view():
     Returns:
         InlineKeyboardMarkup: Клавиатура с кнопкой назад и выходом в главное меню
     """
-    keyboard = [
-        [InlineKeyboardButton(text="В главное меню", callback_data="back_to_main")],
-        [InlineKeyboardButton(text="Назад", callback_data="my_workouts")]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
\ No newline at end of file
+    return BACK_FROM_WORKOUT_VIEW_KEYBOARD
@@ -0,0 +1,23 @@
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiohttp import FormData
+
+from bot.keyboard.keyboard import PreparedKeyboard
+
+
+class KeyboardSession(AiohttpSession):
+    """
+    Сессия, которая отправляет PreparedKeyboard готовым JSON
+
+    Остальные поля запроса сериализуются как обычно, а клавиатура
+    не проходит через model_dump и json_dumps на каждом запросе.
+    """
+    def build_form_data(self, bot: Bot, method: TelegramMethod[TelegramType]) -> FormData:
+        markup = getattr(method, 'reply_markup', None)
+        if not isinstance(markup, PreparedKeyboard):
+            return super().build_form_data(bot, method)
+        form = super().build_form_data(bot, method.model_copy(update={'reply_markup': None}))
+        form.add_field('reply_markup', markup.serialized)
+        return form
@@ -0,0 +1,61 @@
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject
+
+from typing import Any, Awaitable, Callable, Dict
+import time
+
+from metrics.handlers import HandlerMetrics
+
+Handler = Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]]
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Замер обработки обновлений
+
+    Внешний middleware диспетчера замеряет обновление целиком, включая фильтры,
+    и берет состояние FSM, в котором оно пришло. Какой хендлер сработал, становится
+    известно только внутри роутера, поэтому внутренний middleware записывает
+    роутер и хендлер в общий словарь из данных обновления. Если ни один хендлер
+    не подошел, обновление учитывается как unhandled.
+    """
+    def __init__(self, metrics: HandlerMetrics):
+        self.metrics = metrics
+
+    def setup(self, dp: Dispatcher) -> None:
+        """
+        Подключение к диспетчеру
+
+        Args:
+            dp (Dispatcher): Диспетчер
+        """
+        dp.update.outer_middleware(self)
+        # Внутренние middleware диспетчера применяются и к хендлерам вложенных роутеров
+        for event_name, observer in dp.observers.items():
+            if event_name not in ('update', 'error'):
+                observer.middleware(self.label_handler)
+
+    async def __call__(self, handler: Handler, event: TelegramObject, data: Dict[str, Any]) -> Any:
+        target = {'router': '', 'handler': 'unhandled'}
+        data['metrics_target'] = target
+        state = data.get('raw_state') or ''
+        error = False
+        self.metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.metrics.in_flight -= 1
+            self.metrics.observe((target['router'], target['handler'], state),
+                                 time.perf_counter() - start, error)
+
+    @staticmethod
+    async def label_handler(handler: Handler, event: TelegramObject, data: Dict[str, Any]) -> Any:
+        target = data.get('metrics_target')
+        if target is not None:
+            target['router'] = data['event_router'].name
+            target['handler'] = data['handler'].callback.__name__
+        return await handler(event, data)
@@ -0,0 +1,75 @@
+from decimal import Decimal
+from typing import List, Tuple
+import re
+
+# Ограничения DECIMAL(5, 2) и здравого смысла
+MAX_WEIGHT = Decimal('999.99')
+MAX_REPS = 1000
+MAX_SETS = 30
+
+_NUMBER = r'\d+(?:[.,]\d+)?'
+_TIMES = r'\s*[xх×*]\s*'
+
+# Подходы в сообщении разделяются пробелами, запятыми или точкой с запятой:
+#   80x10 85x8 90x6  - вес x повторения
+#   3x10@80          - подходы x повторения @ вес
+#   80 10            - вес и повторения одного подхода через пробел
+_SET = re.compile(
+    rf'(?P<count>\d+){_TIMES}(?P<count_reps>\d+)\s*@\s*(?P<count_weight>{_NUMBER})'
+    rf'|(?P<weight>{_NUMBER}){_TIMES}(?P<reps>\d+)',
+    re.IGNORECASE
+)
+_SEPARATOR = re.compile(r'[\s,;]*')
+_SINGLE_SET = re.compile(rf'\s*(?P<weight>{_NUMBER})\s+(?P<reps>\d+)\s*')
+
+
+def _weight(value: str) -> Decimal:
+    weight = Decimal(value.replace(',', '.'))
+    if weight > MAX_WEIGHT:
+        raise ValueError(f"Вес {value} больше {MAX_WEIGHT}")
+    return weight
+
+
+def _reps(value: str) -> int:
+    reps = int(value)
+    if not 0 < reps <= MAX_REPS:
+        raise ValueError(f"Количество повторений должно быть от 1 до {MAX_REPS}")
+    return reps
+
+
+def parse_sets(text: str) -> List[Tuple[Decimal, int]]:
+    """
+    Разбор одного или нескольких подходов из сообщения
+
+    Args:
+        text (str): Текст сообщения, например "80x10 85x8", "3x10@80" или "80 10"
+
+    Returns:
+        List[Tuple[Decimal, int]]: Подходы (вес, повторения) в порядке ввода
+
+    Raises:
+        ValueError: Если сообщение не удалось разобрать
+    """
+    single = _SINGLE_SET.fullmatch(text)
+    if single is not None:
+        return [(_weight(single['weight']), _reps(single['reps']))]
+
+    sets = []
+    position = _SEPARATOR.match(text).end()
+    while position < len(text):
+        match = _SET.match(text, position)
+        if match is None:
+            raise ValueError(f"Не удалось разобрать: {text[position:].split()[0]}")
+        if match['count'] is not None:
+            count = int(match['count'])
+            if not 0 < count <= MAX_SETS:
+                raise ValueError(f"Количество подходов должно быть от 1 до {MAX_SETS}")
+            sets.extend([(_weight(match['count_weight']), _reps(match['count_reps']))] * count)
+        else:
+            sets.append((_weight(match['weight']), _reps(match['reps'])))
+        position = _SEPARATOR.match(text, match.end()).end()
+    if not sets:
+        raise ValueError("Сообщение не содержит подходов")
+    if len(sets) > MAX_SETS:
+        raise ValueError(f"За раз можно записать не больше {MAX_SETS} подходов")
+    return sets
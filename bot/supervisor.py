@@ -0,0 +1,297 @@
+import logging
+import asyncio
+import multiprocessing
+import queue
+import secrets
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+from configs.logger_config import setup_logging
+from configs.config_reader import config
+
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = 'https://api.telegram.org'
+POLLING_TIMEOUT = 30
+# Как часто воркер выходит из ожидания очереди и супервизор проверяет воркеров
+QUEUE_POLL_INTERVAL = 1.0
+MONITOR_INTERVAL = 1.0
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Consistent hash (Jump Consistent Hash, Lamping & Veach)
+
+    При изменении числа воркеров переезжает только 1/N пользователей.
+
+    Args:
+        key (int): Ключ, например telegram_id
+        buckets (int): Количество воркеров
+
+    Returns:
+        int: Номер воркера
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, j = -1, 0
+    while j < buckets:
+        bucket = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((bucket + 1) * (1 << 31) / ((key >> 33) + 1))
+    return bucket
+
+
+def get_user_id(update: Dict[str, Any]) -> int:
+    """
+    Получение id пользователя из сырого обновления без разбора в модели aiogram
+
+    Args:
+        update (Dict[str, Any]): Обновление в формате Bot API
+
+    Returns:
+        int: from.id события, 0 если его нет
+    """
+    for field, event in update.items():
+        if field != 'update_id' and isinstance(event, dict):
+            user = event.get('from') or event.get('user') or {}
+            return user.get('id', 0)
+    return 0
+
+
+def worker_main(index: int, updates: multiprocessing.Queue) -> None:
+    """
+    Точка входа процесса-воркера
+
+    Args:
+        index (int): Номер воркера
+        updates (multiprocessing.Queue): Очередь обновлений воркера
+    """
+    asyncio.run(_worker(index, updates))
+
+
+async def _worker(index: int, updates: multiprocessing.Queue) -> None:
+    # Импорт здесь, чтобы у каждого процесса был свой пул Database и диспетчер
+    from bot.bot import setup_dispatcher, shutdown
+
+    bot, dp, import_runner = await setup_dispatcher(shard=index)
+    logger.info("Воркер %s запущен", index)
+    loop = asyncio.get_running_loop()
+    locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+    pending: Dict[int, int] = defaultdict(int)
+    tasks = set()
+
+    async def handle(user_id: int, update: Dict[str, Any]) -> None:
+        # asyncio.Lock отдает захват в порядке очереди, поэтому обновления
+        # одного пользователя обрабатываются по порядку, а разных - параллельно
+        try:
+            async with locks[user_id]:
+                await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            logger.error("Ошибка обработки обновления %s: %s", update.get('update_id'), e)
+        finally:
+            pending[user_id] -= 1
+            if not pending[user_id]:
+                del pending[user_id]
+                del locks[user_id]
+
+    lost = getattr(dp.storage, 'lost', None)
+    try:
+        while True:
+            if lost is not None and lost.is_set():
+                # Владение состояниями шарда у другого процесса, обновления очереди
+                # останутся перезапущенному воркеру
+                raise RuntimeError(f"Воркер {index} потерял владение состояниями FSM")
+            # Ожидание с таймаутом, чтобы поток executor не держал процесс при падении воркера
+            try:
+                update = await loop.run_in_executor(None, updates.get, True, QUEUE_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if update is None:
+                break
+            user_id = get_user_id(update)
+            pending[user_id] += 1
+            task = asyncio.create_task(handle(user_id, update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        await shutdown(bot, dp, import_runner)
+        logger.info("Воркер %s остановлен", index)
+
+
+class Supervisor:
+    """
+    Получение обновлений и распределение их по процессам-воркерам
+
+    Обновления не разбираются в модели aiogram, а маршрутизируются по consistent hash
+    от from.id, поэтому обновления одного пользователя всегда попадают в один воркер
+    и обрабатываются по порядку.
+
+    Очереди воркеров ограничены queue_size. Telegram считает обновление доставленным,
+    как только оно принято в очередь: при long polling offset сдвигается после
+    постановки в очередь, вебхук отвечает 200. Поэтому при падении воркера
+    обновления, принятые в его очередь или обрабатываемые им, теряются. Упавший
+    воркер перезапускается на той же очереди. Если процесс убит сигналом, блокировка
+    чтения очереди могла остаться захваченной, тогда очередь заменяется новой
+    и ее содержимое теряется.
+    """
+    def __init__(self, workers: int, queue_size: int):
+        self._context = multiprocessing.get_context('spawn')
+        self.queue_size = queue_size
+        self.queues: List[multiprocessing.Queue] = [
+            self._context.Queue(maxsize=queue_size) for _ in range(workers)
+        ]
+        self.processes = [self._spawn(index) for index in range(workers)]
+        self.api_url = f"{(config.telegram_api_url or TELEGRAM_API_URL).rstrip('/')}" \
+                       f"/bot{config.bot_token.get_secret_value()}"
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        # Воркеры не демоны: раннеру импорта внутри нужен свой пул процессов
+        return self._context.Process(
+            target=worker_main, args=(index, self.queues[index]), name=f"bot-worker-{index}"
+        )
+
+    def _queue(self, update: Dict[str, Any]) -> multiprocessing.Queue:
+        return self.queues[jump_hash(get_user_id(update), len(self.queues))]
+
+    async def route(self, update: Dict[str, Any]) -> None:
+        """
+        Отправить обновление воркеру пользователя
+
+        Если очередь воркера заполнена, ждет освобождения места, поэтому
+        long polling не забирает новые обновления, пока воркер не догонит.
+
+        Args:
+            update (Dict[str, Any]): Обновление в формате Bot API
+        """
+        while not self.try_route(update):
+            await asyncio.sleep(0.05)
+
+    def try_route(self, update: Dict[str, Any]) -> bool:
+        """
+        Отправить обновление воркеру пользователя без ожидания
+
+        Args:
+            update (Dict[str, Any]): Обновление в формате Bot API
+
+        Returns:
+            bool: False, если очередь воркера заполнена
+        """
+        try:
+            self._queue(update).put_nowait(update)
+        except queue.Full:
+            return False
+        return True
+
+    async def monitor(self) -> None:
+        """
+        Перезапуск упавших воркеров
+        """
+        while True:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if process.exitcode is None:
+                    continue
+                logger.error("Воркер %s завершился с кодом %s, перезапуск", index, process.exitcode)
+                if process.exitcode < 0:
+                    self.queues[index] = self._context.Queue(maxsize=self.queue_size)
+                    logger.error("Очередь воркера %s заменена, необработанные обновления потеряны", index)
+                self.processes[index] = self._spawn(index)
+                self.processes[index].start()
+
+    async def _call(self, session: ClientSession, method: str, **params: Any) -> Any:
+        params = {key: value for key, value in params.items() if value is not None}
+        async with session.post(f"{self.api_url}/{method}", json=params) as response:
+            payload = await response.json()
+        if not payload.get('ok'):
+            raise RuntimeError(f"{method}: {payload.get('description')}")
+        return payload['result']
+
+    async def poll(self, session: ClientSession) -> None:
+        """
+        Получение обновлений через long polling
+
+        Args:
+            session (ClientSession): HTTP сессия
+        """
+        await self._call(session, 'deleteWebhook', drop_pending_updates=True)
+        offset: Optional[int] = None
+        while True:
+            try:
+                updates = await self._call(
+                    session, 'getUpdates',
+                    offset=offset, timeout=POLLING_TIMEOUT, allowed_updates=config.allowed_updates
+                )
+            except Exception as e:
+                logger.error("Ошибка получения обновлений: %s", e)
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                await self.route(update)
+                offset = update['update_id'] + 1
+
+    async def serve_webhook(self, session: ClientSession) -> None:
+        """
+        Получение обновлений через вебхук
+
+        Args:
+            session (ClientSession): HTTP сессия
+        """
+        secret_token = config.webhook_secret.get_secret_value() if config.webhook_secret else None
+
+        async def handle(request: web.Request) -> web.Response:
+            if secret_token and not secrets.compare_digest(
+                    request.headers.get('X-Telegram-Bot-Api-Secret-Token', ''), secret_token):
+                return web.Response(status=401)
+            # При заполненной очереди Telegram повторит доставку позже
+            if not self.try_route(await request.json()):
+                return web.Response(status=503)
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post(config.webhook_path, handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host=config.webhook_host, port=config.webhook_port).start()
+        await self._call(
+            session, 'setWebhook',
+            url=config.webhook_url.rstrip('/') + config.webhook_path,
+            secret_token=secret_token,
+            max_connections=config.webhook_max_connections,
+            allowed_updates=config.allowed_updates,
+            drop_pending_updates=True
+        )
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+    async def run(self) -> None:
+        """
+        Запуск воркеров и получения обновлений
+        """
+        for process in self.processes:
+            process.start()
+        logger.info("Запущено воркеров: %s", len(self.processes))
+        monitor = asyncio.create_task(self.monitor())
+        try:
+            async with ClientSession(timeout=ClientTimeout(total=POLLING_TIMEOUT + 10)) as session:
+                if config.delivery_mode == 'webhook':
+                    await self.serve_webhook(session)
+                else:
+                    await self.poll(session)
+        finally:
+            monitor.cancel()
+            loop = asyncio.get_running_loop()
+            for updates, process in zip(self.queues, self.processes):
+                if process.is_alive():
+                    await loop.run_in_executor(None, updates.put, None)
+            for process in self.processes:
+                await loop.run_in_executor(None, process.join)
+
+
+if __name__ == "__main__":
+    asyncio.run(Supervisor(workers=config.shard_workers, queue_size=config.shard_queue_size).run())
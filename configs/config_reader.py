@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import SecretStr
+from pydantic import SecretStr, model_validator
+from typing import List, Optional
 
 class Settings(BaseSettings):
     bot_token: SecretStr
@@ -8,7 +9,78 @@ class Settings(BaseSettings):
     db_password: SecretStr
     db_host: str
     db_port: int
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 10
+    db_command_timeout: float = 60.0
+    db_acquire_timeout: float = 10.0
+    db_max_inactive_connection_lifetime: float = 300.0
+    db_statement_cache_size: int = 100
+    db_slow_query_threshold: float = 0.5
+    db_slow_query_top_n: int = 20
+    db_slow_query_window: float = 3600.0
+    db_explain_slow_queries: bool = False
+    db_explain_interval: float = 300.0
+    db_explain_timeout: float = 30.0
+
+    telegram_api_url: Optional[str] = None
+    delivery_mode: str = 'polling'
+    allowed_updates: List[str] = ['message', 'callback_query']
+    webhook_url: Optional[str] = None
+    webhook_path: str = '/webhook'
+    webhook_secret: Optional[SecretStr] = None
+    webhook_host: str = '0.0.0.0'
+    webhook_port: int = 8080
+    webhook_max_connections: int = 40
+    shard_workers: int = 4
+    shard_queue_size: int = 1000
+
+    import_workers: int = 2
+    import_max_concurrency: int = 2
+    import_progress_interval: float = 3.0
+
+    cache_max_users: int = 10000
+    cache_ttl: float = 600.0
+    keyboard_cache_size: int = 1024
+    history_page_size: int = 10
+
+    chart_cache_max_users: int = 1000
+    chart_cache_ttl: float = 3600.0
+    chart_max_points: int = 200
+
+    # direct - подходы пишутся в базу сразу, journal - через локальный журнал
+    set_write_mode: str = 'direct'
+    set_journal_path: str = 'data/set_journal.sqlite3'
+    set_journal_flush_interval: float = 1.0
+    set_journal_batch_size: int = 500
+    set_journal_max_attempts: int = 5
+
+    # memory - состояния в памяти процесса, теряются при перезапуске;
+    # postgres - один экземпляр бота (или воркеры супервизора по шардам);
+    # postgres_shared - несколько реплик за балансировщиком в режиме webhook
+    fsm_storage: str = 'postgres'
+    fsm_flush_interval: float = 1.0
+    fsm_cache_ttl: float = 3600.0
+    fsm_state_ttl: float = 604800.0
+
+    metrics_host: str = '127.0.0.1'
+    metrics_port: Optional[int] = None
     
+    @model_validator(mode='after')
+    def check_delivery_mode(self) -> 'Settings':
+        if self.delivery_mode not in ('polling', 'webhook'):
+            raise ValueError(f"delivery_mode должен быть 'polling' или 'webhook', получено {self.delivery_mode!r}")
+        if self.delivery_mode == 'webhook' and not self.webhook_url:
+            raise ValueError("Для delivery_mode='webhook' нужен webhook_url - "
+                             "публичный адрес, на который Telegram отправляет обновления")
+        if self.fsm_storage not in ('memory', 'postgres', 'postgres_shared'):
+            raise ValueError("fsm_storage должен быть 'memory', 'postgres' или 'postgres_shared', "
+                             f"получено {self.fsm_storage!r}")
+        if self.set_write_mode not in ('direct', 'journal'):
+            raise ValueError(f"set_write_mode должен быть 'direct' или 'journal', получено {self.set_write_mode!r}")
+        if self.db_slow_query_top_n < 0:
+            raise ValueError(f"db_slow_query_top_n не может быть отрицательным, получено {self.db_slow_query_top_n}")
+        return self
+
     model_config = SettingsConfigDict(
         env_file='.env', 
         env_file_encoding='utf-8'
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Mapping, Optional
+import time
+
+from metrics.prometheus import format_values
+
+
+class UserCache:
+    """
+    LRU-кэш с TTL для редко меняющихся данных пользователей
+
+    Записи хранятся по telegram_id, внутри пользователя - по произвольному ключу.
+    При переполнении вытесняется пользователь, к которому дольше всего не обращались,
+    запись пользователя целиком устаревает через ttl секунд после создания.
+    """
+    def __init__(self, max_users: int, ttl: float):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._users: OrderedDict = OrderedDict()
+
+    def get(self, telegram_id: int, key: Hashable) -> Optional[Any]:
+        """
+        Получить значение из кэша
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+            key (Hashable): Ключ внутри пользователя
+
+        Returns:
+            Optional[Any]: Значение или None, если его нет в кэше
+        """
+        entry = self._users.get(telegram_id)
+        if entry is not None:
+            expires_at, values = entry
+            if expires_at <= time.monotonic():
+                del self._users[telegram_id]
+            elif key in values:
+                self._users.move_to_end(telegram_id)
+                self.hits += 1
+                return values[key]
+        self.misses += 1
+        return None
+
+    def set(self, telegram_id: int, key: Hashable, value: Any) -> None:
+        """
+        Положить значение в кэш
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+            key (Hashable): Ключ внутри пользователя
+            value (Any): Значение
+        """
+        entry = self._users.get(telegram_id)
+        if entry is None or entry[0] <= time.monotonic():
+            entry = (time.monotonic() + self.ttl, {})
+            self._users[telegram_id] = entry
+        entry[1][key] = value
+        self._users.move_to_end(telegram_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+
+    def invalidate(self, telegram_id: int) -> None:
+        """
+        Сбросить все данные пользователя
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+        """
+        self._users.pop(telegram_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счетчики попаданий и промахов
+
+        Returns:
+            Dict[str, int]: hits, misses и текущее количество пользователей в кэше
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'users': len(self._users)}
+
+
+def collect_caches(caches: Mapping[str, UserCache]) -> List[str]:
+    """
+    Метрики кэшей в текстовом формате Prometheus
+
+    Args:
+        caches (Mapping[str, UserCache]): Кэши по имени, имя попадает в метку cache
+
+    Returns:
+        List[str]: Строки метрик
+    """
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    return [
+        *format_values('gym_bot_cache_hits_total', "Попадания в кэш", 'counter',
+                       [({'cache': name}, item['hits']) for name, item in stats.items()]),
+        *format_values('gym_bot_cache_misses_total', "Промахи кэша", 'counter',
+                       [({'cache': name}, item['misses']) for name, item in stats.items()]),
+        *format_values('gym_bot_cache_users', "Пользователи в кэше", 'gauge',
+                       [({'cache': name}, item['users']) for name, item in stats.items()])
+    ]
@@ -1,16 +1,46 @@
 import asyncpg
-from typing import Optional, Dict, Any, List
+import datetime
+from decimal import Decimal
+from typing import Optional, Dict, Any, List, Iterable, Sequence, Tuple, Callable, Awaitable, AsyncIterator
+from contextlib import asynccontextmanager
+from itertools import islice
+import asyncio
 import logging
+import random
+import time
+import uuid
 from configs.logger_config import setup_logging
 from configs.config_reader import config
+from database.cache import UserCache
+from database.migrator import migrate
+from database.queries import QUERIES, STATS_UPSERT, WORKOUT_FINGERPRINT, QueryRegistry, RegistryConnection
+from database.pool_metrics import PoolMetrics
+from database.tracing import QueryTracer, current_acquire
 
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
+# Сколько раз log_sets пытается записать подходы, если номера заняла параллельная запись
+LOG_SETS_ATTEMPTS = 3
+
 class Database:
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
+        self.catalog_cache = UserCache(max_users=config.cache_max_users, ttl=config.cache_ttl)
+        # Рекорды меняются с каждым подходом и сбрасываются при записи подходов
+        self.records_cache = UserCache(max_users=config.cache_max_users, ttl=config.cache_ttl)
+        self.queries = QueryRegistry(QUERIES, cache_size=config.db_statement_cache_size)
+        self.pool_metrics = PoolMetrics()
+        self.tracer = QueryTracer(
+            slow_threshold=config.db_slow_query_threshold,
+            top_n=config.db_slow_query_top_n,
+            window=config.db_slow_query_window,
+            explain=self._explain_plan if config.db_explain_slow_queries else None,
+            explain_interval=config.db_explain_interval
+        )
+        self._workout_locks: Dict[int, asyncio.Lock] = {}
+        self._workout_lock_users: Dict[int, int] = {}
 
     async def get_connection_params(self) -> Dict[str, Any]:
         """
@@ -36,92 +66,130 @@ class Database:
             params = await self.get_connection_params()
             self.pool = await asyncpg.create_pool(
                 **params,
-                min_size=1,
-                max_size=10,
-                command_timeout=60
+                min_size=config.db_pool_min_size,
+                max_size=config.db_pool_max_size,
+                command_timeout=config.db_command_timeout,
+                max_inactive_connection_lifetime=config.db_max_inactive_connection_lifetime,
+                statement_cache_size=config.db_statement_cache_size,
+                connection_class=RegistryConnection,
+                init=self._init_connection
             )
             logger.info("Пул соединений с PostgreSQL создан успешно")
         except Exception as e:
             logger.critical(f"Ошибка создания пула соединений: {e}")
             raise
 
-    # TODO добавить docstring
-    async def init_tables(self) -> None:
+    @asynccontextmanager
+    async def workout_lock(self, workout_id: int) -> AsyncIterator[None]:
         """
-        Инициализация таблиц
+        Очередь записей подходов одной тренировки внутри процесса
+
+        Номера подходов считаются как MAX(set_order) + 1, поэтому одновременные
+        записи в одну тренировку выполняются по очереди без обращений к базе.
+        Гонки между процессами ловит уникальный индекс (workout, exercise, set_order).
+
+        Args:
+            workout_id (int): Идентификатор тренировки
         """
+        lock = self._workout_locks.setdefault(workout_id, asyncio.Lock())
+        self._workout_lock_users[workout_id] = self._workout_lock_users.get(workout_id, 0) + 1
         try:
-            async with self.pool.acquire() as conn:
+            async with lock:
+                yield
+        finally:
+            self._workout_lock_users[workout_id] -= 1
+            if not self._workout_lock_users[workout_id]:
+                del self._workout_lock_users[workout_id]
+                del self._workout_locks[workout_id]
 
-                ##await conn.execute('DROP TABLE IF EXISTS SET CASCADE')
-                ##await conn.execute('DROP TABLE IF EXISTS WORKOUT CASCADE')
-                ##await conn.execute('DROP TABLE IF EXISTS EXERCISE CASCADE')
-                ##await conn.execute('DROP TABLE IF EXISTS "USER" CASCADE')
+    @asynccontextmanager
+    async def acquire(self, method: str) -> AsyncIterator[RegistryConnection]:
+        """
+        Захват соединения из пула с записью метрик
 
-                await conn.execute('''
-                CREATE TABLE IF NOT EXISTS "USER" (
-                    telegram_id BIGINT PRIMARY KEY
-                )
-                ''')
-                await conn.execute('''
-                CREATE TABLE IF NOT EXISTS WORKOUT (
-                    id SERIAL PRIMARY KEY,
-                    telegram_id BIGINT NOT NULL REFERENCES "USER"(telegram_id),
-                    date DATE NOT NULL DEFAULT CURRENT_DATE
-                )
-                ''')
-                await conn.execute('''
-                CREATE TABLE IF NOT EXISTS EXERCISE (
-                    id SERIAL PRIMARY KEY,
-                    telegram_id BIGINT NOT NULL REFERENCES "USER"(telegram_id),
-                    muscle_group VARCHAR(150) NOT NULL,
-                    name VARCHAR(150) NOT NULL,
-                    UNIQUE(telegram_id, name)
-                )
-                ''')
-                await conn.execute('''
-                CREATE TABLE IF NOT EXISTS SET (
-                    id SERIAL PRIMARY KEY,
-                    workout INTEGER NOT NULL REFERENCES WORKOUT(id) ON DELETE CASCADE,
-                    exercise INTEGER NOT NULL REFERENCES EXERCISE(id),
-                    set_order INTEGER NOT NULL,
-                    weight DECIMAL(5, 2),
-                    reps INTEGER NOT NULL,
-                    UNIQUE(workout, exercise, set_order)
-                )
-                ''')
-                logging.info("Таблица создана успешно")
-        except Exception as e:
-            logging.critical(f"Критическая ошибка при создании таблицы {e}")
+        Имя метода и время ожидания пула на время захвата доступны
+        трассировке запросов через current_acquire.
 
-    # TODO добавить docstring
-    async def _fill_exercises(self, telegram_id):
-        """
-        Заполнение таблицы упражнений базовыми данными
+        Args:
+            method (str): Имя вызывающего метода, по нему группируются метрики
+
+        Yields:
+            RegistryConnection: Соединение пула
         """
+        start = time.perf_counter()
+        try:
+            conn = await self.pool.acquire(timeout=config.db_acquire_timeout)
+        except asyncio.TimeoutError:
+            self.pool_metrics.observe_timeout(method)
+            logger.error(f"Таймаут ожидания соединения из пула в {method}")
+            raise
+        wait = time.perf_counter() - start
+        self.pool_metrics.observe_wait(method, wait)
+        token = current_acquire.set((method, wait))
         try:
-            exercises = [
-                ("Жим штанги лежа", "Chest"),
-                ("Приседания со штангой", "Legs"),
-                ("Становая тяга", "Back"),
-                ("Подтягивания", "Back"),
-                ("Жим гантелей сидя", "Shoulders"),
-                ("Подъем штанги", "Biceps"),
-                ("Французский жим", "Triceps"),
-                ("Выпады", "Legs"),
-                ("Планка", "Abs")
-            ]
+            yield conn
+        finally:
+            current_acquire.reset(token)
+            await self.pool.release(conn)
 
-            async with self.pool.acquire() as conn:
-                for name, muscle in exercises:
-                    await conn.execute('''
-                    INSERT INTO EXERCISE (name, muscle_group, telegram_id)
-                    VALUES ($1, $2, $3)
-                    ON CONFLICT (telegram_id, name) DO NOTHING
-                    ''', name, muscle, telegram_id)
-            logger.info("База данных заполнена успешно")
+    def query_stats(self) -> Dict[str, Any]:
+        """
+        Трассировка запросов
+
+        Returns:
+            Dict[str, Any]: Длительность, строки и ошибки по запросам и самые медленные запросы
+        """
+        return self.tracer.snapshot()
+
+    async def _explain_plan(self, query: str, args: Sequence[Any]) -> str:
+        """
+        План выполнения медленного запроса
+
+        Запрос выполняется заново в READ ONLY транзакции, поэтому изменить
+        данные не может даже при ошибке в проверке QueryTracer. Соединение берется
+        из пула мимо acquire: EXPLAIN не попадает в трассировку и метрики пула
+        и не занимает место среди медленных запросов. Время выполнения ограничено
+        db_explain_timeout, чтобы EXPLAIN ANALYZE зависшего запроса не держал соединение.
+
+        Args:
+            query (str): Текст читающего запроса
+            args (Sequence[Any]): Параметры запроса
+
+        Returns:
+            str: Вывод EXPLAIN (ANALYZE, BUFFERS)
+        """
+        async with self.pool.acquire(timeout=config.db_acquire_timeout) as conn:
+            async with conn.transaction(readonly=True):
+                await conn.execute(f"SET LOCAL statement_timeout = {int(config.db_explain_timeout * 1000)}")
+                plan = await conn.fetch(f'EXPLAIN (ANALYZE, BUFFERS) {query}', *args)
+        return '\n'.join(row[0] for row in plan)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        Метрики пула соединений
+
+        Returns:
+            Dict[str, Any]: Занятые и свободные соединения, ожидание и таймауты по методам
+        """
+        return self.pool_metrics.snapshot(self.pool)
+
+    async def _init_connection(self, conn: RegistryConnection) -> None:
+        """
+        Init-хук пула: привязка реестра запросов и трассировки к новому соединению
+
+        Args:
+            conn (RegistryConnection): Новое соединение пула
+        """
+        conn.attach_registry(self.queries, tracer=self.tracer)
+
+    async def init_tables(self) -> None:
+        """
+        Инициализация таблиц: применение миграций из database/migrations
+        """
+        try:
+            await migrate(self.pool)
         except Exception as e:
-            logger.critical(f"Ошибка заполнения базы данных: {e}")
+            logger.critical(f"Критическая ошибка при применении миграций: {e}")
             raise
 
     # TODO добавить docstring
@@ -130,31 +198,52 @@ class Database:
         Получить или создать пользователя
         """
         try:
-            async with self.pool.acquire() as conn:
-                await conn.execute('''
-                    INSERT INTO "USER" (telegram_id)
-                    VALUES ($1)
-                    ON CONFLICT (telegram_id)
-                    DO NOTHING
-                    ''', telegram_id)
+            async with self.acquire('get_create_user') as conn:
+                statement = conn.statement('get_create_user')
+                await statement.fetch(telegram_id)
                 logger.info(f"Пользователь {telegram_id} создан или получен")
                 return telegram_id
         except Exception as e:
             logger.critical(f"Ошибка при получении или создании пользователя: {e}")
             raise
 
+    async def get_user_ids(self, after: int, limit: int) -> List[int]:
+        """
+        Получить идентификаторы пользователей по возрастанию
+
+        Args:
+            after (int): Последний идентификатор предыдущей страницы
+            limit (int): Размер страницы
+
+        Returns:
+            List[int]: Идентификаторы пользователей больше after
+        """
+        try:
+            async with self.acquire('get_user_ids') as conn:
+                statement = conn.statement('get_user_ids')
+                users = await statement.fetch(after, limit)
+                return [row['telegram_id'] for row in users]
+        except Exception as e:
+            logger.critical(f"Ошибка при получении пользователей: {e}")
+            raise
+
     # TODO добавить docstring
-    async def create_workout(self, telegram_id: int) -> int:
+    async def create_workout(self, telegram_id: int, client_id: Optional[uuid.UUID] = None) -> int:
         """
         Создать новую тренировку
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+            client_id (Optional[uuid.UUID]): Идентификатор тренировки, назначенный ботом.
+                Если тренировка с ним уже есть в базе, возвращается она
+
+        Returns:
+            int: Идентификатор тренировки
         """
         try:
-            async with self.pool.acquire() as conn:
-                workout_id = await conn.fetchval('''
-                    INSERT INTO WORKOUT (telegram_id)
-                    VALUES ($1)
-                    RETURNING id
-                    ''', telegram_id)
+            async with self.acquire('create_workout') as conn:
+                statement = conn.statement('create_workout')
+                workout_id = await statement.fetchval(telegram_id, client_id)
                 logger.info("Тренировка успешно создана")
                 return workout_id
         except Exception as e:
@@ -167,46 +256,276 @@ class Database:
         Импортировать тренировку
         """
         try:
-            async with self.pool.acquire() as conn:
-                workout_id = await conn.fetchval('''
-                    INSERT INTO WORKOUT (telegram_id, date)
-                    VALUES ($1, $2)
-                    RETURNING id
-                    ''', telegram_id, date)
+            async with self.acquire('import_workout') as conn:
+                statement = conn.statement('import_workout')
+                workout_id = await statement.fetchval(telegram_id, date)
                 logger.info("Тренировка успешно импортирована")
                 return workout_id
         except Exception as e:
             logger.critical(f"Ошибка при импорте тренировки: {e}")
             raise
 
+    async def bulk_import(self, telegram_id: int, records: Iterable[Tuple],
+                          batch_size: int = 5000,
+                          on_batch: Optional[Callable[[int], None]] = None) -> Dict[str, int]:
+        """
+        Массовый импорт подходов из итератора записей
+
+        Записи батчами загружаются через COPY, дальше импорт выполняется
+        как в _import_sets.
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+            records (Iterable[Tuple]): Подходы в формате
+                (date, exercise, muscle_group, set_order, weight, reps)
+            batch_size (int): Количество подходов в одном COPY
+            on_batch (Callable[[int], None]): Колбэк, который получает количество
+                загруженных подходов после каждого батча. Вызывается внутри открытой
+                транзакции, поэтому не должен ждать сеть
+
+        Returns:
+            Dict[str, int]: Результат _import_sets
+        """
+        records = iter(records)
+
+        async def copy(conn: RegistryConnection) -> None:
+            copied = 0
+            while batch := list(islice(records, batch_size)):
+                await conn.copy_records_to_table('import_set', records=batch)
+                copied += len(batch)
+                if on_batch is not None:
+                    on_batch(copied)
+
+        return await self._import_sets('bulk_import', telegram_id, copy)
+
+    async def bulk_import_file(self, telegram_id: int, path: str,
+                               on_batch: Optional[Callable[[int], None]] = None,
+                               block_size: int = 1 << 20) -> Dict[str, int]:
+        """
+        Массовый импорт подходов из CSV файла записей
+
+        Файл без заголовка с колонками (date, exercise, muscle_group, set_order,
+        weight, reps), как его пишет Dataloader.write_records. Файл передается
+        в COPY потоком блоками по block_size байт: записи разбирает сервер,
+        а в памяти бота одновременно находится только один блок.
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+            path (str): Путь к файлу записей
+            on_batch (Callable[[int], None]): Колбэк, который получает количество
+                переданных подходов после каждого блока. Вызывается внутри открытой
+                транзакции, поэтому не должен ждать сеть
+            block_size (int): Размер блока в байтах
+
+        Returns:
+            Dict[str, int]: Результат _import_sets
+        """
+        async def blocks() -> AsyncIterator[bytes]:
+            loop = asyncio.get_running_loop()
+            copied = 0
+            with open(path, 'rb') as f:
+                while block := await loop.run_in_executor(None, f.read, block_size):
+                    yield block
+                    copied += block.count(b'\n')
+                    if on_batch is not None:
+                        on_batch(copied)
+
+        async def copy(conn: RegistryConnection) -> None:
+            await conn.copy_to_table('import_set', source=blocks(), format='csv')
+
+        return await self._import_sets('bulk_import_file', telegram_id, copy)
+
+    async def _import_sets(self, method: str, telegram_id: int,
+                           copy: Callable[[RegistryConnection], Awaitable[None]]) -> Dict[str, int]:
+        """
+        Массовый импорт подходов одной транзакцией
+
+        Подходы загружаются через COPY во временную таблицу, после чего
+        упражнения, тренировки и подходы создаются на стороне сервера через
+        INSERT ... SELECT, а id тренировок и упражнений сопоставляются JOIN'ом
+        по дате и названию. Упражнения из общего каталога не копируются пользователю,
+        статистика упражнений обновляется тем же запросом.
+
+        Импорт повторяемый: для каждой даты файла считается отпечаток подходов.
+        Даты, у которых уже есть импортированная тренировка с тем же отпечатком,
+        пропускаются. Импортированная тренировка с другим отпечатком заменяется,
+        статистика ее упражнений пересчитывается. Тренировки без отпечатка (записанные
+        в боте или импортированные до появления отпечатков) не изменяются; если такая
+        тренировка совпадает с датой файла по содержимому, она получает отпечаток
+        вместо создания копии.
+
+        Args:
+            method (str): Имя вызывающего метода для метрик пула
+            telegram_id (int): Идентификатор пользователя
+            copy (Callable[[RegistryConnection], Awaitable[None]]): Загрузка подходов
+                во временную таблицу import_set
+
+        Returns:
+            Dict[str, int]: sets - записано подходов, workouts - записано тренировок,
+                replaced - из них заменено измененных, skipped - пропущено без изменений
+        """
+        try:
+            async with self.acquire(method) as conn:
+                async with conn.transaction():
+                    await conn.execute('''
+                        CREATE TEMP TABLE import_set (
+                            date DATE NOT NULL,
+                            exercise VARCHAR(150) NOT NULL,
+                            muscle_group VARCHAR(150) NOT NULL,
+                            set_order INTEGER NOT NULL,
+                            weight DECIMAL(5, 2),
+                            reps INTEGER NOT NULL
+                        ) ON COMMIT DROP
+                        ''')
+                    await copy(conn)
+                    await conn.execute('''
+                        CREATE TEMP TABLE import_workout ON COMMIT DROP AS
+                        SELECT i.date, ''' + WORKOUT_FINGERPRINT.format(
+                            exercise='i.exercise', set_order='i.set_order', weight='i.weight', reps='i.reps'
+                        ) + ''' AS fingerprint
+                        FROM import_set i
+                        GROUP BY i.date
+                        ''')
+                    # Тренировки без отпечатка с тем же содержимым, например импортированные
+                    # раньше, получают отпечаток, чтобы не создавать их копии
+                    await conn.execute('''
+                        UPDATE WORKOUT w
+                        SET fingerprint = legacy.fingerprint
+                        FROM (
+                            SELECT DISTINCT ON (x.date) x.id, x.fingerprint
+                            FROM (
+                                SELECT w.id, w.date, ''' + WORKOUT_FINGERPRINT.format(
+                                    exercise='e.name', set_order='s.set_order', weight='s.weight', reps='s.reps'
+                                ) + ''' AS fingerprint
+                                FROM WORKOUT w
+                                INNER JOIN SET s ON s.workout = w.id
+                                INNER JOIN EXERCISE e ON e.id = s.exercise
+                                WHERE w.telegram_id = $1 AND w.fingerprint IS NULL
+                                    AND w.date IN (SELECT i.date FROM import_workout i)
+                                GROUP BY w.id
+                            ) x
+                            INNER JOIN import_workout i ON i.date = x.date AND i.fingerprint = x.fingerprint
+                            WHERE NOT EXISTS (
+                                SELECT 1 FROM WORKOUT f
+                                WHERE f.telegram_id = $1 AND f.date = x.date AND f.fingerprint IS NOT NULL
+                            )
+                            ORDER BY x.date, x.id
+                        ) legacy
+                        WHERE w.id = legacy.id
+                        ''', telegram_id)
+                    replaced = await conn.fetchrow('''
+                        WITH replaced AS (
+                            DELETE FROM WORKOUT w
+                            USING import_workout i
+                            WHERE w.telegram_id = $1 AND w.date = i.date
+                                AND w.fingerprint IS NOT NULL AND w.fingerprint <> i.fingerprint
+                            RETURNING w.id
+                        )
+                        SELECT COUNT(DISTINCT r.id) AS workouts,
+                                COALESCE(array_agg(DISTINCT s.exercise) FILTER (WHERE s.exercise IS NOT NULL),
+                                         '{}') AS exercises
+                        FROM replaced r
+                        LEFT JOIN SET s ON s.workout = r.id
+                        ''', telegram_id)
+                    # Во временной таблице остаются только даты, которые нужно записать
+                    skipped = await conn.execute('''
+                        DELETE FROM import_workout i
+                        USING WORKOUT w
+                        WHERE w.telegram_id = $1 AND w.date = i.date AND w.fingerprint = i.fingerprint
+                        ''', telegram_id)
+                    await conn.execute('''
+                        INSERT INTO EXERCISE (name, muscle_group, telegram_id)
+                        SELECT DISTINCT ON (i.exercise) i.exercise, i.muscle_group, $1::BIGINT
+                        FROM import_set i
+                        INNER JOIN import_workout p ON p.date = i.date
+                        WHERE NOT EXISTS (
+                            SELECT 1 FROM EXERCISE c
+                            WHERE c.telegram_id IS NULL AND c.name = i.exercise
+                        )
+                        ORDER BY i.exercise
+                        ON CONFLICT (telegram_id, name) DO NOTHING
+                        ''', telegram_id)
+                    imported = await conn.fetchrow('''
+                        WITH new_workout AS (
+                            INSERT INTO WORKOUT (telegram_id, date, fingerprint)
+                            SELECT $1::BIGINT, p.date, p.fingerprint FROM import_workout p
+                            RETURNING id, date
+                        ), new_set AS (
+                            INSERT INTO SET (workout, exercise, set_order, weight, reps)
+                            SELECT w.id, e.id, i.set_order, i.weight, i.reps
+                            FROM import_set i
+                            INNER JOIN new_workout w ON w.date = i.date
+                            INNER JOIN EXERCISE e ON (e.telegram_id = $1 OR e.telegram_id IS NULL)
+                                AND e.name = i.exercise
+                            RETURNING id, workout, exercise, weight, reps
+                        ), stats AS (
+                            INSERT INTO EXERCISE_STATS (telegram_id, exercise, best_weight, best_1rm,
+                                                        total_volume, last_date, set_count, last_set_id)
+                            SELECT $1::BIGINT, n.exercise, MAX(n.weight), MAX(epley_1rm(n.weight, n.reps)),
+                                    COALESCE(SUM(n.weight * n.reps), 0), MAX(w.date), COUNT(*), MAX(n.id)
+                            FROM new_set n
+                            INNER JOIN new_workout w ON w.id = n.workout
+                            GROUP BY n.exercise
+                        ''' + STATS_UPSERT + '''
+                        )
+                        SELECT (SELECT COUNT(*) FROM new_set) AS sets,
+                                (SELECT COUNT(*) FROM new_workout) AS workouts
+                        ''', telegram_id)
+                    if replaced['exercises']:
+                        # Рекорды не уменьшить инкрементально, поэтому статистика упражнений
+                        # замененных тренировок считается заново вместе с новыми подходами
+                        statement = conn.statement('clear_exercise_stats_for')
+                        await statement.fetch(telegram_id, replaced['exercises'])
+                        statement = conn.statement('rebuild_exercise_stats_for')
+                        await statement.fetch(telegram_id, replaced['exercises'])
+            self.catalog_cache.invalidate(telegram_id)
+            self.records_cache.invalidate(telegram_id)
+            result = {
+                'sets': imported['sets'],
+                'workouts': imported['workouts'],
+                'replaced': replaced['workouts'],
+                'skipped': int(skipped.split()[-1])
+            }
+            logger.info(f"Импортировано подходов: {result['sets']}, тренировок: {result['workouts']}, "
+                        f"заменено: {result['replaced']}, без изменений: {result['skipped']}")
+            return result
+        except Exception as e:
+            logger.critical(f"Ошибка при массовом импорте: {e}")
+            raise
+
     # TODO добавить docstring
     # логика хранения упражнений под вопросом
     async def get_exercise_by_name(self, name: str, telegram_id: int) -> int:
         try:
-            async with self.pool.acquire() as conn:
-                exercise_id = await conn.fetchval('''
-                    SELECT e.id FROM EXERCISE as e
-                    WHERE e.telegram_id = $1 AND e.name = $2
-                    ''', telegram_id, name)
+            async with self.acquire('get_exercise_by_name') as conn:
+                statement = conn.statement('get_exercise_by_name')
+                exercise_id = await statement.fetchval(telegram_id, name)
                 logger.info("Упражнение получено")
                 return exercise_id
         except Exception as e:
             logger.critical(f"Ошибка при получении упражнения: {e}")
             raise
 
-    # TODO добавить docstring
     async def create_exercise(self, muscle_group: str, name: str, telegram_id: int) -> int:
         """
         Создать новое упражнение
+
+        Если упражнение с таким названием уже есть в каталоге или у пользователя,
+        новое не создается.
+
+        Args:
+            muscle_group (str): Группа мышц
+            name (str): Название упражнения
+            telegram_id (int): Идентификатор пользователя
+
+        Returns:
+            int: Идентификатор созданного или существующего упражнения
         """
         try:
-            async with self.pool.acquire() as conn:
-                exercise_id = await conn.fetchval('''
-                    INSERT INTO EXERCISE (name, muscle_group, telegram_id)
-                    VALUES ($1, $2, $3)
-                    ON CONFLICT (telegram_id, name) DO NOTHING
-                    RETURNING id
-                    ''', name, muscle_group, telegram_id)
+            async with self.acquire('create_exercise') as conn:
+                statement = conn.statement('create_exercise')
+                exercise_id = await statement.fetchval(name, muscle_group, telegram_id)
+                self.catalog_cache.invalidate(telegram_id)
                 logger.info("Упражнение успешно создано")
                 return exercise_id
         except Exception as e:
@@ -218,14 +537,17 @@ class Database:
         """
         Получить упражнения пользователя
         """
+        cached = self.catalog_cache.get(telegram_id, muscle_group)
+        if cached is not None:
+            return cached
         try:
-            async with self.pool.acquire() as conn:
-                exercises = await conn.fetch('''
-                    SELECT e.name FROM EXERCISE e
-                    WHERE e.telegram_id = $1 AND e.muscle_group = $2
-                    ''', telegram_id, muscle_group)
+            async with self.acquire('get_exercises_by_muscle_group') as conn:
+                statement = conn.statement('get_exercises_by_muscle_group')
+                exercises = await statement.fetch(telegram_id, muscle_group)
                 logger.info("Упражнения успешно получены")
-                return [row['name'] for row in exercises]
+                exercises = [row['name'] for row in exercises]
+                self.catalog_cache.set(telegram_id, muscle_group, exercises)
+                return exercises
         except Exception as e:
             logger.critical(f"Ошибка при получении упражнении: {e}")
             raise
@@ -235,68 +557,108 @@ class Database:
         """
         Получить группы мышц пользователя
         """
+        cached = self.catalog_cache.get(telegram_id, None)
+        if cached is not None:
+            return cached
         try:
-            async with self.pool.acquire() as conn:
-                muscle_groups = await conn.fetch('''
-                    SELECT DISTINCT e.muscle_group FROM EXERCISE e
-                    WHERE e.telegram_id = $1
-                    ORDER BY e.muscle_group
-                    ''', telegram_id)
+            async with self.acquire('get_muscle_groups') as conn:
+                statement = conn.statement('get_muscle_groups')
+                muscle_groups = await statement.fetch(telegram_id)
                 logger.info("Группы мышц успешно получены")
-                return [row['muscle_group'] for row in muscle_groups]
+                muscle_groups = [row['muscle_group'] for row in muscle_groups]
+                self.catalog_cache.set(telegram_id, None, muscle_groups)
+                return muscle_groups
         except Exception as e:
             logger.critical(f"Ошибка при получении групп мышц: {e}")
             raise
     
-    # TODO добавить логгер
-    async def get_workout_dates(self, telegram_id: int, limit: int = 10) -> List[str]:
-        """
-        Получить даты тренировок пользователя
-        """
-        async with self.pool.acquire() as conn:
-            dates = await conn.fetch('''
-            SELECT w.date FROM WORKOUT w
-            WHERE w.telegram_id = $1
-            ORDER BY w.date DESC
-            LIMIT $2
-            ''', telegram_id, limit)
-        return [str(row['date']) for row in dates]
+    async def get_workouts_page(self, telegram_id: int, limit: int,
+                                cursor: Optional[Tuple[datetime.date, int]] = None,
+                                older: bool = True) -> Tuple[List[Dict], bool]:
+        """
+        Получить страницу истории тренировок
+
+        Keyset-пагинация по (date, id): страница начинается сразу после курсора,
+        поэтому ее стоимость не зависит от длины истории.
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+            limit (int): Размер страницы
+            cursor (Optional[Tuple[datetime.date, int]]): (date, id) крайней тренировки
+                соседней страницы, None - первая страница
+            older (bool): Листать к более старым тренировкам или к более новым
+
+        Returns:
+            Tuple[List[Dict], bool]: Тренировки (id, date) от новых к старым и признак того,
+                что в направлении листания есть еще тренировки
+        """
+        try:
+            async with self.acquire('get_workouts_page') as conn:
+                if cursor is None:
+                    statement = conn.statement('get_workouts_page')
+                    workouts = await statement.fetch(telegram_id, limit + 1)
+                else:
+                    name = 'get_workouts_page_older' if older else 'get_workouts_page_newer'
+                    statement = conn.statement(name)
+                    workouts = await statement.fetch(telegram_id, limit + 1, *cursor)
+            has_more = len(workouts) > limit
+            workouts = [dict(w) for w in workouts[:limit]]
+            if cursor is not None and not older:
+                workouts.reverse()
+            return workouts, has_more
+        except Exception as e:
+            logger.critical(f"Ошибка при получении истории тренировок: {e}")
+            raise
     
-    # TODO добавить логгер
-    async def get_workout_by_date(self, telegram_id: int, date) -> List[Dict]:
-        """
-        Получить даты тренировок пользователя
-        """
-        async with self.pool.acquire() as conn:
-            workout = await conn.fetch('''
-            SELECT w.date,
-                    e.name, e.muscle_group,
-                    s.weight, s.reps, s.set_order
-            FROM SET s
-            INNER JOIN WORKOUT w ON w.id = s.workout
-            INNER JOIN EXERCISE e ON e.id = s.exercise 
-            WHERE w.telegram_id = $1 AND w.date = $2
-            ORDER BY e.muscle_group DESC, e.name DESC, s.set_order ASC
-            ''', telegram_id, date)
-        return [dict(set) for set in workout]
+    async def get_workout(self, workout_id: int, telegram_id: int) -> Optional[Dict]:
+        """
+        Получить тренировку с подходами, сгруппированными по упражнениям
+
+        Тренировка ищется по первичному ключу, telegram_id не дает открыть
+        чужую тренировку по подделанной callback data.
+
+        Args:
+            workout_id (int): Идентификатор тренировки
+            telegram_id (int): Идентификатор пользователя
+
+        Returns:
+            Optional[Dict]: date и exercises - упражнения в порядке выполнения
+                (name, muscle_group, sets) с подходами (set_order, weight, reps),
+                None если тренировки нет или в ней нет подходов
+        """
+        try:
+            async with self.acquire('get_workout') as conn:
+                statement = conn.statement('get_workout')
+                rows = await statement.fetch(workout_id, telegram_id)
+            if not rows:
+                return None
+            return {
+                'id': workout_id,
+                'date': rows[0]['date'],
+                'exercises': [
+                    {
+                        'name': row['name'],
+                        'muscle_group': row['muscle_group'],
+                        'sets': [
+                            {'set_order': set_order, 'weight': weight, 'reps': reps}
+                            for set_order, weight, reps in zip(row['set_orders'], row['weights'], row['reps'])
+                        ]
+                    }
+                    for row in rows
+                ]
+            }
+        except Exception as e:
+            logger.critical(f"Ошибка при получении тренировки: {e}")
+            raise
 
     # TODO переписать
     async def get_user_workouts(self, telegram_id: int, limit: int = 1) -> List[Dict]:
         """
         Получить тренировки пользователя
         """
-        async with self.pool.acquire() as conn:
-            workouts = await conn.fetch('''
-            SELECT w.id, w.date,
-                    e.name, e.muscle_group,
-                    s.weight, s.reps, s.set_order
-            FROM SET s
-            INNER JOIN WORKOUT w ON w.id = s.workout
-            INNER JOIN EXERCISE e ON e.id = s.exercise 
-            WHERE w.telegram_id = $1
-            ORDER BY w.date DESC, e.muscle_group, e.name, s.set_order
-            LIMIT $2
-            ''', telegram_id, limit)
+        async with self.acquire('get_user_workouts') as conn:
+            statement = conn.statement('get_user_workouts')
+            workouts = await statement.fetch(telegram_id, limit)
             return [dict(w) for w in workouts]
 
     # TODO добавить docstring
@@ -304,37 +666,380 @@ class Database:
                                 set_order: int, weight: float, reps: int) -> int:
         """Добавить подход к тренировке"""
         try:
-            async with self.pool.acquire() as conn:
-                set_id = await conn.fetchval('''
-                INSERT INTO SET (workout, exercise, set_order, weight, reps)
-                VALUES ($1, $2, $3, $4, $5)
-                RETURNING id
-                ''', workout_id, exercise_id, set_order, weight, reps)
+            async with self.acquire('add_set_to_workout') as conn:
+                statement = conn.statement('add_set_to_workout')
+                set_id = await statement.fetchval(workout_id, exercise_id, set_order, weight, reps)
                 logger.info("Подход успешно добавлен")
                 return set_id
         except Exception as e:
             logger.critical(f"Ошибка при добавлении подхода к тренировке: {e}")
             raise
     
-    # TODO добавить docstring
+    async def log_sets(self, telegram_id: int, workout_id: int, exercise_id: int,
+                       sets: List[Tuple[Decimal, int]]) -> List[Dict]:
+        """
+        Добавить подходы и получить все подходы упражнения за один запрос
+
+        Подходы передаются массивами и вставляются одним INSERT ... SELECT из unnest,
+        номера подходов назначаются на стороне сервера после последнего подхода
+        упражнения в тренировке. Записи в одну тренировку внутри процесса идут
+        по очереди через workout_lock. Если номера успел занять другой процесс,
+        уникальный индекс (workout, exercise, set_order) отклоняет вставку
+        и запрос повторяется с новыми номерами, до LOG_SETS_ATTEMPTS раз.
+
+        Args:
+            telegram_id (int): Идентификатор пользователя, владельца тренировки
+            workout_id (int): Идентификатор тренировки
+            exercise_id (int): Идентификатор упражнения
+            sets (List[Tuple[Decimal, int]]): Подходы (вес, повторения) в порядке выполнения
+
+        Returns:
+            List[Dict]: Подходы упражнения (set_order, weight, reps) с учетом новых
+        """
+        try:
+            weights, reps = zip(*sets)
+            async with self.workout_lock(workout_id), self.acquire('log_sets') as conn:
+                statement = conn.statement('log_sets')
+                for attempt in range(1, LOG_SETS_ATTEMPTS + 1):
+                    try:
+                        result = await statement.fetch(workout_id, exercise_id, list(weights), list(reps))
+                        break
+                    except asyncpg.UniqueViolationError:
+                        if attempt == LOG_SETS_ATTEMPTS:
+                            raise
+                        logger.warning(f"Номера подходов заняты параллельной записью, повтор {attempt}")
+                        # Случайная пауза разводит процессы, которые столкнулись одновременно
+                        await asyncio.sleep(random.uniform(0, 0.05 * attempt))
+                self.records_cache.invalidate(telegram_id)
+                logger.info(f"Добавлено подходов: {len(sets)}")
+                return [dict(s) for s in result]
+        except Exception as e:
+            logger.critical(f"Ошибка при добавлении подходов к тренировке: {e}")
+            raise
+
+    async def save_journal_workouts(self, workouts: List[Tuple]) -> Dict[uuid.UUID, int]:
+        """
+        Создать тренировки из журнала подходов одним запросом
+
+        Тренировки, client_id которых уже есть в базе, не создаются заново,
+        для них возвращается существующий идентификатор.
+
+        Args:
+            workouts (List[Tuple]): Тренировки (client_id, telegram_id, date)
+
+        Returns:
+            Dict[uuid.UUID, int]: Идентификатор тренировки в базе по client_id
+        """
+        try:
+            async with self.acquire('save_journal_workouts') as conn:
+                statement = conn.statement('save_journal_workouts')
+                rows = await statement.fetch(*(list(column) for column in zip(*workouts)))
+                logger.info(f"Из журнала записано тренировок: {len(rows)}")
+                return {row['client_id']: row['id'] for row in rows}
+        except Exception as e:
+            logger.critical(f"Ошибка при записи тренировок из журнала: {e}")
+            raise
+
+    async def save_journal_sets(self, sets: List[Tuple]) -> Dict[str, Any]:
+        """
+        Записать пачку подходов из журнала одной транзакцией
+
+        Подходы, client_id которых уже есть в базе, пропускаются, поэтому повторная
+        запись той же пачки безопасна. Номера подходов назначаются после последнего
+        подхода упражнения в тренировке в порядке seq. Подходы удаленных тренировок
+        не записываются и возвращаются в orphaned.
+
+        Args:
+            sets (List[Tuple]): Подходы (client_id, workout, exercise, weight, reps, seq)
+
+        Returns:
+            Dict[str, Any]: saved - количество новых подходов в базе,
+                orphaned - client_id подходов, тренировки которых нет в базе
+        """
+        try:
+            async with self.acquire('save_journal_sets') as conn:
+                statement = conn.statement('save_journal_sets')
+                result = await statement.fetchrow(*(list(column) for column in zip(*sets)))
+                for telegram_id in result['users']:
+                    self.records_cache.invalidate(telegram_id)
+                logger.info(f"Из журнала записано подходов: {result['saved']} из {len(sets)}")
+                if result['orphaned']:
+                    logger.warning(f"Подходов из журнала без тренировки в базе: {len(result['orphaned'])}")
+                return {'saved': result['saved'], 'orphaned': result['orphaned']}
+        except Exception as e:
+            logger.critical(f"Ошибка при записи подходов из журнала: {e}")
+            raise
+
     async def get_workout_sets_by_exercise(self, exercise_id: int, workout_id: int) -> List[Dict]:
         """
         Получить подходы в конкретном упражнении тренировки
         """
         try:
-            async with self.pool.acquire() as conn:
-                sets = await conn.fetch('''
-                SELECT s.set_order, s.weight, s.reps
-                FROM SET s
-                WHERE s.workout = $1 AND s.exercise = $2
-                ORDER BY s.set_order
-                ''', workout_id, exercise_id)
+            async with self.acquire('get_workout_sets_by_exercise') as conn:
+                statement = conn.statement('get_workout_sets_by_exercise')
+                sets = await statement.fetch(workout_id, exercise_id)
                 logger.info("Все подходы упражнения успешно получены")
                 return [dict(s) for s in sets]
         except Exception as e:
             logger.critical(f"Ошибка при получении подходов: {e}")
             raise
 
+    async def get_exercise_stats(self, telegram_id: int) -> List[Dict]:
+        """
+        Получить статистику по всем упражнениям пользователя
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+
+        Returns:
+            List[Dict]: exercise, name, muscle_group, best_weight, best_1rm, total_volume,
+                last_date и set_count, последние выполненные упражнения первыми
+        """
+        try:
+            async with self.acquire('get_exercise_stats') as conn:
+                statement = conn.statement('get_exercise_stats')
+                stats = await statement.fetch(telegram_id)
+                return [dict(row) for row in stats]
+        except Exception as e:
+            logger.critical(f"Ошибка при получении статистики упражнений: {e}")
+            raise
+
+    async def get_personal_records(self, telegram_id: int, muscle_group: str) -> Dict[str, float]:
+        """
+        Получить рекордные веса в упражнениях группы мышц
+
+        Результат кэшируется в records_cache до записи новых подходов пользователя.
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+            muscle_group (str): Группа мышц
+
+        Returns:
+            Dict[str, float]: Рекордный вес по названию упражнения
+        """
+        cached = self.records_cache.get(telegram_id, muscle_group)
+        if cached is not None:
+            return cached
+        try:
+            async with self.acquire('get_personal_records') as conn:
+                statement = conn.statement('get_personal_records')
+                records = await statement.fetch(telegram_id, muscle_group)
+                records = {row['name']: float(row['best_weight'])
+                           for row in records if row['best_weight'] is not None}
+                self.records_cache.set(telegram_id, muscle_group, records)
+                return records
+        except Exception as e:
+            logger.critical(f"Ошибка при получении рекордов: {e}")
+            raise
+
+    async def get_exercise_last_set(self, telegram_id: int, exercise_id: int) -> Optional[Tuple[str, int]]:
+        """
+        Получить название упражнения и id его последнего подхода из статистики
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+            exercise_id (int): Идентификатор упражнения
+
+        Returns:
+            Optional[Tuple[str, int]]: Название и id последнего подхода или None,
+                если у пользователя нет подходов в упражнении
+        """
+        try:
+            async with self.acquire('get_exercise_last_set') as conn:
+                statement = conn.statement('get_exercise_last_set')
+                row = await statement.fetchrow(telegram_id, exercise_id)
+                return (row['name'], row['last_set_id']) if row is not None else None
+        except Exception as e:
+            logger.critical(f"Ошибка при получении последнего подхода: {e}")
+            raise
+
+    async def get_exercise_history(self, telegram_id: int, exercise_id: int) -> Dict[str, List]:
+        """
+        Получить всю историю подходов упражнения одним запросом в колоночном виде
+
+        Args:
+            telegram_id (int): Идентификатор пользователя
+            exercise_id (int): Идентификатор упражнения
+
+        Returns:
+            Dict[str, List]: dates, weights и reps, отсортированные по дате
+        """
+        try:
+            async with self.acquire('get_exercise_history') as conn:
+                statement = conn.statement('get_exercise_history')
+                row = await statement.fetchrow(telegram_id, exercise_id)
+                return {name: row[name] or [] for name in ('dates', 'weights', 'reps')}
+        except Exception as e:
+            logger.critical(f"Ошибка при получении истории упражнения: {e}")
+            raise
+
+    async def rebuild_exercise_stats(self, telegram_ids: List[int]) -> int:
+        """
+        Пересчитать статистику упражнений пользователей по всей истории подходов
+
+        Args:
+            telegram_ids (List[int]): Идентификаторы пользователей
+
+        Returns:
+            int: Количество записанных строк статистики
+        """
+        try:
+            async with self.acquire('rebuild_exercise_stats') as conn:
+                async with conn.transaction():
+                    statement = conn.statement('clear_exercise_stats')
+                    await statement.fetch(telegram_ids)
+                    statement = conn.statement('rebuild_exercise_stats')
+                    status = await statement.execute(telegram_ids)
+                    rebuilt = int(status.split()[-1])
+                for telegram_id in telegram_ids:
+                    self.records_cache.invalidate(telegram_id)
+                logger.info(f"Статистика пересчитана для {len(telegram_ids)} пользователей")
+                return rebuilt
+        except Exception as e:
+            logger.critical(f"Ошибка при пересчете статистики упражнений: {e}")
+            raise
+
+    async def lock_fsm_owner(self, bot_id: int, shard: Optional[int]) -> Optional[asyncpg.Connection]:
+        """
+        Захватить владение состояниями FSM бота
+
+        Владение держится сессионными advisory-блокировками на отдельном соединении
+        вне пула и освобождается, когда соединение закрывается, в том числе при
+        падении процесса. Экземпляр без шарда берет исключительную блокировку бота.
+        Воркер супервизора берет разделяемую блокировку бота и исключительную
+        блокировку своего шарда, поэтому воркеры разных шардов работают вместе,
+        а с отдельным экземпляром или вторым воркером того же шарда - нет.
+
+        Args:
+            bot_id (int): Идентификатор бота
+            shard (Optional[int]): Номер воркера супервизора
+
+        Returns:
+            Optional[asyncpg.Connection]: Соединение, которое держит блокировки,
+                None - владение уже у другого экземпляра
+        """
+        try:
+            conn = await asyncpg.connect(**await self.get_connection_params())
+            if shard is None:
+                locked = await conn.fetchval(
+                    "SELECT pg_try_advisory_lock(hashtext('fsm_state'), hashtext($1))", str(bot_id)
+                )
+            else:
+                locked = await conn.fetchval(
+                    "SELECT pg_try_advisory_lock_shared(hashtext('fsm_state'), hashtext($1)) "
+                    "AND pg_try_advisory_lock(hashtext('fsm_state_shard'), hashtext($2))",
+                    str(bot_id), f"{bot_id}:{shard}"
+                )
+            if locked:
+                return conn
+            await conn.close()
+            return None
+        except Exception as e:
+            logger.critical(f"Ошибка при захвате владения состояниями FSM: {e}")
+            raise
+
+    async def get_fsm_record(self, key: str, version: Optional[int] = None
+                             ) -> Optional[Tuple[int, Optional[str], Optional[str]]]:
+        """
+        Получить сохраненное состояние FSM
+
+        Args:
+            key (str): Ключ хранилища
+            version (Optional[int]): Известная версия записи
+
+        Returns:
+            Optional[Tuple[int, Optional[str], Optional[str]]]: Версия, состояние и данные
+                в JSON или None, если записи нет. Если версия совпала с известной,
+                состояние и данные не передаются и равны None
+        """
+        try:
+            async with self.acquire('get_fsm_record') as conn:
+                statement = conn.statement('get_fsm_record')
+                record = await statement.fetchrow(key, version)
+                return (record['version'], record['state'], record['data']) if record is not None else None
+        except Exception as e:
+            logger.critical(f"Ошибка при получении состояния FSM: {e}")
+            raise
+
+    async def save_fsm_records(self, records: List[Tuple[str, Optional[str], str]],
+                               deleted: List[str]) -> None:
+        """
+        Сохранить пачку состояний FSM одной транзакцией
+
+        Args:
+            records (List[Tuple[str, Optional[str], str]]): Ключ, состояние и данные в JSON
+            deleted (List[str]): Ключи пустых состояний, которые нужно удалить
+        """
+        try:
+            async with self.acquire('save_fsm_records') as conn:
+                async with conn.transaction():
+                    if records:
+                        statement = conn.statement('save_fsm_records')
+                        await statement.fetch(*(list(column) for column in zip(*records)))
+                    if deleted:
+                        statement = conn.statement('delete_fsm_records')
+                        await statement.fetch(deleted)
+                logger.info(f"Сохранено состояний FSM: {len(records)}, удалено: {len(deleted)}")
+        except Exception as e:
+            logger.critical(f"Ошибка при сохранении состояний FSM: {e}")
+            raise
+
+    async def save_fsm_record(self, key: str, state: Optional[str], data: str,
+                              version: Optional[int]) -> Optional[int]:
+        """
+        Сохранить состояние FSM, если его версия в базе не изменилась
+
+        Args:
+            key (str): Ключ хранилища
+            state (Optional[str]): Состояние
+            data (str): Данные в JSON
+            version (Optional[int]): Версия, поверх которой делалось изменение,
+                None - записи в базе не было
+
+        Returns:
+            Optional[int]: Новая версия или None, если запись изменил другой экземпляр
+        """
+        try:
+            async with self.acquire('save_fsm_record') as conn:
+                statement = conn.statement('save_fsm_record')
+                return await statement.fetchval(key, state, data, version)
+        except Exception as e:
+            logger.critical(f"Ошибка при сохранении состояния FSM: {e}")
+            raise
+
+    async def delete_fsm_record(self, key: str, version: int) -> bool:
+        """
+        Удалить состояние FSM, если его версия в базе не изменилась
+
+        Args:
+            key (str): Ключ хранилища
+            version (int): Версия, поверх которой делалось изменение
+
+        Returns:
+            bool: False, если запись изменил или удалил другой экземпляр
+        """
+        try:
+            async with self.acquire('delete_fsm_record') as conn:
+                statement = conn.statement('delete_fsm_record')
+                return await statement.fetchval(key, version) is not None
+        except Exception as e:
+            logger.critical(f"Ошибка при удалении состояния FSM: {e}")
+            raise
+
+    async def expire_fsm_records(self, ttl: float) -> None:
+        """
+        Удалить состояния FSM, которые не обновлялись дольше ttl секунд
+
+        Args:
+            ttl (float): Время жизни неактивной сессии в секундах
+        """
+        try:
+            async with self.acquire('expire_fsm_records') as conn:
+                statement = conn.statement('expire_fsm_records')
+                await statement.fetch(ttl)
+        except Exception as e:
+            logger.critical(f"Ошибка при удалении устаревших состояний FSM: {e}")
+            raise
 
     # TODO добавить docstring
     async def get_workout_sets(self, workout_id: int) -> List[Dict]:
@@ -342,15 +1047,9 @@ class Database:
         Получить все подходы тренировки
         """
         try:
-            async with self.pool.acquire() as conn:
-                sets = await conn.fetch('''
-                SELECT s.id, s.set_order, s.weight, s.reps,
-                        e.name as exercise_name, e.muscle_group
-                FROM SET s
-                JOIN EXERCISE e ON s.exercise_id = e.id
-                WHERE s.workout_id = $1
-                ORDER BY s.set_order
-                ''', workout_id)
+            async with self.acquire('get_workout_sets') as conn:
+                statement = conn.statement('get_workout_sets')
+                sets = await statement.fetch(workout_id)
                 logger.info("Все подходы успешно получены")
                 return [dict(s) for s in sets]
         except Exception as e:
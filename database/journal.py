@@ -0,0 +1,352 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import logging
+import sqlite3
+import uuid
+
+import asyncpg
+
+from database.database import Database
+
+logger = logging.getLogger(__name__)
+
+_JOURNAL_TABLE = '''
+    CREATE TABLE IF NOT EXISTS journal (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        client_id TEXT NOT NULL,
+        workout INTEGER,
+        workout_client_id TEXT,
+        exercise INTEGER NOT NULL,
+        weight TEXT NOT NULL,
+        reps INTEGER NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0
+    )
+    '''
+_DEAD_LETTER_TABLE = '''
+    CREATE TABLE IF NOT EXISTS dead_letter (
+        seq INTEGER PRIMARY KEY,
+        client_id TEXT NOT NULL,
+        workout INTEGER,
+        workout_client_id TEXT,
+        exercise INTEGER NOT NULL,
+        weight TEXT NOT NULL,
+        reps INTEGER NOT NULL,
+        attempts INTEGER NOT NULL,
+        error TEXT NOT NULL,
+        failed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    '''
+_WORKOUT_TABLE = '''
+    CREATE TABLE IF NOT EXISTS workout (
+        client_id TEXT PRIMARY KEY,
+        telegram_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        id INTEGER
+    )
+    '''
+
+
+class SetJournal:
+    """
+    Локальный журнал подходов с отложенной записью в PostgreSQL
+
+    Подходы сначала записываются в SQLite на диске и подтверждаются пользователю
+    сразу после фиксации транзакции журнала. Фоновая задача раз в flush_interval
+    секунд переносит их в базу пачками по batch_size одной транзакцией и удаляет
+    из журнала. У каждого подхода есть client_id, поэтому повторная выгрузка после
+    сбоя между записью в базу и очисткой журнала не создает дубликатов.
+
+    Если пачка не записывается из-за данных (классы ошибок PostgreSQL 22 и 23,
+    например нарушение внешнего ключа или уникальности), подходы пачки
+    записываются по одному. Неудачная попытка увеличивает attempts подхода,
+    и после max_attempts попыток он переносится в таблицу dead_letter журнала,
+    чтобы не блокировать следующие подходы. Туда же сразу переносятся подходы
+    тренировок, удаленных из базы. Ошибки соединения попытками не считаются.
+
+    Тренировка тоже может быть создана через журнал: подход ссылается на нее
+    по client_id, назначенному ботом, а тренировка записывается в таблицу workout
+    журнала. Перед выгрузкой подходов такие тренировки создаются в базе одним
+    запросом, и их подходы выгружаются вместе с остальными. Если тренировку
+    не удалось создать из-за данных, ее подходы переносятся в dead_letter.
+    """
+    def __init__(self, db: Database, path: str, flush_interval: float, batch_size: int,
+                 max_attempts: int):
+        self.db = db
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.dead_letters = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        # Все обращения к SQLite идут через один поток, чтобы не блокировать event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='set-journal')
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # Подход подтверждается пользователю только после fsync
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.execute('BEGIN')
+        for table, schema in (('journal', _JOURNAL_TABLE), ('dead_letter', _DEAD_LETTER_TABLE)):
+            columns = [row[1] for row in self._conn.execute(f'PRAGMA table_info({table})')]
+            if columns and 'workout_client_id' not in columns:
+                # Журнал старой версии: workout был NOT NULL, а SQLite не умеет снимать
+                # ограничение с колонки, поэтому таблица пересоздается
+                self._conn.execute(f'ALTER TABLE {table} RENAME TO {table}_old')
+                self._conn.execute(schema)
+                self._conn.execute(
+                    f'INSERT INTO {table} ({", ".join(columns)}) SELECT {", ".join(columns)} FROM {table}_old'
+                )
+                self._conn.execute(f'DROP TABLE {table}_old')
+            else:
+                self._conn.execute(schema)
+        self._conn.execute(_WORKOUT_TABLE)
+        self._conn.commit()
+
+    async def start(self) -> None:
+        """
+        Открыть журнал, выгрузить оставшиеся после прошлого запуска подходы
+        и запустить фоновую запись
+        """
+        await self._run(self._open)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Ошибка выгрузки журнала подходов при запуске: %s", e)
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def _append(self, rows: List[Tuple], workout: Optional[Tuple]) -> None:
+        with self._conn:
+            if workout is not None:
+                self._conn.execute('''
+                    INSERT OR IGNORE INTO workout (client_id, telegram_id, date)
+                    VALUES (?, ?, ?)
+                    ''', workout)
+            self._conn.executemany('''
+                INSERT INTO journal (client_id, workout, workout_client_id, exercise, weight, reps)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''', rows)
+
+    async def append(self, workout_id: Optional[int], exercise_id: int, sets: List[Tuple[Decimal, int]],
+                     workout_client_id: Optional[str] = None, telegram_id: Optional[int] = None) -> None:
+        """
+        Записать подходы в журнал
+
+        Если тренировки еще нет в базе, она создается при выгрузке журнала
+        по workout_client_id с сегодняшней датой.
+
+        Args:
+            workout_id (Optional[int]): Идентификатор тренировки в базе, None - тренировка
+                создается через журнал
+            exercise_id (int): Идентификатор упражнения
+            sets (List[Tuple[Decimal, int]]): Подходы (вес, повторения) в порядке выполнения
+            workout_client_id (Optional[str]): Идентификатор тренировки, назначенный ботом
+            telegram_id (Optional[int]): Пользователь, которому принадлежит тренировка
+        """
+        workout = None
+        if workout_id is None:
+            workout = (workout_client_id, telegram_id, date.today().isoformat())
+        rows = [
+            (str(uuid.uuid4()), workout_id, workout_client_id if workout_id is None else None,
+             exercise_id, str(weight), reps)
+            for weight, reps in sets
+        ]
+        await self._run(self._append, rows, workout)
+
+    def _pending(self, after_seq: int) -> List[Tuple]:
+        # Подходы тренировок, которые еще не созданы в базе, пропускаются
+        return self._conn.execute('''
+            SELECT j.seq, j.client_id, COALESCE(j.workout, w.id), j.exercise, j.weight, j.reps
+            FROM journal j
+            LEFT JOIN workout w ON w.client_id = j.workout_client_id
+            WHERE j.seq > ? AND COALESCE(j.workout, w.id) IS NOT NULL
+            ORDER BY j.seq
+            LIMIT ?
+            ''', (after_seq, self.batch_size)).fetchall()
+
+    def _unresolved_workouts(self) -> List[Tuple]:
+        return self._conn.execute('''
+            SELECT client_id, telegram_id, date FROM workout WHERE id IS NULL
+            ''').fetchall()
+
+    def _resolve_workouts(self, ids: Dict[str, int]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                'UPDATE workout SET id = ? WHERE client_id = ?',
+                [(workout_id, client_id) for client_id, workout_id in ids.items()]
+            )
+
+    def _dead_letter_workout(self, client_id: str, error: str) -> int:
+        with self._conn:
+            moved = self._conn.execute('''
+                INSERT INTO dead_letter (seq, client_id, workout, workout_client_id, exercise, weight, reps,
+                                         attempts, error)
+                SELECT seq, client_id, workout, workout_client_id, exercise, weight, reps, attempts, ?
+                FROM journal
+                WHERE workout_client_id = ?
+                ''', (error, client_id)).rowcount
+            self._conn.execute('DELETE FROM journal WHERE workout_client_id = ?', (client_id,))
+            self._conn.execute('DELETE FROM workout WHERE client_id = ?', (client_id,))
+        return moved
+
+    def _forget_workouts(self, before: str) -> None:
+        # Созданные тренировки удаляются через день после своей даты: пока тренировка
+        # идет, новые подходы находят ее id без повторного запроса к базе
+        with self._conn:
+            self._conn.execute('''
+                DELETE FROM workout
+                WHERE id IS NOT NULL AND date < ?
+                    AND NOT EXISTS (SELECT 1 FROM journal j WHERE j.workout_client_id = workout.client_id)
+                ''', (before,))
+
+    def _remove(self, seqs: Iterable[int]) -> None:
+        with self._conn:
+            self._conn.executemany('DELETE FROM journal WHERE seq = ?', [(seq,) for seq in seqs])
+
+    def _fail(self, seq: int, error: str) -> bool:
+        # Возвращает True, если подход перенесен в dead_letter
+        with self._conn:
+            self._conn.execute('UPDATE journal SET attempts = attempts + 1 WHERE seq = ?', (seq,))
+            moved = self._conn.execute('''
+                INSERT INTO dead_letter (seq, client_id, workout, workout_client_id, exercise, weight, reps,
+                                         attempts, error)
+                SELECT seq, client_id, workout, workout_client_id, exercise, weight, reps, attempts, ?
+                FROM journal
+                WHERE seq = ? AND attempts >= ?
+                ''', (error, seq, self.max_attempts)).rowcount
+            if moved:
+                self._conn.execute('DELETE FROM journal WHERE seq = ?', (seq,))
+        return bool(moved)
+
+    def _dead_letter(self, seqs: List[int], error: str) -> None:
+        with self._conn:
+            self._conn.executemany('''
+                INSERT INTO dead_letter (seq, client_id, workout, workout_client_id, exercise, weight, reps,
+                                         attempts, error)
+                SELECT seq, client_id, workout, workout_client_id, exercise, weight, reps, attempts, ?
+                FROM journal
+                WHERE seq = ?
+                ''', [(error, seq) for seq in seqs])
+            self._conn.executemany('DELETE FROM journal WHERE seq = ?', [(seq,) for seq in seqs])
+
+    @staticmethod
+    def _is_data_error(error: Exception) -> bool:
+        # 22 - ошибки данных, 23 - нарушения ограничений; повтор той же пачки их не исправит
+        return isinstance(error, asyncpg.PostgresError) and (error.sqlstate or '')[:2] in ('22', '23')
+
+    async def _save_workouts(self, workouts: List[Tuple]) -> None:
+        ids = await self.db.save_journal_workouts([
+            (uuid.UUID(client_id), telegram_id, date.fromisoformat(day))
+            for client_id, telegram_id, day in workouts
+        ])
+        await self._run(self._resolve_workouts, {str(client_id): workout_id for client_id, workout_id in ids.items()})
+
+    async def _create_workouts(self) -> None:
+        workouts = await self._run(self._unresolved_workouts)
+        if not workouts:
+            return
+        try:
+            await self._save_workouts(workouts)
+            return
+        except Exception as e:
+            if not self._is_data_error(e):
+                raise
+            logger.warning("Тренировки журнала не записаны, запись по одной: %s", e)
+        for workout in workouts:
+            try:
+                await self._save_workouts([workout])
+            except Exception as e:
+                if not self._is_data_error(e):
+                    raise
+                moved = await self._run(self._dead_letter_workout, workout[0], str(e))
+                self.dead_letters += moved
+                logger.error("Тренировка %s не создана, подходов перенесено в dead_letter: %s: %s",
+                             workout[0], moved, e)
+
+    async def _save(self, rows: List[Tuple]) -> int:
+        result = await self.db.save_journal_sets([
+            (uuid.UUID(client_id), workout, exercise, Decimal(weight), reps, seq)
+            for seq, client_id, workout, exercise, weight, reps in rows
+        ])
+        if result['orphaned']:
+            orphaned = {str(client_id) for client_id in result['orphaned']}
+            seqs = [row[0] for row in rows if row[1] in orphaned]
+            await self._run(self._dead_letter, seqs, "тренировка удалена")
+            self.dead_letters += len(seqs)
+            logger.error("Подходов без тренировки перенесено в dead_letter: %s", len(seqs))
+        await self._run(self._remove, [row[0] for row in rows])
+        return result['saved']
+
+    async def _save_each(self, rows: List[Tuple]) -> int:
+        saved = 0
+        for row in rows:
+            try:
+                saved += await self._save([row])
+            except Exception as e:
+                if not self._is_data_error(e):
+                    raise
+                if await self._run(self._fail, row[0], str(e)):
+                    self.dead_letters += 1
+                    logger.error("Подход %s перенесен в dead_letter после %s попыток: %s",
+                                 row[1], self.max_attempts, e)
+        return saved
+
+    async def flush(self) -> int:
+        """
+        Перенести подходы из журнала в базу
+
+        Сначала в базе создаются тренировки журнала, затем выгружаются подходы.
+        Подходы, которые не записались из-за данных, остаются в журнале
+        до следующей выгрузки, следующие за ними подходы выгружаются.
+
+        Returns:
+            int: Количество записанных в базу подходов
+        """
+        flushed = 0
+        async with self._flush_lock:
+            await self._create_workouts()
+            last_seq = 0
+            while rows := await self._run(self._pending, last_seq):
+                last_seq = rows[-1][0]
+                try:
+                    flushed += await self._save(rows)
+                except Exception as e:
+                    if not self._is_data_error(e):
+                        raise
+                    logger.warning("Пачка журнала не записана, запись по одному подходу: %s", e)
+                    flushed += await self._save_each(rows)
+            await self._run(self._forget_workouts, (date.today() - timedelta(days=1)).isoformat())
+        return flushed
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Ошибка выгрузки журнала подходов: %s", e)
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        if self._conn is not None:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Подходы остались в журнале до следующего запуска: %s", e)
+            await self._run(self._conn.close)
+        self._executor.shutdown(wait=True)
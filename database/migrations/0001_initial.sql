@@ -0,0 +1,28 @@
+-- Исходная схема, которую раньше создавал Database.init_tables
+CREATE TABLE IF NOT EXISTS "USER" (
+    telegram_id BIGINT PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS WORKOUT (
+    id SERIAL PRIMARY KEY,
+    telegram_id BIGINT NOT NULL REFERENCES "USER"(telegram_id),
+    date DATE NOT NULL DEFAULT CURRENT_DATE
+);
+
+CREATE TABLE IF NOT EXISTS EXERCISE (
+    id SERIAL PRIMARY KEY,
+    telegram_id BIGINT NOT NULL REFERENCES "USER"(telegram_id),
+    muscle_group VARCHAR(150) NOT NULL,
+    name VARCHAR(150) NOT NULL,
+    UNIQUE(telegram_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS SET (
+    id SERIAL PRIMARY KEY,
+    workout INTEGER NOT NULL REFERENCES WORKOUT(id) ON DELETE CASCADE,
+    exercise INTEGER NOT NULL REFERENCES EXERCISE(id),
+    set_order INTEGER NOT NULL,
+    weight DECIMAL(5, 2),
+    reps INTEGER NOT NULL,
+    UNIQUE(workout, exercise, set_order)
+);
@@ -0,0 +1,15 @@
+-- migrate:concurrently
+-- Индексы под запросы database/database.py
+-- get_workout_dates, get_workout_by_date, get_user_workouts
+CREATE INDEX CONCURRENTLY IF NOT EXISTS workout_telegram_id_date_idx
+    ON WORKOUT (telegram_id, date DESC);
+
+-- get_muscle_groups, get_exercises_by_muscle_group (index-only scan)
+-- get_exercise_by_name покрыт UNIQUE(telegram_id, name)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS exercise_telegram_id_muscle_group_idx
+    ON EXERCISE (telegram_id, muscle_group) INCLUDE (name);
+
+-- get_workout_sets_by_exercise, get_workout_sets: UNIQUE(workout, exercise, set_order)
+-- не содержит weight и reps, покрывающий индекс дает index-only scan
+CREATE INDEX CONCURRENTLY IF NOT EXISTS set_workout_exercise_order_idx
+    ON SET (workout, exercise, set_order) INCLUDE (weight, reps);
@@ -0,0 +1,10 @@
+-- Хранилище состояний FSM для PostgresStorage
+CREATE TABLE IF NOT EXISTS FSM_STATE (
+    key VARCHAR(255) PRIMARY KEY,
+    state VARCHAR(255),
+    data JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Удаление устаревших сессий
+CREATE INDEX IF NOT EXISTS fsm_state_updated_at_idx ON FSM_STATE (updated_at);
@@ -0,0 +1,37 @@
+-- Общий каталог базовых упражнений вместо копий у каждого пользователя.
+-- Упражнения каталога хранятся в EXERCISE с telegram_id = NULL, поэтому
+-- внешние ключи SET продолжают ссылаться на одну таблицу
+ALTER TABLE EXERCISE ALTER COLUMN telegram_id DROP NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS exercise_catalog_name_idx
+    ON EXERCISE (name) WHERE telegram_id IS NULL;
+
+INSERT INTO EXERCISE (name, muscle_group, telegram_id)
+VALUES
+    ('Жим штанги лежа', 'Chest', NULL),
+    ('Приседания со штангой', 'Legs', NULL),
+    ('Становая тяга', 'Back', NULL),
+    ('Подтягивания', 'Back', NULL),
+    ('Жим гантелей сидя', 'Shoulders', NULL),
+    ('Подъем штанги', 'Biceps', NULL),
+    ('Французский жим', 'Triceps', NULL),
+    ('Выпады', 'Legs', NULL),
+    ('Планка', 'Abs', NULL)
+ON CONFLICT (name) WHERE telegram_id IS NULL DO NOTHING;
+
+-- Подходы пользовательских копий переносятся на упражнения каталога,
+-- после чего копии удаляются. Название упражнения уникально среди
+-- упражнений каталога и пользователя, поэтому поиск по имени однозначен
+UPDATE SET s
+SET exercise = c.id
+FROM EXERCISE e, EXERCISE c
+WHERE s.exercise = e.id
+    AND e.telegram_id IS NOT NULL
+    AND c.telegram_id IS NULL
+    AND c.name = e.name;
+
+DELETE FROM EXERCISE e
+USING EXERCISE c
+WHERE e.telegram_id IS NOT NULL
+    AND c.telegram_id IS NULL
+    AND c.name = e.name;
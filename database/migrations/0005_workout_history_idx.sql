@@ -0,0 +1,7 @@
+-- migrate:concurrently
+-- Keyset-пагинация истории тренировок по (date, id): страница N читается
+-- из индекса так же, как первая. Старый индекс является префиксом нового
+CREATE INDEX CONCURRENTLY IF NOT EXISTS workout_telegram_id_date_id_idx
+    ON WORKOUT (telegram_id, date DESC, id DESC);
+
+DROP INDEX CONCURRENTLY IF EXISTS workout_telegram_id_date_idx;
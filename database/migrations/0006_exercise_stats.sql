@@ -0,0 +1,17 @@
+-- Статистика по упражнениям пользователя: рекорды и объем без сканирования SET.
+-- Обновляется инкрементально при записи подходов, существующие данные
+-- заполняет bot.jobs.stats_backfill
+CREATE OR REPLACE FUNCTION epley_1rm(weight DECIMAL, reps INTEGER) RETURNS DECIMAL
+    LANGUAGE SQL IMMUTABLE
+    AS $$ SELECT CASE WHEN reps <= 1 THEN weight ELSE round(weight * (1 + reps / 30.0), 2) END $$;
+
+CREATE TABLE IF NOT EXISTS EXERCISE_STATS (
+    telegram_id BIGINT NOT NULL REFERENCES "USER"(telegram_id),
+    exercise INTEGER NOT NULL REFERENCES EXERCISE(id),
+    best_weight DECIMAL(5, 2),
+    best_1rm DECIMAL(7, 2),
+    total_volume DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    last_date DATE NOT NULL,
+    set_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (telegram_id, exercise)
+);
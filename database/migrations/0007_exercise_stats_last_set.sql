@@ -0,0 +1,12 @@
+-- Последний подход упражнения: по нему проверяется актуальность кэша графиков прогресса
+ALTER TABLE EXERCISE_STATS ADD COLUMN IF NOT EXISTS last_set_id INTEGER;
+
+UPDATE EXERCISE_STATS st
+SET last_set_id = h.last_set_id
+FROM (
+    SELECT w.telegram_id, s.exercise, MAX(s.id) AS last_set_id
+    FROM WORKOUT w
+    INNER JOIN SET s ON s.workout = w.id
+    GROUP BY w.telegram_id, s.exercise
+) h
+WHERE h.telegram_id = st.telegram_id AND h.exercise = st.exercise;
@@ -0,0 +1,7 @@
+-- migrate:concurrently
+-- Идентификатор подхода, который назначает клиент при записи в журнал SetJournal.
+-- Повторная выгрузка журнала после сбоя не создает дубликатов
+ALTER TABLE SET ADD COLUMN IF NOT EXISTS client_id UUID;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS set_client_id_idx
+    ON SET (client_id);
@@ -0,0 +1,5 @@
+-- Отпечаток содержимого импортированной тренировки: md5 от упражнений,
+-- номеров подходов, весов и повторений. Повторный импорт того же файла
+-- сравнивает отпечатки и не пишет неизменившиеся тренировки.
+-- У тренировок, записанных в боте, отпечатка нет
+ALTER TABLE WORKOUT ADD COLUMN IF NOT EXISTS fingerprint TEXT;
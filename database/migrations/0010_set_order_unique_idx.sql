@@ -0,0 +1,11 @@
+-- migrate:concurrently
+-- UNIQUE(workout, exercise, set_order) и set_workout_exercise_order_idx из 0002
+-- индексируют одни и те же колонки. Ограничение заменяется уникальным индексом
+-- с INCLUDE (weight, reps): он и проверяет уникальность, и дает index-only scan
+-- для get_workout_sets_by_exercise и get_workout_sets
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS set_workout_exercise_order_key_idx
+    ON SET (workout, exercise, set_order) INCLUDE (weight, reps);
+
+ALTER TABLE SET DROP CONSTRAINT IF EXISTS set_workout_exercise_set_order_key;
+
+DROP INDEX CONCURRENTLY IF EXISTS set_workout_exercise_order_idx;
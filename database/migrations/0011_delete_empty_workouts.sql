@@ -0,0 +1,7 @@
+-- Тренировки создавались при нажатии "Новая тренировка", и брошенные без подходов
+-- оставались в истории пустыми. Теперь тренировка создается с первым подходом,
+-- старые пустые тренировки удаляются. Сегодняшние и вчерашние не трогаются:
+-- их подходы могут еще ждать выгрузки в журнале
+DELETE FROM WORKOUT w
+WHERE w.date < CURRENT_DATE - 1
+    AND NOT EXISTS (SELECT 1 FROM SET s WHERE s.workout = w.id);
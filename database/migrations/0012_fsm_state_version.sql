@@ -0,0 +1,8 @@
+-- Версия состояния FSM для PostgresStorage с несколькими писателями: экземпляр
+-- сверяет версию закэшированной записи с базой и пишет с проверкой версии.
+-- Версии берутся из общей последовательности, поэтому удаленная и созданная
+-- заново запись не получит версию, которая уже была у нее в чьем-то кэше
+CREATE SEQUENCE IF NOT EXISTS fsm_state_version_seq;
+
+ALTER TABLE FSM_STATE
+    ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT nextval('fsm_state_version_seq');
@@ -0,0 +1,8 @@
+-- migrate:concurrently
+-- Идентификатор тренировки, который назначает бот. В режиме журнала подходов
+-- тренировка создается в базе при выгрузке журнала, повторная выгрузка
+-- находит уже созданную тренировку по client_id
+ALTER TABLE WORKOUT ADD COLUMN IF NOT EXISTS client_id UUID;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS workout_client_id_idx
+    ON WORKOUT (client_id);
@@ -0,0 +1,12 @@
+-- Существующая история не попадала в EXERCISE_STATS, пока не запустят
+-- bot.jobs.stats_backfill, а подходы, записанные после 0006, создали строки
+-- только со своим вкладом. Статистика пересчитывается по всей истории подходов
+DELETE FROM EXERCISE_STATS;
+
+INSERT INTO EXERCISE_STATS (telegram_id, exercise, best_weight, best_1rm,
+                            total_volume, last_date, set_count, last_set_id)
+SELECT w.telegram_id, s.exercise, MAX(s.weight), MAX(epley_1rm(s.weight, s.reps)),
+        COALESCE(SUM(s.weight * s.reps), 0), MAX(w.date), COUNT(*), MAX(s.id)
+FROM WORKOUT w
+INNER JOIN SET s ON s.workout = w.id
+GROUP BY w.telegram_id, s.exercise;
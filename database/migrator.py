@@ -0,0 +1,192 @@
+import asyncpg
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / 'migrations'
+
+# Произвольный ключ advisory lock, чтобы несколько экземпляров бота
+# не применяли миграции одновременно
+MIGRATIONS_LOCK_KEY = 7305921
+
+# Первая строка миграции, которую нельзя выполнять в транзакции
+CONCURRENT_HEADER = '-- migrate:concurrently'
+CREATE_INDEX_CONCURRENTLY = re.compile(
+    r'^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)',
+    re.IGNORECASE
+)
+
+
+def load_migrations() -> List[Tuple[int, str, str]]:
+    """
+    Загрузка файлов миграций
+
+    Файлы называются NNNN_описание.sql и применяются по возрастанию номера.
+    Миграции с CREATE INDEX CONCURRENTLY начинаются со строки CONCURRENT_HEADER.
+
+    Returns:
+        List[Tuple[int, str, str]]: Номер версии, имя файла и SQL миграции
+    """
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob('*.sql')):
+        version = int(path.name.split('_', 1)[0])
+        migrations.append((version, path.name, path.read_text(encoding='utf-8')))
+    return migrations
+
+
+def split_statements(sql: str) -> List[str]:
+    """
+    Разбиение миграции на отдельные запросы по ';'
+
+    Args:
+        sql (str): Текст миграции
+
+    Returns:
+        List[str]: Запросы без пустых и состоящих только из комментариев
+    """
+    statements = []
+    for statement in sql.split(';'):
+        code = [line for line in statement.splitlines()
+                if line.strip() and not line.strip().startswith('--')]
+        if code:
+            statements.append('\n'.join(code).strip())
+    return statements
+
+
+def is_concurrent(sql: str) -> bool:
+    """
+    Нужно ли выполнять миграцию вне транзакции
+
+    Args:
+        sql (str): Текст миграции
+
+    Returns:
+        bool: Первая строка миграции - CONCURRENT_HEADER
+    """
+    return sql.lstrip().startswith(CONCURRENT_HEADER)
+
+
+def concurrent_index_name(statement: str) -> Optional[str]:
+    """
+    Имя индекса, создаваемого запросом CREATE INDEX CONCURRENTLY
+
+    Args:
+        statement (str): Запрос без комментариев
+
+    Returns:
+        Optional[str]: Имя индекса, None - запрос не создает индекс конкурентно
+    """
+    match = CREATE_INDEX_CONCURRENTLY.match(statement)
+    return match.group(1).lower() if match else None
+
+
+async def drop_invalid_index(conn: asyncpg.Connection, name: str) -> bool:
+    """
+    Удаление индекса, оставшегося INVALID после неудачного CREATE INDEX CONCURRENTLY
+
+    Такой индекс не используется планировщиком, но мешает повторному созданию:
+    IF NOT EXISTS видит его и ничего не делает.
+
+    Args:
+        conn (asyncpg.Connection): Соединение
+        name (str): Имя индекса
+
+    Returns:
+        bool: Был ли индекс удален
+    """
+    invalid = await conn.fetchval('''
+        SELECT NOT i.indisvalid
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = $1 AND pg_table_is_visible(c.oid)
+        ''', name)
+    if not invalid:
+        return False
+    logger.warning("Индекс %s остался INVALID после неудачного создания, удаление", name)
+    await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+    return True
+
+
+async def apply_concurrently(conn: asyncpg.Connection, sql: str, attempts: int = 2) -> None:
+    """
+    Выполнение миграции вне транзакции по одному запросу
+
+    Перед созданием индекса удаляется его INVALID остаток от прошлой попытки.
+    Если создание не удалось, недостроенный индекс удаляется и запрос повторяется
+    до attempts раз.
+
+    Args:
+        conn (asyncpg.Connection): Соединение
+        sql (str): Текст миграции
+        attempts (int): Количество попыток создания индекса
+    """
+    for statement in split_statements(sql):
+        name = concurrent_index_name(statement)
+        if name is None:
+            await conn.execute(statement)
+            continue
+        await drop_invalid_index(conn, name)
+        for attempt in range(1, attempts + 1):
+            try:
+                await conn.execute(statement)
+                break
+            except asyncpg.PostgresError as e:
+                await drop_invalid_index(conn, name)
+                if attempt == attempts:
+                    raise
+                logger.warning("Не удалось создать индекс %s (попытка %s): %s", name, attempt, e)
+
+
+async def migrate(pool: asyncpg.Pool) -> None:
+    """
+    Применение новых миграций
+
+    Примененные версии хранятся в таблице SCHEMA_VERSION. Если схема актуальна,
+    выполняется только проверка версии. Миграции с CREATE INDEX CONCURRENTLY нельзя выполнять
+    в транзакции, поэтому миграции с CONCURRENT_HEADER выполняются через apply_concurrently,
+    остальные применяются целиком в транзакции.
+
+    Args:
+        pool (asyncpg.Pool): Пул соединений
+    """
+    migrations = load_migrations()
+    latest = migrations[-1][0]
+    async with pool.acquire() as conn:
+        current = 0
+        if await conn.fetchval("SELECT to_regclass('schema_version') IS NOT NULL"):
+            current = await conn.fetchval('SELECT COALESCE(MAX(version), 0) FROM SCHEMA_VERSION')
+        if current >= latest:
+            logger.info("Схема базы данных актуальна, версия %s", current)
+            return
+
+        await conn.execute('SELECT pg_advisory_lock($1)', MIGRATIONS_LOCK_KEY)
+        try:
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS SCHEMA_VERSION (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+                ''')
+            applied = {row['version'] for row in await conn.fetch('SELECT version FROM SCHEMA_VERSION')}
+            for version, name, sql in migrations:
+                if version in applied:
+                    continue
+                logger.info("Применение миграции %s", name)
+                if is_concurrent(sql):
+                    await apply_concurrently(conn, sql)
+                    await conn.execute('''
+                        INSERT INTO SCHEMA_VERSION (version, name) VALUES ($1, $2)
+                        ''', version, name)
+                else:
+                    async with conn.transaction():
+                        await conn.execute(sql)
+                        await conn.execute('''
+                            INSERT INTO SCHEMA_VERSION (version, name) VALUES ($1, $2)
+                            ''', version, name)
+        finally:
+            await conn.execute('SELECT pg_advisory_unlock($1)', MIGRATIONS_LOCK_KEY)
+    logger.info("Схема базы данных обновлена до версии %s", latest)
@@ -0,0 +1,95 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+from metrics.histogram import Histogram
+from metrics.prometheus import format_histograms, format_values
+
+
+class PoolMetrics:
+    """
+    Метрики пула соединений по вызывающим методам Database
+
+    Для каждого метода хранится гистограмма ожидания соединения из пула,
+    количество захватов и количество таймаутов.
+    """
+    def __init__(self):
+        self.wait_time: Dict[str, Histogram] = defaultdict(Histogram)
+        self.timeouts: Dict[str, int] = defaultdict(int)
+
+    def observe_wait(self, method: str, seconds: float) -> None:
+        """
+        Записать время ожидания соединения
+
+        Args:
+            method (str): Имя метода Database
+            seconds (float): Время ожидания в секундах
+        """
+        self.wait_time[method].observe(seconds)
+
+    def observe_timeout(self, method: str) -> None:
+        """
+        Записать таймаут ожидания соединения
+
+        Args:
+            method (str): Имя метода Database
+        """
+        self.timeouts[method] += 1
+
+    def snapshot(self, pool: Optional[asyncpg.Pool]) -> Dict[str, Any]:
+        """
+        Сводка по пулу
+
+        Args:
+            pool (Optional[asyncpg.Pool]): Пул соединений
+
+        Returns:
+            Dict[str, Any]: Размер пула, занятые и свободные соединения,
+                ожидание и таймауты по методам
+        """
+        size = pool.get_size() if pool is not None else 0
+        idle = pool.get_idle_size() if pool is not None else 0
+        return {
+            'size': size,
+            'in_use': size - idle,
+            'idle': idle,
+            'max_size': pool.get_max_size() if pool is not None else 0,
+            'methods': {
+                method: {**histogram.snapshot(), 'timeouts': self.timeouts[method]}
+                for method, histogram in self.wait_time.items()
+            },
+            'timeouts': dict(self.timeouts)
+        }
+
+    def collect(self, pool: Optional[asyncpg.Pool]) -> List[str]:
+        """
+        Метрики пула в текстовом формате Prometheus
+
+        Args:
+            pool (Optional[asyncpg.Pool]): Пул соединений
+
+        Returns:
+            List[str]: Строки метрик
+        """
+        size = pool.get_size() if pool is not None else 0
+        idle = pool.get_idle_size() if pool is not None else 0
+        return [
+            *format_histograms(
+                'gym_bot_db_pool_wait_seconds',
+                "Ожидание соединения из пула",
+                [({'method': method}, histogram) for method, histogram in self.wait_time.items()]
+            ),
+            *format_values(
+                'gym_bot_db_pool_timeouts_total',
+                "Таймауты ожидания соединения из пула",
+                'counter',
+                [({'method': method}, count) for method, count in self.timeouts.items()]
+            ),
+            *format_values(
+                'gym_bot_db_pool_connections',
+                "Соединения пула",
+                'gauge',
+                [({'state': 'in_use'}, size - idle), ({'state': 'idle'}, idle)]
+            )
+        ]
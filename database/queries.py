@@ -0,0 +1,483 @@
+import asyncpg
+import logging
+from typing import Any, Dict, List, Optional
+
+from database.tracing import QueryTracer, count_rows, trace_call
+from metrics.prometheus import format_values
+
+logger = logging.getLogger(__name__)
+
+# Инкрементальное обновление EXERCISE_STATS: рекорды берутся как максимум,
+# объем и количество подходов суммируются, поэтому порядок записей не важен
+STATS_UPSERT = '''
+    ON CONFLICT (telegram_id, exercise) DO UPDATE
+    SET best_weight = GREATEST(EXERCISE_STATS.best_weight, EXCLUDED.best_weight),
+        best_1rm = GREATEST(EXERCISE_STATS.best_1rm, EXCLUDED.best_1rm),
+        total_volume = EXERCISE_STATS.total_volume + EXCLUDED.total_volume,
+        last_date = GREATEST(EXERCISE_STATS.last_date, EXCLUDED.last_date),
+        set_count = EXERCISE_STATS.set_count + EXCLUDED.set_count,
+        last_set_id = GREATEST(EXERCISE_STATS.last_set_id, EXCLUDED.last_set_id)
+    '''
+
+# Отпечаток содержимого тренировки для повторного импорта. Считается одинаково
+# по подходам из файла и из базы: вес в обоих случаях DECIMAL(5, 2)
+WORKOUT_FINGERPRINT = '''
+    md5(string_agg(concat_ws(':', {exercise}, {set_order}, COALESCE({weight}::TEXT, ''), {reps}),
+                   ',' ORDER BY {exercise}, {set_order}))
+    '''
+
+# Именованные запросы Database. Каждый запрос подготавливается один раз
+# на соединение пула и дальше берется из кэша prepared statements asyncpg
+QUERIES: Dict[str, str] = {
+    'get_create_user': '''
+        INSERT INTO "USER" (telegram_id)
+        VALUES ($1)
+        ON CONFLICT (telegram_id)
+        DO NOTHING
+        ''',
+    'get_user_ids': '''
+        SELECT u.telegram_id FROM "USER" u
+        WHERE u.telegram_id > $1
+        ORDER BY u.telegram_id
+        LIMIT $2
+        ''',
+    'create_workout': '''
+        INSERT INTO WORKOUT (telegram_id, client_id)
+        VALUES ($1, $2)
+        ON CONFLICT (client_id) DO UPDATE SET client_id = EXCLUDED.client_id
+        RETURNING id
+        ''',
+    'save_journal_workouts': '''
+        INSERT INTO WORKOUT (client_id, telegram_id, date)
+        SELECT * FROM unnest($1::UUID[], $2::BIGINT[], $3::DATE[])
+        ON CONFLICT (client_id) DO UPDATE SET client_id = EXCLUDED.client_id
+        RETURNING client_id, id
+        ''',
+    'import_workout': '''
+        INSERT INTO WORKOUT (telegram_id, date)
+        VALUES ($1, $2)
+        RETURNING id
+        ''',
+    'get_exercise_by_name': '''
+        SELECT e.id FROM EXERCISE as e
+        WHERE (e.telegram_id = $1 OR e.telegram_id IS NULL) AND e.name = $2
+        ''',
+    'create_exercise': '''
+        WITH existing AS (
+            SELECT e.id FROM EXERCISE e
+            WHERE (e.telegram_id = $3 OR e.telegram_id IS NULL) AND e.name = $1
+        ), new_exercise AS (
+            INSERT INTO EXERCISE (name, muscle_group, telegram_id)
+            SELECT $1::VARCHAR, $2::VARCHAR, $3::BIGINT
+            WHERE NOT EXISTS (SELECT 1 FROM existing)
+            ON CONFLICT (telegram_id, name) DO NOTHING
+            RETURNING id
+        )
+        SELECT id FROM new_exercise
+        UNION ALL
+        SELECT id FROM existing
+        ''',
+    'get_exercises_by_muscle_group': '''
+        SELECT e.name FROM EXERCISE e
+        WHERE (e.telegram_id = $1 OR e.telegram_id IS NULL) AND e.muscle_group = $2
+        ORDER BY e.telegram_id NULLS FIRST, e.id
+        ''',
+    'get_muscle_groups': '''
+        SELECT DISTINCT e.muscle_group FROM EXERCISE e
+        WHERE e.telegram_id = $1 OR e.telegram_id IS NULL
+        ORDER BY e.muscle_group
+        ''',
+    'get_workouts_page': '''
+        SELECT w.id, w.date FROM WORKOUT w
+        WHERE w.telegram_id = $1
+        ORDER BY w.date DESC, w.id DESC
+        LIMIT $2
+        ''',
+    'get_workouts_page_older': '''
+        SELECT w.id, w.date FROM WORKOUT w
+        WHERE w.telegram_id = $1 AND (w.date, w.id) < ($3, $4)
+        ORDER BY w.date DESC, w.id DESC
+        LIMIT $2
+        ''',
+    'get_workouts_page_newer': '''
+        SELECT w.id, w.date FROM WORKOUT w
+        WHERE w.telegram_id = $1 AND (w.date, w.id) > ($3, $4)
+        ORDER BY w.date ASC, w.id ASC
+        LIMIT $2
+        ''',
+    'get_workout': '''
+        SELECT w.date, e.name, e.muscle_group,
+                array_agg(s.set_order ORDER BY s.set_order) AS set_orders,
+                array_agg(s.weight ORDER BY s.set_order) AS weights,
+                array_agg(s.reps ORDER BY s.set_order) AS reps
+        FROM WORKOUT w
+        INNER JOIN SET s ON s.workout = w.id
+        INNER JOIN EXERCISE e ON e.id = s.exercise
+        WHERE w.id = $1 AND w.telegram_id = $2
+        GROUP BY w.date, e.id
+        ORDER BY MIN(s.id)
+        ''',
+    'get_user_workouts': '''
+        SELECT w.id, w.date,
+                e.name, e.muscle_group,
+                s.weight, s.reps, s.set_order
+        FROM SET s
+        INNER JOIN WORKOUT w ON w.id = s.workout
+        INNER JOIN EXERCISE e ON e.id = s.exercise
+        WHERE w.telegram_id = $1
+        ORDER BY w.date DESC, e.muscle_group, e.name, s.set_order
+        LIMIT $2
+        ''',
+    'add_set_to_workout': '''
+        WITH new_set AS (
+            INSERT INTO SET (workout, exercise, set_order, weight, reps)
+            VALUES ($1, $2, $3, $4, $5)
+            RETURNING id, weight, reps
+        ), stats AS (
+            INSERT INTO EXERCISE_STATS (telegram_id, exercise, best_weight, best_1rm,
+                                        total_volume, last_date, set_count, last_set_id)
+            SELECT w.telegram_id, $2, n.weight, epley_1rm(n.weight, n.reps),
+                    COALESCE(n.weight * n.reps, 0), w.date, 1, n.id
+            FROM new_set n
+            INNER JOIN WORKOUT w ON w.id = $1
+        ''' + STATS_UPSERT + '''
+        )
+        SELECT id FROM new_set
+        ''',
+    'log_sets': '''
+        WITH input AS (
+            SELECT i.weight, i.reps, i.n
+            FROM unnest($3::DECIMAL(5, 2)[], $4::INTEGER[]) WITH ORDINALITY AS i(weight, reps, n)
+        ), last_set AS (
+            SELECT COALESCE(MAX(s.set_order), 0) AS set_order
+            FROM SET s
+            WHERE s.workout = $1 AND s.exercise = $2
+        ), new_set AS (
+            INSERT INTO SET (workout, exercise, set_order, weight, reps)
+            SELECT $1, $2, l.set_order + i.n, i.weight, i.reps
+            FROM input i
+            CROSS JOIN last_set l
+            RETURNING id, set_order, weight, reps
+        ), stats AS (
+            INSERT INTO EXERCISE_STATS (telegram_id, exercise, best_weight, best_1rm,
+                                        total_volume, last_date, set_count, last_set_id)
+            SELECT w.telegram_id, $2, MAX(n.weight), MAX(epley_1rm(n.weight, n.reps)),
+                    COALESCE(SUM(n.weight * n.reps), 0), w.date, COUNT(*), MAX(n.id)
+            FROM new_set n
+            INNER JOIN WORKOUT w ON w.id = $1
+            GROUP BY w.telegram_id, w.date
+        ''' + STATS_UPSERT + '''
+        )
+        SELECT s.set_order, s.weight, s.reps
+        FROM SET s
+        WHERE s.workout = $1 AND s.exercise = $2
+        UNION ALL
+        SELECT n.set_order, n.weight, n.reps
+        FROM new_set n
+        ORDER BY set_order
+        ''',
+    'save_journal_sets': '''
+        WITH batch AS (
+            SELECT i.client_id, i.workout, i.exercise, i.weight, i.reps, i.seq,
+                    EXISTS (SELECT 1 FROM WORKOUT w WHERE w.id = i.workout) AS has_workout
+            FROM unnest($1::UUID[], $2::INTEGER[], $3::INTEGER[], $4::DECIMAL(5, 2)[],
+                        $5::INTEGER[], $6::BIGINT[]) AS i(client_id, workout, exercise, weight, reps, seq)
+        ), input AS (
+            SELECT b.client_id, b.workout, b.exercise, b.weight, b.reps, b.seq
+            FROM batch b
+            WHERE b.has_workout
+                AND NOT EXISTS (SELECT 1 FROM SET s WHERE s.client_id = b.client_id)
+        ), last_set AS (
+            SELECT s.workout, s.exercise, MAX(s.set_order) AS set_order
+            FROM SET s
+            INNER JOIN (SELECT DISTINCT workout, exercise FROM input) g
+                ON g.workout = s.workout AND g.exercise = s.exercise
+            GROUP BY s.workout, s.exercise
+        ), new_set AS (
+            INSERT INTO SET (workout, exercise, set_order, weight, reps, client_id)
+            SELECT i.workout, i.exercise,
+                    COALESCE(l.set_order, 0)
+                        + row_number() OVER (PARTITION BY i.workout, i.exercise ORDER BY i.seq),
+                    i.weight, i.reps, i.client_id
+            FROM input i
+            LEFT JOIN last_set l ON l.workout = i.workout AND l.exercise = i.exercise
+            ON CONFLICT (client_id) DO NOTHING
+            RETURNING id, workout, exercise, weight, reps
+        ), stats AS (
+            INSERT INTO EXERCISE_STATS (telegram_id, exercise, best_weight, best_1rm,
+                                        total_volume, last_date, set_count, last_set_id)
+            SELECT w.telegram_id, n.exercise, MAX(n.weight), MAX(epley_1rm(n.weight, n.reps)),
+                    COALESCE(SUM(n.weight * n.reps), 0), MAX(w.date), COUNT(*), MAX(n.id)
+            FROM new_set n
+            INNER JOIN WORKOUT w ON w.id = n.workout
+            GROUP BY w.telegram_id, n.exercise
+        ''' + STATS_UPSERT + '''
+        )
+        SELECT (SELECT COUNT(*) FROM new_set) AS saved,
+                ARRAY(SELECT b.client_id FROM batch b WHERE NOT b.has_workout) AS orphaned,
+                ARRAY(SELECT DISTINCT w.telegram_id FROM new_set n
+                      INNER JOIN WORKOUT w ON w.id = n.workout) AS users
+        ''',
+    'get_workout_sets_by_exercise': '''
+        SELECT s.set_order, s.weight, s.reps
+        FROM SET s
+        WHERE s.workout = $1 AND s.exercise = $2
+        ORDER BY s.set_order
+        ''',
+    'get_workout_sets': '''
+        SELECT s.id, s.set_order, s.weight, s.reps,
+                e.name as exercise_name, e.muscle_group
+        FROM SET s
+        JOIN EXERCISE e ON s.exercise = e.id
+        WHERE s.workout = $1
+        ORDER BY s.set_order
+        ''',
+    'get_exercise_stats': '''
+        SELECT st.exercise, e.name, e.muscle_group, st.best_weight, st.best_1rm,
+                st.total_volume, st.last_date, st.set_count
+        FROM EXERCISE_STATS st
+        INNER JOIN EXERCISE e ON e.id = st.exercise
+        WHERE st.telegram_id = $1
+        ORDER BY st.last_date DESC, e.name
+        ''',
+    'get_personal_records': '''
+        SELECT e.name, st.best_weight
+        FROM EXERCISE_STATS st
+        INNER JOIN EXERCISE e ON e.id = st.exercise
+        WHERE st.telegram_id = $1 AND e.muscle_group = $2
+        ''',
+    'get_exercise_last_set': '''
+        SELECT e.name, st.last_set_id
+        FROM EXERCISE_STATS st
+        INNER JOIN EXERCISE e ON e.id = st.exercise
+        WHERE st.telegram_id = $1 AND st.exercise = $2
+        ''',
+    'get_exercise_history': '''
+        SELECT array_agg(w.date ORDER BY w.date, s.id) AS dates,
+                array_agg(s.weight::FLOAT8 ORDER BY w.date, s.id) AS weights,
+                array_agg(s.reps ORDER BY w.date, s.id) AS reps
+        FROM WORKOUT w
+        INNER JOIN SET s ON s.workout = w.id
+        WHERE w.telegram_id = $1 AND s.exercise = $2
+        ''',
+    'clear_exercise_stats': '''
+        DELETE FROM EXERCISE_STATS
+        WHERE telegram_id = ANY($1::BIGINT[])
+        ''',
+    'rebuild_exercise_stats': '''
+        INSERT INTO EXERCISE_STATS (telegram_id, exercise, best_weight, best_1rm,
+                                    total_volume, last_date, set_count, last_set_id)
+        SELECT w.telegram_id, s.exercise, MAX(s.weight), MAX(epley_1rm(s.weight, s.reps)),
+                COALESCE(SUM(s.weight * s.reps), 0), MAX(w.date), COUNT(*), MAX(s.id)
+        FROM WORKOUT w
+        INNER JOIN SET s ON s.workout = w.id
+        WHERE w.telegram_id = ANY($1::BIGINT[])
+        GROUP BY w.telegram_id, s.exercise
+        ''',
+    'clear_exercise_stats_for': '''
+        DELETE FROM EXERCISE_STATS
+        WHERE telegram_id = $1 AND exercise = ANY($2::INTEGER[])
+        ''',
+    'rebuild_exercise_stats_for': '''
+        INSERT INTO EXERCISE_STATS (telegram_id, exercise, best_weight, best_1rm,
+                                    total_volume, last_date, set_count, last_set_id)
+        SELECT w.telegram_id, s.exercise, MAX(s.weight), MAX(epley_1rm(s.weight, s.reps)),
+                COALESCE(SUM(s.weight * s.reps), 0), MAX(w.date), COUNT(*), MAX(s.id)
+        FROM WORKOUT w
+        INNER JOIN SET s ON s.workout = w.id
+        WHERE w.telegram_id = $1 AND s.exercise = ANY($2::INTEGER[])
+        GROUP BY w.telegram_id, s.exercise
+        ''',
+    # Состояние и данные возвращаются, только если версия отличается от известной
+    'get_fsm_record': '''
+        SELECT f.version,
+                CASE WHEN f.version IS DISTINCT FROM $2::BIGINT THEN f.state END AS state,
+                CASE WHEN f.version IS DISTINCT FROM $2::BIGINT THEN f.data::TEXT END AS data
+        FROM FSM_STATE f
+        WHERE f.key = $1
+        ''',
+    'save_fsm_records': '''
+        INSERT INTO FSM_STATE (key, state, data, updated_at)
+        SELECT r.key, r.state, r.data::JSONB, now()
+        FROM unnest($1::VARCHAR[], $2::VARCHAR[], $3::TEXT[]) AS r(key, state, data)
+        ON CONFLICT (key) DO UPDATE
+        SET state = EXCLUDED.state, data = EXCLUDED.data, updated_at = EXCLUDED.updated_at,
+            version = nextval('fsm_state_version_seq')
+        ''',
+    # Запись с проверкой версии: обновляется только версия $4, новая запись
+    # создается только при $4 IS NULL. Пустой результат - запись изменил другой экземпляр
+    'save_fsm_record': '''
+        WITH updated AS (
+            UPDATE FSM_STATE
+            SET state = $2, data = $3::JSONB, updated_at = now(),
+                version = nextval('fsm_state_version_seq')
+            WHERE key = $1 AND version = $4::BIGINT
+            RETURNING version
+        ), inserted AS (
+            INSERT INTO FSM_STATE (key, state, data, updated_at)
+            SELECT $1, $2, $3::JSONB, now()
+            WHERE $4::BIGINT IS NULL
+            ON CONFLICT (key) DO NOTHING
+            RETURNING version
+        )
+        SELECT version FROM updated
+        UNION ALL
+        SELECT version FROM inserted
+        ''',
+    'delete_fsm_record': '''
+        DELETE FROM FSM_STATE
+        WHERE key = $1 AND version = $2
+        RETURNING version
+        ''',
+    'delete_fsm_records': '''
+        DELETE FROM FSM_STATE
+        WHERE key = ANY($1::VARCHAR[])
+        ''',
+    'expire_fsm_records': '''
+        DELETE FROM FSM_STATE
+        WHERE updated_at < now() - make_interval(secs => $1)
+        ''',
+}
+
+
+class QueryRegistry:
+    """
+    Реестр именованных запросов
+
+    Запросы выполняются через кэш prepared statements asyncpg размером cache_size
+    на соединение. Чтобы запросы реестра не вытесняли друг друга, кэш должен
+    вмещать их все, иначе при создании пишется предупреждение. Выполнения
+    и длительность запросов по именам считает QueryTracer.
+    """
+    def __init__(self, queries: Dict[str, str], cache_size: int):
+        self.queries = queries
+        self.cache_size = cache_size
+        if cache_size < len(queries):
+            logger.warning("Кэш prepared statements (%s) меньше реестра запросов (%s): "
+                           "запросы будут подготавливаться заново", cache_size, len(queries))
+
+    def collect(self) -> List[str]:
+        """
+        Метрики реестра в текстовом формате Prometheus
+
+        Returns:
+            List[str]: Строки метрик
+        """
+        return [
+            *format_values('gym_bot_db_named_queries', "Запросы в реестре", 'gauge', [({}, len(self.queries))]),
+            *format_values(
+                'gym_bot_db_statement_cache_size',
+                "Размер кэша prepared statements asyncpg на соединение",
+                'gauge',
+                [({}, self.cache_size)]
+            )
+        ]
+
+
+class NamedQuery:
+    """
+    Запрос реестра на конкретном соединении
+
+    Выполняется обычными fetch и execute asyncpg, вызовы пишутся в трассировку
+    под именем запроса.
+    """
+    __slots__ = ('_conn', '_name', '_query')
+
+    def __init__(self, conn: 'RegistryConnection', name: str, query: str):
+        self._conn = conn
+        self._name = name
+        self._query = query
+
+    def get_query(self) -> str:
+        return self._query
+
+    async def fetch(self, *args: Any, timeout: Optional[float] = None) -> List[asyncpg.Record]:
+        return await trace_call(self._conn._tracer, self._name, self._query, args,
+                                asyncpg.Connection.fetch(self._conn, self._query, *args, timeout=timeout),
+                                count_rows)
+
+    async def fetchrow(self, *args: Any, timeout: Optional[float] = None) -> Optional[asyncpg.Record]:
+        return await trace_call(self._conn._tracer, self._name, self._query, args,
+                                asyncpg.Connection.fetchrow(self._conn, self._query, *args, timeout=timeout),
+                                count_rows)
+
+    async def fetchval(self, *args: Any, column: int = 0, timeout: Optional[float] = None) -> Any:
+        return await trace_call(self._conn._tracer, self._name, self._query, args,
+                                asyncpg.Connection.fetchval(self._conn, self._query, *args,
+                                                            column=column, timeout=timeout),
+                                lambda result: 1)
+
+    async def execute(self, *args: Any, timeout: Optional[float] = None) -> str:
+        return await trace_call(self._conn._tracer, self._name, self._query, args,
+                                asyncpg.Connection.execute(self._conn, self._query, *args, timeout=timeout),
+                                count_rows)
+
+
+class RegistryConnection(asyncpg.Connection):
+    """
+    Соединение, которое выполняет запросы реестра по имени
+
+    Используется как connection_class пула. Prepared statements хранит кэш asyncpg
+    соединения размером statement_cache_size: запрос подготавливается при первом
+    выполнении на соединении и переиспользуется после возврата соединения в пул.
+    """
+    __slots__ = ('_registry', '_tracer')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._registry: QueryRegistry = None
+        self._tracer: Optional[QueryTracer] = None
+
+    def attach_registry(self, registry: QueryRegistry, tracer: Optional[QueryTracer] = None) -> None:
+        """
+        Привязать реестр к соединению
+
+        Args:
+            registry (QueryRegistry): Реестр запросов
+            tracer (Optional[QueryTracer]): Трассировка запросов соединения
+        """
+        self._registry = registry
+        self._tracer = tracer
+
+    def statement(self, name: str) -> NamedQuery:
+        """
+        Получить запрос реестра по имени
+
+        Args:
+            name (str): Имя запроса в реестре
+
+        Returns:
+            NamedQuery: Запрос, привязанный к соединению
+        """
+        return NamedQuery(self, name, self._registry.queries[name])
+
+    # Запросы вне реестра трассируются под именем метода Database, который держит соединение
+
+    async def execute(self, query: str, *args, timeout: Optional[float] = None) -> str:
+        return await trace_call(self._tracer, None, query, args,
+                                super().execute(query, *args, timeout=timeout), count_rows)
+
+    async def fetch(self, query: str, *args, timeout: Optional[float] = None, record_class=None) -> List:
+        return await trace_call(self._tracer, None, query, args,
+                                super().fetch(query, *args, timeout=timeout, record_class=record_class),
+                                count_rows)
+
+    async def fetchrow(self, query: str, *args, timeout: Optional[float] = None, record_class=None):
+        return await trace_call(self._tracer, None, query, args,
+                                super().fetchrow(query, *args, timeout=timeout, record_class=record_class),
+                                count_rows)
+
+    async def fetchval(self, query: str, *args, column: int = 0, timeout: Optional[float] = None):
+        return await trace_call(self._tracer, None, query, args,
+                                super().fetchval(query, *args, column=column, timeout=timeout),
+                                lambda result: 1)
+
+    async def copy_records_to_table(self, table_name: str, *, records, **kwargs) -> str:
+        return await trace_call(self._tracer, None, f"COPY {table_name}", (),
+                                super().copy_records_to_table(table_name, records=records, **kwargs),
+                                count_rows)
+
+    async def copy_to_table(self, table_name: str, *, source, **kwargs) -> str:
+        return await trace_call(self._tracer, None, f"COPY {table_name}", (),
+                                super().copy_to_table(table_name, source=source, **kwargs),
+                                count_rows)
@@ -0,0 +1,294 @@
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import datetime
+import heapq
+import logging
+import re
+import time
+
+from metrics.histogram import Histogram
+from metrics.prometheus import format_histograms, format_values
+
+logger = logging.getLogger(__name__)
+
+# Метод Database, который держит соединение, и сколько он ждал его из пула.
+# Выставляется в Database.acquire, запросы внутри захвата видят его через контекст задачи
+current_acquire: ContextVar[Optional[Tuple[str, float]]] = ContextVar('current_acquire', default=None)
+
+_WRITE_KEYWORDS = re.compile(
+    r'\b(INSERT|UPDATE|DELETE|MERGE|CREATE|ALTER|DROP|TRUNCATE|COPY|GRANT|REVOKE|LOCK|CALL)\b',
+    re.IGNORECASE
+)
+_READ_PREFIX = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+
+def is_read_only(query: str) -> bool:
+    """
+    Проверка, что запрос только читает данные
+
+    Проверка консервативная: SELECT ... FOR UPDATE тоже считается изменяющим.
+    Если проверка ошибется в обратную сторону, изменяющий запрос не выполнится,
+    потому что план снимается в READ ONLY транзакции.
+
+    Args:
+        query (str): Текст запроса
+
+    Returns:
+        bool: Запрос начинается с SELECT или WITH и не содержит изменяющих команд
+    """
+    return bool(_READ_PREFIX.match(query)) and not _WRITE_KEYWORDS.search(query)
+
+
+def redact(value: Any) -> str:
+    """
+    Описание параметра запроса без его значения
+
+    В параметрах есть идентификаторы пользователей и их данные,
+    поэтому в логи попадают только типы и размеры.
+
+    Args:
+        value (Any): Параметр запроса
+
+    Returns:
+        str: Тип параметра, для строк и последовательностей - длина
+    """
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+class _SlowQuery:
+    __slots__ = ('seconds', 'name', 'rows', 'pool_wait', 'params', 'at')
+
+    def __init__(self, seconds: float, name: str, rows: Optional[int], pool_wait: Optional[float],
+                 params: List[str]):
+        self.seconds = seconds
+        self.name = name
+        self.rows = rows
+        self.pool_wait = pool_wait
+        self.params = params
+        self.at = time.time()
+
+    def __lt__(self, other: '_SlowQuery') -> bool:
+        return self.seconds < other.seconds
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'query': self.name,
+            'seconds': self.seconds,
+            'rows': self.rows,
+            'pool_wait': self.pool_wait,
+            'params': self.params,
+            'at': datetime.datetime.fromtimestamp(self.at, datetime.timezone.utc).isoformat(timespec='seconds')
+        }
+
+
+class QueryTracer:
+    """
+    Трассировка запросов к базе
+
+    По каждому запросу хранится гистограмма длительности и количество
+    возвращенных строк, по каждому методу Database - количество отправленных
+    в базу команд, включая управление транзакциями. Самые медленные запросы держатся в двух кучах по top_n:
+    текущего окна и предыдущего, поэтому top-N отражает последние window..2*window
+    секунд, top_n=0 отключает top-N. Запросы дольше slow_threshold пишутся в лог с замаскированными
+    параметрами. Если задан explain, для медленных читающих запросов в фоне
+    снимается план EXPLAIN ANALYZE, не чаще раза в explain_interval на запрос.
+    """
+    def __init__(self, slow_threshold: float, top_n: int, window: float,
+                 explain: Optional[Callable[[str, Sequence[Any]], Awaitable[str]]] = None,
+                 explain_interval: float = 300.0):
+        self.slow_threshold = slow_threshold
+        self.top_n = top_n
+        self.window = window
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.duration: Dict[str, Histogram] = defaultdict(Histogram)
+        self.rows: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statements: Dict[str, int] = defaultdict(int)
+        self._current: List[_SlowQuery] = []
+        self._previous: List[_SlowQuery] = []
+        self._window_start = time.monotonic()
+        self._explained_at: Dict[str, float] = {}
+        self._explain_tasks = set()
+
+    def observe(self, name: str, query: str, args: Sequence[Any], seconds: float,
+                rows: Optional[int], error: bool = False) -> None:
+        """
+        Записать выполнение запроса
+
+        Args:
+            name (str): Имя запроса в реестре или метода Database для запросов вне реестра
+            query (str): Текст запроса
+            args (Sequence[Any]): Параметры запроса
+            seconds (float): Длительность в секундах
+            rows (Optional[int]): Количество возвращенных строк
+            error (bool): Запрос завершился ошибкой
+        """
+        self.duration[name].observe(seconds)
+        if rows:
+            self.rows[name] += rows
+        if error:
+            self.errors[name] += 1
+
+        now = time.monotonic()
+        if now - self._window_start >= self.window:
+            stale = now - self._window_start >= 2 * self.window
+            self._previous, self._current = ([] if stale else self._current), []
+            self._window_start = now
+        is_slow = seconds >= self.slow_threshold
+        is_top = self.top_n > 0 and (len(self._current) < self.top_n or seconds > self._current[0].seconds)
+        if not is_slow and not is_top:
+            return
+
+        acquired = current_acquire.get()
+        entry = _SlowQuery(seconds, name, rows, acquired[1] if acquired else None, [redact(arg) for arg in args])
+        if is_top and len(self._current) < self.top_n:
+            heapq.heappush(self._current, entry)
+        elif is_top:
+            heapq.heapreplace(self._current, entry)
+
+        if is_slow:
+            logger.warning("Медленный запрос %s: %.3f с, строк %s, ожидание пула %s, параметры %s",
+                           name, seconds, rows,
+                           f"{entry.pool_wait:.3f} с" if entry.pool_wait is not None else "—",
+                           ', '.join(entry.params))
+            if not error:
+                self._maybe_explain(name, query, args, now)
+
+    def _maybe_explain(self, name: str, query: str, args: Sequence[Any], now: float) -> None:
+        if self.explain is None or not is_read_only(query):
+            return
+        if now - self._explained_at.get(name, float('-inf')) < self.explain_interval:
+            return
+        self._explained_at[name] = now
+        task = asyncio.create_task(self._explain(name, query, list(args)))
+        self._explain_tasks.add(task)
+        task.add_done_callback(self._explain_tasks.discard)
+
+    async def _explain(self, name: str, query: str, args: List[Any]) -> None:
+        # Задача унаследовала контекст медленного запроса, служебные запросы
+        # захвата под explain не должны записываться на его имя
+        current_acquire.set(None)
+        try:
+            plan = await self.explain(query, args)
+            logger.warning("План медленного запроса %s:\n%s", name, plan)
+        except Exception as e:
+            logger.error(f"Не удалось снять план запроса {name}: {e}")
+
+    def slowest(self) -> List[Dict[str, Any]]:
+        """
+        Самые медленные запросы за последнее окно
+
+        Returns:
+            List[Dict[str, Any]]: До top_n запросов по убыванию длительности
+        """
+        entries = heapq.nlargest(self.top_n, self._current + self._previous)
+        return [entry.as_dict() for entry in entries]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Сводка по запросам
+
+        Returns:
+            Dict[str, Any]: Длительность, строки и ошибки по запросам и самые медленные запросы
+        """
+        return {
+            'queries': {
+                name: {**histogram.snapshot(), 'rows': self.rows[name], 'errors': self.errors[name]}
+                for name, histogram in self.duration.items()
+            },
+            'slowest': self.slowest()
+        }
+
+    def collect(self) -> List[str]:
+        """
+        Метрики запросов в текстовом формате Prometheus
+
+        Returns:
+            List[str]: Строки метрик
+        """
+        return [
+            *format_histograms(
+                'gym_bot_db_query_duration_seconds',
+                "Длительность запроса к базе",
+                [({'query': name}, histogram) for name, histogram in self.duration.items()]
+            ),
+            *format_values(
+                'gym_bot_db_query_rows_total',
+                "Строки, возвращенные запросом",
+                'counter',
+                [({'query': name}, rows) for name, rows in self.rows.items()]
+            ),
+            *format_values(
+                'gym_bot_db_query_errors_total',
+                "Запросы, завершившиеся ошибкой",
+                'counter',
+                [({'query': name}, count) for name, count in self.errors.items()]
+            ),
+            *format_values(
+                'gym_bot_db_statements_total',
+                "Команды, отправленные в базу методом Database, включая BEGIN и COMMIT",
+                'counter',
+                [({'method': method}, count) for method, count in self.statements.items()]
+            )
+        ]
+
+
+_TRANSACTION_CONTROL = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b', re.IGNORECASE)
+
+
+def _status_rows(status: str) -> Optional[int]:
+    # Статус команды вида "INSERT 0 5" или "DELETE 3"
+    count = status.rsplit(' ', 1)[-1] if status else ''
+    return int(count) if count.isdigit() else None
+
+
+async def trace_call(tracer: Optional[QueryTracer], name: Optional[str], query: str, args: Sequence[Any],
+                     call: Awaitable[Any], count: Callable[[Any], Optional[int]]) -> Any:
+    """
+    Выполнить запрос с записью в трассировку
+
+    Запросы вне захвата через Database.acquire (служебные запросы asyncpg,
+    миграции) не трассируются. Управление транзакциями только считается
+    в statements, без длительности.
+
+    Args:
+        tracer (Optional[QueryTracer]): Трассировка, None - без записи
+        name (Optional[str]): Имя запроса, None - имя метода Database из контекста
+        query (str): Текст запроса
+        args (Sequence[Any]): Параметры запроса
+        call (Awaitable[Any]): Выполнение запроса
+        count (Callable[[Any], Optional[int]]): Количество строк по результату
+
+    Returns:
+        Any: Результат запроса
+    """
+    acquired = current_acquire.get()
+    if tracer is None or acquired is None:
+        return await call
+    tracer.statements[acquired[0]] += 1
+    if _TRANSACTION_CONTROL.match(query):
+        return await call
+    start = time.perf_counter()
+    try:
+        result = await call
+    except Exception:
+        tracer.observe(name or acquired[0], query, args, time.perf_counter() - start, None, error=True)
+        raise
+    tracer.observe(name or acquired[0], query, args, time.perf_counter() - start, count(result))
+    return result
+
+
+def count_rows(result: Any) -> Optional[int]:
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, str):
+        return _status_rows(result)
+    return 0 if result is None else 1
+
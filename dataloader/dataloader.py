@@ -1,41 +1,151 @@
+import csv
+import numpy as np
 import pandas as pd
+from itertools import repeat
+
+COLUMNS = ['Date', 'Exercise', 'Category', 'Set Number', 'Weight', 'Reps']
+REQUIRED_COLUMNS = ['Date', 'Exercise', 'Category', 'Weight', 'Reps']
+
+
+def _order_sets(data):
+    data = data.sort_values(['Date', 'Exercise'])
+    data['Set Number'] = data.groupby(['Date', 'Exercise']).cumcount() + 1
+    return data[COLUMNS]
+
+
+def _drop_incomplete(data):
+    return data.dropna(subset=REQUIRED_COLUMNS)
+
+
+def _build_workouts(data):
+    columns = {
+        'exercise': data['Exercise'].to_numpy(dtype=object),
+        'muscle_group': data['Category'].to_numpy(dtype=object),
+        'set_number': data['Set Number'].to_numpy(dtype=np.int32),
+        'weight': data['Weight'].to_numpy(dtype=np.float64),
+        'reps': data['Reps'].to_numpy(dtype=np.int32)
+    }
+    workouts = {}
+    for workout_date, index in data.groupby('Date').indices.items():
+        workout_date = pd.Timestamp(workout_date)
+        workouts[workout_date] = {'date': workout_date}
+        for name, column in columns.items():
+            workouts[workout_date][name] = column[index]
+    return workouts
+
 
 class Dataloader:
     def __init__(self, csv_file):
         self.data_csv = pd.read_csv(csv_file)
 
+    @staticmethod
+    def iter_workouts(csv_file, chunksize=10000):
+        """
+        Потоковое чтение тренировок из CSV файла
+
+        Файл читается чанками, наружу по одной отдаются только полностью
+        прочитанные даты, поэтому потребление памяти ограничено размером чанка,
+        а не длиной истории. Строки одной даты должны идти в файле подряд
+        (так выгружает FitNotes).
+
+        Args:
+            csv_file: Путь к CSV файлу или файловый объект
+            chunksize (int): Количество строк в одном чанке
+
+        Yields:
+            Tuple[pd.Timestamp, Dict]: Дата и тренировка в формате get_workouts
+        """
+        seen_dates = set()
+        tail = None
+        for chunk in pd.read_csv(csv_file, chunksize=chunksize, usecols=REQUIRED_COLUMNS):
+            chunk['Date'] = pd.to_datetime(chunk['Date'])
+            chunk = chunk.dropna(subset=['Date'])
+            if tail is not None:
+                chunk = pd.concat([tail, chunk])
+            if chunk.empty:
+                continue
+            is_tail = chunk['Date'] == chunk['Date'].iloc[-1]
+            tail = chunk[is_tail]
+            yield from Dataloader._stream_workouts(chunk[~is_tail], seen_dates)
+        if tail is not None:
+            yield from Dataloader._stream_workouts(tail, seen_dates)
+
+    @staticmethod
+    def _stream_workouts(data, seen_dates):
+        workouts = _build_workouts(_drop_incomplete(_order_sets(data)))
+        for workout_date, workout in workouts.items():
+            if workout_date in seen_dates:
+                raise ValueError(f"Строки за {workout_date:%Y-%m-%d} в файле идут не подряд")
+            seen_dates.add(workout_date)
+            yield workout_date, workout
+
     def set_order(self):
         self.data_csv['Date'] = pd.to_datetime(self.data_csv['Date'])
-        self.data_csv = self.data_csv.sort_values(['Date', 'Exercise'])
-        self.data_csv['Set Number'] = self.data_csv.groupby(['Date', 'Exercise']).cumcount() + 1
-        columns = ['Date', 'Exercise', 'Category', 'Set Number', 'Weight', 'Reps']
-        self.data_csv = self.data_csv[columns]
-    
+        self.data_csv = _order_sets(self.data_csv)
+
     def filter_data(self):
-        self.data_csv = self.data_csv.dropna(subset=['Date', 'Exercise', 'Category', 'Weight', 'Reps'])
+        self.data_csv = _drop_incomplete(self.data_csv)
 
 
     def get_muscle_groups(self):
         return self.data_csv['Category'].unique().tolist()
-    
+
     def get_exercises_by_muscle_group(self, muscle_group):
         filtered = self.data_csv[self.data_csv['Category'] == muscle_group]
         return filtered['Exercise'].unique().tolist()
-    
+
     def get_workouts(self):
-        workouts = {}
-        for _, row in self.data_csv.iterrows():
-            workout_date = row['Date']
-            if workout_date not in workouts:
-                workouts[workout_date] = {
-                    'date': row['Date'],
-                    'sets': []
-                }
-            workouts[workout_date]['sets'].append({
-                'exercise': row['Exercise'],
-                'muscle_group': row['Category'],
-                'reps': row['Reps'],
-                'weight': row['Weight'],
-                'set_number': row['Set Number']
-            })
-        return workouts
\ No newline at end of file
+        """
+        Тренировки в колоночном формате
+
+        Returns:
+            Dict[pd.Timestamp, Dict]: Тренировки по датам; подходы тренировки
+                хранятся массивами exercise, muscle_group, set_number, weight, reps
+        """
+        return _build_workouts(self.data_csv)
+
+    @staticmethod
+    def to_records(workouts):
+        """
+        Записи подходов для Database.bulk_import
+
+        Args:
+            workouts: Пары (дата, тренировка) из get_workouts().items() или iter_workouts()
+
+        Yields:
+            Tuple: (date, exercise, muscle_group, set_order, weight, reps)
+        """
+        for workout_date, workout in workouts:
+            yield from zip(
+                repeat(workout_date.date()),
+                workout['exercise'].tolist(),
+                workout['muscle_group'].tolist(),
+                workout['set_number'].tolist(),
+                workout['weight'].tolist(),
+                workout['reps'].tolist()
+            )
+
+    @staticmethod
+    def write_records(csv_file, records_file, chunksize=10000):
+        """
+        Потоковая запись подходов в CSV для Database.bulk_import_file
+
+        Файл читается через iter_workouts, поэтому потребление памяти
+        ограничено размером чанка.
+
+        Args:
+            csv_file: Путь к CSV файлу FitNotes или файловый объект
+            records_file (str): Путь к файлу записей
+            chunksize (int): Количество строк в одном чанке
+
+        Returns:
+            int: Количество записанных подходов
+        """
+        count = 0
+        with open(records_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            for workout in Dataloader.iter_workouts(csv_file, chunksize=chunksize):
+                records = list(Dataloader.to_records([workout]))
+                writer.writerows(records)
+                count += len(records)
+        return count
@@ -0,0 +1,64 @@
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from metrics.histogram import Histogram
+from metrics.prometheus import format_histograms, format_values
+
+# Метки: роутер, хендлер и состояние FSM, в котором пришло обновление
+HandlerKey = Tuple[str, str, str]
+
+
+class HandlerMetrics:
+    """
+    Метрики обработки обновлений по роутеру, хендлеру и состоянию FSM
+
+    Обновления обрабатываются в одном event loop, поэтому счетчики меняются
+    без блокировок: между await запись не может быть прервана.
+    """
+    def __init__(self):
+        self.latency: Dict[HandlerKey, Histogram] = defaultdict(Histogram)
+        self.errors: Dict[HandlerKey, int] = defaultdict(int)
+        self.in_flight = 0
+
+    def observe(self, key: HandlerKey, seconds: float, error: bool = False) -> None:
+        """
+        Записать обработку обновления
+
+        Args:
+            key (HandlerKey): Роутер, хендлер и состояние FSM
+            seconds (float): Время обработки в секундах
+            error (bool): Обработка завершилась исключением
+        """
+        self.latency[key].observe(seconds)
+        if error:
+            self.errors[key] += 1
+
+    def collect(self) -> List[str]:
+        """
+        Метрики в текстовом формате Prometheus
+
+        Returns:
+            List[str]: Строки метрик
+        """
+        def labels(key: HandlerKey) -> Dict[str, str]:
+            return {'router': key[0], 'handler': key[1], 'state': key[2]}
+
+        return [
+            *format_histograms(
+                'gym_bot_update_duration_seconds',
+                "Время обработки обновления",
+                [(labels(key), histogram) for key, histogram in self.latency.items()]
+            ),
+            *format_values(
+                'gym_bot_update_errors_total',
+                "Обновления, обработка которых завершилась исключением",
+                'counter',
+                [(labels(key), count) for key, count in self.errors.items()]
+            ),
+            *format_values(
+                'gym_bot_updates_in_flight',
+                "Обновления в обработке",
+                'gauge',
+                [({}, self.in_flight)]
+            )
+        ]
@@ -0,0 +1,66 @@
+from bisect import bisect_left
+from typing import Dict, List, Sequence
+
+# Границы бакетов в секундах: от 1 мс до 10 с
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными бакетами
+
+    Хранит только счетчики бакетов, сумму и количество наблюдений, поэтому
+    запись значения стоит O(log n) по числу бакетов и не требует памяти под выборку.
+    """
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Записать наблюдение
+
+        Args:
+            value (float): Значение, например длительность в секундах
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Оценка квантиля по верхней границе бакета
+
+        Args:
+            q (float): Квантиль от 0 до 1
+
+        Returns:
+            float: Верхняя граница бакета, в который попадает квантиль
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        Сводка по гистограмме
+
+        Returns:
+            Dict[str, float]: count, sum, avg, p50, p95 и p99
+        """
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'avg': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99)
+        }
@@ -0,0 +1,128 @@
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiohttp import web
+
+from metrics.histogram import Histogram
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+Labels = Dict[str, str]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: Labels, **extra: str) -> str:
+    items = {**labels, **extra}
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items.items()) + '}'
+
+
+def _number(value: float) -> str:
+    return f"{value:g}" if value not in (float('inf'), float('-inf')) else ('+Inf' if value > 0 else '-Inf')
+
+
+def format_histograms(name: str, help_text: str, samples: Iterable[Tuple[Labels, Histogram]]) -> List[str]:
+    """
+    Гистограммы в текстовом формате Prometheus
+
+    Бакеты Histogram хранят количество наблюдений в своем интервале,
+    Prometheus ожидает накопленные значения, поэтому счетчики суммируются.
+
+    Args:
+        name (str): Имя метрики
+        help_text (str): Описание метрики
+        samples (Iterable[Tuple[Labels, Histogram]]): Метки и гистограммы
+
+    Returns:
+        List[str]: Строки метрики
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in samples:
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(labels, le=_number(bound))} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.sum)}")
+        lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return lines
+
+
+def format_values(name: str, help_text: str, metric_type: str,
+                  samples: Iterable[Tuple[Labels, float]]) -> List[str]:
+    """
+    Счетчики или gauge в текстовом формате Prometheus
+
+    Args:
+        name (str): Имя метрики
+        help_text (str): Описание метрики
+        metric_type (str): counter или gauge
+        samples (Iterable[Tuple[Labels, float]]): Метки и значения
+
+    Returns:
+        List[str]: Строки метрики
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return lines
+
+
+class MetricsServer:
+    """
+    HTTP сервер, который отдает метрики по GET /metrics
+
+    Каждый коллектор возвращает готовые строки метрик, сервер только склеивает их,
+    поэтому запрос не блокирует обработку обновлений дольше форматирования.
+    GET /stats отдает JSON сводки из reports - то, что не ложится в метрики
+    Prometheus, например самые медленные запросы с параметрами.
+    """
+    def __init__(self, collectors: List[Callable[[], List[str]]],
+                 reports: Optional[Dict[str, Callable[[], Any]]] = None):
+        self.collectors = collectors
+        self.reports = reports or {}
+        self._runner: Optional[web.AppRunner] = None
+
+    def render(self) -> str:
+        lines = []
+        for collect in self.collectors:
+            lines.extend(collect())
+        return '\n'.join(lines) + '\n'
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(body=self.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+    async def _handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({name: report() for name, report in self.reports.items()},
+                                 dumps=lambda data: json.dumps(data, ensure_ascii=False, default=str))
+
+    async def start(self, host: str, port: int) -> None:
+        """
+        Запустить сервер метрик
+
+        Args:
+            host (str): Адрес, на котором слушает сервер
+            port (int): Порт
+        """
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        app.router.add_get('/stats', self._handle_stats)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host=host, port=port).start()
+        logger.info("Метрики доступны на http://%s:%s/metrics", host, port)
+
+    async def close(self) -> None:
+        """
+        Остановить сервер метрик
+        """
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None